@@ -0,0 +1 @@
+"""Standalone benchmarks for the importer (run with python -m benchmarks.<name>)."""
@@ -0,0 +1,172 @@
+"""
+Benchmark: import throughput for synthetic result files.
+
+Generates result files (see generate_results.py), or uses an existing
+folder of them, imports them into a scratch database through the
+importer's import_files(), and reports files/sec, rows/sec, peak RSS and
+the time spent per phase (manifest check, content hash, parse, insert,
+record/PB update, commit).
+
+Results can be saved with --save and compared against a saved run with
+--baseline, to check an importer change against the previous version.
+
+Usage:
+    python -m benchmarks.bench_import --files 300 --grid 30 --laps 20
+    python -m benchmarks.bench_import --results-dir some/results --save new.json --baseline old.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import import_acc_results as importer
+from db.connection import connect
+from benchmarks.generate_results import DEFAULT_TRACKS, generate
+
+PHASES = ("check", "hash", "parse", "insert", "records", "commit")
+
+
+def peak_rss_bytes() -> int | None:
+    """Peak resident set size of this process, or None if it can't be read."""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+def run(results_dir: str, db_path: str, commit_every: int) -> dict:
+    """Import every result file in `results_dir` into `db_path` and collect the numbers."""
+    files = sorted(f for f in os.listdir(results_dir) if importer.FILENAME_RE.match(f))
+    total_bytes = sum(os.path.getsize(os.path.join(results_dir, f)) for f in files)
+
+    con = connect(db_path)
+    try:
+        con.execute("PRAGMA foreign_keys = ON;")
+        importer.prepare_db(con)
+
+        timings = {}
+        started = time.perf_counter()
+        counts = importer.import_files(con, results_dir, files, commit_every=commit_every, timings=timings)
+        seconds = time.perf_counter() - started
+
+        laps = con.execute("SELECT COALESCE(SUM(lap_count), 0) FROM session_laps").fetchone()[0]
+    finally:
+        con.close()
+
+    return {
+        "files": len(files),
+        "megabytes": total_bytes / 1e6,
+        "imported": counts["imported"],
+        "empty": counts["empty"],
+        "failed": counts["failed"],
+        "rows": counts["rows"],
+        "laps": laps,
+        "seconds": seconds,
+        "files_per_sec": len(files) / seconds if seconds else 0.0,
+        "rows_per_sec": counts["rows"] / seconds if seconds else 0.0,
+        "peak_rss_mb": (peak_rss_bytes() or 0) / 1e6,
+        "phases": {phase: timings.get(phase, 0.0) for phase in PHASES},
+    }
+
+
+def print_report(result: dict, baseline: dict | None = None) -> None:
+    def delta(value, base):
+        if not base:
+            return ""
+        return f"  ({(value - base) / base * 100:+.1f}% vs baseline)"
+
+    base = baseline or {}
+    print(f"Files:        {result['files']} ({result['megabytes']:.1f} MB), "
+          f"{result['imported']} imported, {result['empty']} empty, {result['failed']} failed")
+    print(f"Rows:         {result['rows']} entries, {result['laps']} laps")
+    print(f"Total:        {result['seconds']:.2f}s{delta(result['seconds'], base.get('seconds'))}")
+    print(f"Files/sec:    {result['files_per_sec']:.1f}"
+          f"{delta(result['files_per_sec'], base.get('files_per_sec'))}")
+    print(f"Rows/sec:     {result['rows_per_sec']:.0f}"
+          f"{delta(result['rows_per_sec'], base.get('rows_per_sec'))}")
+    print(f"Peak RSS:     {result['peak_rss_mb']:.1f} MB"
+          f"{delta(result['peak_rss_mb'], base.get('peak_rss_mb'))}")
+    print("Phases:")
+    base_phases = base.get("phases", {})
+    for phase in PHASES:
+        value = result["phases"][phase]
+        share = value / result["seconds"] * 100 if result["seconds"] else 0.0
+        print(f"  {phase:<8} {value:8.3f}s {share:5.1f}%{delta(value, base_phases.get(phase))}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importer throughput on synthetic result files.")
+    parser.add_argument("--results-dir", help="Import these files instead of generating new ones")
+    parser.add_argument("--files", type=int, default=300, help="Files to generate (default: 300)")
+    parser.add_argument("--grid", type=int, default=30, help="Cars per session (default: 30)")
+    parser.add_argument("--laps", type=int, default=20, help="Race laps per car (default: 20)")
+    parser.add_argument("--drivers", type=int, default=200, help="Driver pool size (default: 200)")
+    parser.add_argument("--tracks", type=int, default=12, help="Number of tracks to rotate through (default: 12)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--commit-every", type=int, default=importer.DEFAULT_COMMIT_EVERY,
+                        help=f"Imported files per transaction, 0 = one per run (default: {importer.DEFAULT_COMMIT_EVERY})")
+    parser.add_argument("--save", metavar="PATH", help="Write the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against results saved with --save")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results_dir = args.results_dir
+        if not results_dir:
+            results_dir = os.path.join(tmp, "results")
+            t0 = time.perf_counter()
+            # In a child process, so generating doesn't count toward the peak RSS
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                pool.submit(
+                    generate, results_dir, args.files, tracks=DEFAULT_TRACKS[:max(1, args.tracks)],
+                    grid=args.grid, laps=args.laps, drivers=args.drivers, seed=args.seed,
+                ).result()
+            print(f"Generated {args.files} file(s) in {time.perf_counter() - t0:.2f}s")
+
+        result = run(results_dir, os.path.join(tmp, "bench.sqlite"), args.commit_every)
+
+    print_report(result, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: per-session import time as the history grows.
+
+Builds a scratch database, then imports synthetic sessions one by one through
+the importer's insert_session() (entries + track record / PB detection +
+race result queue) and reports the time per session for each slice of
+history. With set-based PB detection and the importer's indexes the numbers
+should stay flat instead of growing with the number of sessions already
+stored.
+
+Usage:
+    python -m benchmarks.bench_records --sessions 5000 --grid 30
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import import_acc_results as importer
+from db.connection import connect
+
+TRACKS = ["monza", "spa", "nurburgring", "silverstone", "brands_hatch", "zandvoort", "misano", "imola"]
+
+
+def make_session(rng: random.Random, index: int, players: int, grid: int):
+    """Build one synthetic (session_row, entry_rows) pair."""
+    track = rng.choice(TRACKS)
+    stype = rng.choice(("Q", "R"))
+    base_ms = 90000 + TRACKS.index(track) * 5000
+    drivers = rng.sample(range(players), min(grid, players))
+
+    entry_rows = []
+    for position, p in enumerate(drivers, start=1):
+        # Slowly improving pace so new PBs keep appearing as history grows
+        best = base_ms + rng.randint(0, 4000) - index // 50
+        entry_rows.append((
+            position, position, p % 999, rng.randint(0, 35), 0, "GT3",
+            f"S{p:017d}", f"First{p}", f"Last{p}", f"L{p:02d}"[:3],
+            best, best * 20, 20, 0, None,
+        ))
+
+    session_row = (
+        f"bench/{index:07d}_{stype}.json", stype, track, "Bench Server", 0, 0, 0,
+        f"2025-01-01T00:00:{index % 60:02d}+00:00",
+    )
+    return session_row, entry_rows
+
+
+def run(sessions: int, grid: int, players: int, slices: int, seed: int, sent_ratio: float) -> None:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        con = connect(os.path.join(tmp, "bench.sqlite"))
+        importer.prepare_db(con)
+        cur = con.cursor()
+
+        slice_size = max(1, sessions // slices)
+        timings = []
+        print(f"{'history':>10} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}")
+        for i in range(sessions):
+            session_row, entry_rows = make_session(rng, i, players, grid)
+            t0 = time.perf_counter()
+            importer.insert_session(cur, session_row, entry_rows)
+            timings.append((time.perf_counter() - t0) * 1000)
+            con.commit()
+
+            # Pretend the bot has sent part of the queue, like on a live server
+            if sent_ratio and rng.random() < sent_ratio:
+                cur.execute(
+                    "UPDATE record_announcements SET discord_message_id = 'bench' WHERE discord_message_id IS NULL"
+                )
+                cur.execute(
+                    "UPDATE race_results_announcements SET discord_message_id = 'bench' WHERE discord_message_id IS NULL"
+                )
+                con.commit()
+
+            if len(timings) == slice_size:
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                print(f"{i + 1:>10} {statistics.mean(timings):>9.3f} {p95:>9.3f} {timings[-1]:>9.3f}")
+                timings = []
+
+        rows = con.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        pbs = con.execute("SELECT COUNT(*) FROM record_announcements WHERE announcement_type = 'PB'").fetchone()[0]
+        con.close()
+    print(f"Entries: {rows}, PB announcements: {pbs}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-session import time as history grows.")
+    parser.add_argument("--sessions", type=int, default=5000, help="Sessions to import (default: 5000)")
+    parser.add_argument("--grid", type=int, default=30, help="Drivers per session (default: 30)")
+    parser.add_argument("--players", type=int, default=400, help="Distinct drivers (default: 400)")
+    parser.add_argument("--slices", type=int, default=10, help="Report rows (default: 10)")
+    parser.add_argument("--sent-ratio", type=float, default=0.2,
+                        help="Chance per session that the queue is marked sent (default: 0.2)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    run(args.sessions, args.grid, args.players, args.slices, args.seed, args.sent_ratio)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Check: LapPacker packs laps the way unpack_car_laps() reads them back.
+
+Packs a few cars' laps with plain int, float, mixed and out-of-range split
+values, short laps and laps without splits, decodes every row and compares
+each lap with what was added. Exits non-zero on a difference.
+
+Usage:
+    python -m benchmarks.check_laps
+"""
+import sys
+
+from ingest.laps import INT32_MAX, MISSING_SPLIT, LapPacker, unpack_car_laps
+
+# car_id -> laps as the server writes them
+LAPS = {
+    # Plain ints
+    1: [
+        {"laptime": 90000, "splits": [30000, 31000, 29000], "isValidForBest": True},
+        {"laptime": 91000, "splits": [31000, 31000, 29000], "isValidForBest": False},
+    ],
+    # Floats, then ints: a float lap must not shift the laps after it
+    2: [
+        {"laptime": 90000.0, "splits": [30000.0, 31000.0, 29000.0], "isValidForBest": True},
+        {"laptime": 91000, "splits": [31000, 31000, 29000], "isValidForBest": True, "driverIndex": 1},
+    ],
+    # Mixed ints and floats within a lap
+    3: [
+        {"laptime": 92000, "splits": [30000, 31000.0, 31000], "isValidForBest": True},
+        {"laptime": 93000, "splits": [31000.0, 32000, 30000.0], "isValidForBest": False},
+        {"laptime": 94000, "splits": [31000, 32000, 31000], "isValidForBest": True},
+    ],
+    # Out of int32 range, a short lap and a lap without splits
+    4: [
+        {"laptime": 2**40, "splits": [30000, 2**33, -2**40], "isValidForBest": False},
+        {"laptime": 2147483647, "splits": [31000], "isValidForBest": False},
+        {"laptime": 0, "isValidForBest": False},
+        {"laptime": 95000, "splits": [31000, 32000, 32000], "isValidForBest": True},
+    ],
+}
+
+
+def _expected_time(value) -> int:
+    value = int(value)
+    return value if -2**31 <= value <= INT32_MAX else INT32_MAX
+
+
+def run() -> bool:
+    packer = LapPacker()
+    for car_id, laps in LAPS.items():
+        for lap in laps:
+            packer.add({"carId": car_id, **lap})
+
+    ok = packer.lap_total == sum(map(len, LAPS.values()))
+    for car_id, lap_count, split_count, *blobs in packer.rows():
+        decoded = unpack_car_laps(lap_count, split_count, *blobs)
+        laps = LAPS[car_id]
+        same = lap_count == len(laps)
+        for lap, got in zip(laps, decoded):
+            splits = [_expected_time(s) for s in lap.get("splits", ())]
+            want = {
+                "laptime": _expected_time(lap["laptime"]),
+                "splits": splits + [MISSING_SPLIT] * (split_count - len(splits)),
+                "is_valid": lap["isValidForBest"],
+                "driver_index": lap.get("driverIndex", 0),
+            }
+            got = {key: got[key] for key in want}
+            if got != want:
+                same = False
+                print(f"car {car_id}: expected {want}")
+                print(f"{'':>6} decoded  {got}")
+        ok = ok and same
+        print(f"car {car_id}: {lap_count} laps  {'ok' if same else 'DIFFERENT'}")
+    return ok
+
+
+def main():
+    if not run():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Check: --rebuild-derived gives the same rows as importing session by session.
+
+Builds a scratch database and imports sessions one by one through the
+importer's insert_session(), marking every queued announcement as sent
+after each (the state the rebuild assumes). Then it runs rebuild_derived()
+with the announcement history and compares records, personal_bests and
+the TR/PB ledger with what the replay produced. Exits non-zero on a
+difference.
+
+The sessions are a fixed set of edge cases (drivers tying a PB in one
+session, a PB on the new track record's lap, a lap already announced by an
+earlier session, a driver with two entries in one session) followed by
+random ones from bench_records.
+
+Usage:
+    python -m benchmarks.check_rebuild --sessions 500 --workers 2
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+import import_acc_results as importer
+from benchmarks.bench_records import make_session
+from db.connection import connect
+from db.rebuild import rebuild_derived
+
+
+def _entry(position: int, player: int, best_lap_ms: int) -> tuple:
+    return (
+        position, position, player, 0, 0, "GT3",
+        f"S{player:017d}", f"First{player}", f"Last{player}", f"L{player:02d}"[:3],
+        best_lap_ms, best_lap_ms * 20, 20, 0, None,
+    )
+
+
+def fixture_sessions() -> list[tuple]:
+    """(session_row, entry_rows) pairs covering the PB dedupe rules."""
+    laps = [
+        # First session: a track record and two first PBs
+        [(1, 90000), (2, 91000), (3, 92000)],
+        # Drivers 1 and 2 tie a PB in the same session: both are announced
+        [(4, 89000), (1, 89500), (2, 89500)],
+        # Driver 3's PB is a lap an earlier session announced: skipped
+        [(3, 89500), (5, 93000)],
+        # New track record; driver 5 ties it, so the TR covers that lap
+        [(5, 88000), (2, 88000), (1, 88800)],
+        # Driver 6 has two entries, the slower first: the faster one is the PB
+        [(6, 99000), (7, 95000), (6, 94000)],
+    ]
+    return [
+        (
+            (f"fixture/{i:07d}_R.json", "R", "fixture_track", "Check Server", 0, 0, 0,
+             f"2025-01-01T00:00:{i:02d}+00:00"),
+            [_entry(position, player, best) for position, (player, best) in enumerate(session, start=1)],
+        )
+        for i, session in enumerate(laps)
+    ]
+
+
+def _snapshot(con) -> tuple[list, list, list]:
+    records = con.execute("SELECT * FROM records ORDER BY track, session_type").fetchall()
+    personal_bests = con.execute(
+        "SELECT * FROM personal_bests ORDER BY track, session_type, player_key"
+    ).fetchall()
+    announcements = con.execute(
+        """
+        SELECT track, session_type, best_lap_ms, announced_at_utc, announcement_type, session_id,
+               player_id, first_name, last_name, short_name, car_model
+        FROM record_announcements
+        WHERE COALESCE(announcement_type, 'TR') IN ('TR', 'PB')
+        ORDER BY announcement_id
+        """
+    ).fetchall()
+    return records, personal_bests, announcements
+
+
+def run(sessions: int, grid: int, players: int, seed: int, workers: int) -> bool:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "check.sqlite")
+        con = connect(db_path)
+        importer.prepare_db(con)
+        cur = con.cursor()
+
+        replay = fixture_sessions() + [make_session(rng, i, players, grid) for i in range(sessions)]
+        for session_row, entry_rows in replay:
+            importer.insert_session(cur, session_row, entry_rows)
+            cur.execute("UPDATE record_announcements SET discord_message_id = 'check' WHERE discord_message_id IS NULL")
+            con.commit()
+
+        expected = _snapshot(con)
+        rebuild_derived(con, db_path, workers=workers, announcements=True)
+        actual = _snapshot(con)
+        con.close()
+
+    ok = True
+    for name, want, got in zip(("records", "personal_bests", "announcements"), expected, actual):
+        same = want == got
+        ok = ok and same
+        print(f"{name:>15}: replay {len(want):>6}, rebuild {len(got):>6}  {'ok' if same else 'DIFFERENT'}")
+        if not same:
+            for row in [r for r in want if r not in got][:5]:
+                print(f"{'':>17}only in replay:  {row}")
+            for row in [r for r in got if r not in want][:5]:
+                print(f"{'':>17}only in rebuild: {row}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare --rebuild-derived with a session-by-session replay.")
+    parser.add_argument("--sessions", type=int, default=500, help="Random sessions after the fixture (default: 500)")
+    parser.add_argument("--grid", type=int, default=30, help="Drivers per session (default: 30)")
+    parser.add_argument("--players", type=int, default=60, help="Distinct drivers (default: 60)")
+    parser.add_argument("--workers", type=int, default=1, help="Rebuild worker processes (default: 1)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    if not run(args.sessions, args.grid, args.players, args.seed, args.workers):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
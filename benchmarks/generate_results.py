@@ -0,0 +1,262 @@
+"""
+Synthetic ACC server result files.
+
+Writes UTF-16LE `YYMMDD_HHMMSS_{FP,Q,R}.json` files shaped like the ones an
+ACC dedicated server produces, so the importer can be exercised and
+benchmarked without real server output. Each "event" is an FP, Q and R
+session on one track, a few minutes apart. Drivers that didn't set a time
+carry the server's sentinel values (2147483647 for lap/split times, 0 for
+total time), and a share of the FP sessions can be empty template files.
+
+Usage:
+    python -m benchmarks.generate_results OUT_DIR --files 300 --grid 30 --laps 20
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+SENTINEL_TIME = 2147483647
+
+DEFAULT_TRACKS = [
+    "monza", "spa", "nurburgring", "silverstone", "brands_hatch", "zandvoort",
+    "misano", "imola", "barcelona", "paul_ricard", "hungaroring", "suzuka",
+]
+
+# Rough lap times (ms) so different tracks don't share a time range
+BASE_LAP_MS = 85000
+TRACK_LAP_STEP_MS = 4000
+
+SESSION_TYPES = ("FP", "Q", "R")
+
+# sessionResult.type as written by the server
+SESSION_TYPE_CODES = {"FP": 0, "Q": 4, "R": 10}
+
+CAR_MODELS = list(range(0, 36))
+
+
+def make_drivers(count: int, seed: int = 0) -> list[dict]:
+    """Build a pool of drivers with stable Steam-style player IDs."""
+    rng = random.Random(seed)
+    drivers = []
+    for i in range(count):
+        drivers.append({
+            "firstName": f"Driver{i}",
+            "lastName": f"Test{i}",
+            "shortName": f"D{i % 100:02d}",
+            "playerId": f"S7656119{i:09d}",
+            # Per-driver pace offset, so the same drivers tend to finish near the front
+            "_pace": rng.randint(0, 3000),
+        })
+    return drivers
+
+
+def _public(driver: dict) -> dict:
+    return {k: v for k, v in driver.items() if not k.startswith("_")}
+
+
+def make_session(
+    rng: random.Random,
+    track: str,
+    track_index: int,
+    stype: str,
+    grid: int,
+    laps: int,
+    drivers: list[dict],
+    no_time_ratio: float,
+    splits: int = 3,
+) -> dict:
+    """Build one result file's JSON object."""
+    base_ms = BASE_LAP_MS + track_index * TRACK_LAP_STEP_MS
+    field = rng.sample(drivers, min(grid, len(drivers)))
+
+    cars = []
+    lap_objs = []
+    for car_index, driver in enumerate(field):
+        car_id = 1001 + car_index
+        did_lap = laps > 0 and rng.random() >= no_time_ratio
+        car_laps = []
+        if did_lap:
+            for _ in range(laps if stype == "R" else rng.randint(1, laps)):
+                laptime = base_ms + driver["_pace"] + rng.randint(0, 2500)
+                split_ms = [laptime // splits] * (splits - 1)
+                split_ms.append(laptime - sum(split_ms))
+                valid = rng.random() > 0.1
+                car_laps.append((laptime, split_ms, valid))
+                lap_objs.append({
+                    "carId": car_id,
+                    "driverIndex": 0,
+                    "laptime": laptime,
+                    "isValidForBest": valid,
+                    "splits": split_ms,
+                })
+
+        valid_laps = [lap for lap in car_laps if lap[2]]
+        if valid_laps:
+            best = min(valid_laps, key=lambda lap: lap[0])
+            best_lap, best_splits = best[0], best[1]
+        else:
+            best_lap, best_splits = SENTINEL_TIME, [SENTINEL_TIME] * splits
+        last_lap, last_splits = (car_laps[-1][0], car_laps[-1][1]) if car_laps else (SENTINEL_TIME, [])
+
+        cars.append({
+            "car": {
+                "carId": car_id,
+                "raceNumber": car_index + 1,
+                "carModel": rng.choice(CAR_MODELS),
+                "cupCategory": 0,
+                "carGroup": "GT3",
+                "teamName": "",
+                "nationality": 0,
+                "carGuid": -1,
+                "teamGuid": -1,
+                "drivers": [_public(driver)],
+            },
+            "currentDriver": _public(driver),
+            "currentDriverIndex": 0,
+            "timing": {
+                "lastLap": last_lap,
+                "lastSplits": last_splits,
+                "bestLap": best_lap,
+                "bestSplits": best_splits,
+                "totalTime": sum(lap[0] for lap in car_laps),
+                "lapCount": len(car_laps),
+                "lastSplitId": 0,
+            },
+            "missingMandatoryPitstop": 0,
+            "driverTotalTimes": [float(sum(lap[0] for lap in car_laps))],
+        })
+
+    # Race: most laps then shortest total time; otherwise fastest best lap
+    if stype == "R":
+        cars.sort(key=lambda c: (-c["timing"]["lapCount"], c["timing"]["totalTime"]))
+    else:
+        cars.sort(key=lambda c: c["timing"]["bestLap"])
+
+    best_overall = min((c["timing"]["bestLap"] for c in cars), default=SENTINEL_TIME)
+    return {
+        "sessionType": stype,
+        "trackName": track,
+        "sessionIndex": SESSION_TYPES.index(stype),
+        "raceWeekendIndex": 0,
+        "metaData": track,
+        "serverName": "Synthetic Test Server",
+        "sessionResult": {
+            "bestlap": best_overall,
+            "bestSplits": [SENTINEL_TIME] * splits,
+            "isWetSession": int(rng.random() < 0.1),
+            "type": SESSION_TYPE_CODES[stype],
+            "leaderBoardLines": cars,
+        },
+        "laps": lap_objs,
+        "penalties": [],
+        "post_race_penalties": [],
+    }
+
+
+def empty_session(track: str, stype: str) -> dict:
+    """A template log with no cars, as the server writes for unused sessions."""
+    return {
+        "sessionType": stype,
+        "trackName": track,
+        "sessionIndex": SESSION_TYPES.index(stype),
+        "raceWeekendIndex": 0,
+        "metaData": track,
+        "serverName": "Synthetic Test Server",
+        "sessionResult": {
+            "bestlap": SENTINEL_TIME,
+            "bestSplits": [SENTINEL_TIME] * 3,
+            "isWetSession": 0,
+            "type": SESSION_TYPE_CODES[stype],
+            "leaderBoardLines": [],
+        },
+        "laps": [],
+        "penalties": [],
+        "post_race_penalties": [],
+    }
+
+
+def generate(
+    out_dir: str,
+    files: int,
+    tracks: list[str] | None = None,
+    grid: int = 30,
+    laps: int = 20,
+    drivers: int = 200,
+    no_time_ratio: float = 0.05,
+    empty_ratio: float = 0.1,
+    start: datetime | None = None,
+    seed: int = 1,
+) -> list[str]:
+    """
+    Write `files` synthetic result files into `out_dir`.
+
+    Args:
+        out_dir: Directory to write into (created if missing)
+        files: Number of files to write
+        tracks: Track names to rotate through (default: DEFAULT_TRACKS)
+        grid: Cars per session
+        laps: Laps per car in races (FP/Q cars do 1..laps)
+        drivers: Size of the driver pool the grids are drawn from
+        no_time_ratio: Share of cars with no valid lap (sentinel best lap/splits)
+        empty_ratio: Share of FP sessions written as empty template logs
+        start: Timestamp of the first file (default: 2025-01-01 19:00)
+        seed: Random seed, so runs are reproducible
+
+    Returns:
+        The file names written, in chronological order
+    """
+    tracks = tracks or DEFAULT_TRACKS
+    rng = random.Random(seed)
+    pool = make_drivers(drivers, seed)
+    ts = start or datetime(2025, 1, 1, 19, 0, 0)
+    os.makedirs(out_dir, exist_ok=True)
+
+    names = []
+    for i in range(files):
+        event, slot = divmod(i, len(SESSION_TYPES))
+        stype = SESSION_TYPES[slot]
+        track_index = event % len(tracks)
+        track = tracks[track_index]
+
+        if stype == "FP" and rng.random() < empty_ratio:
+            data = empty_session(track, stype)
+        else:
+            data = make_session(rng, track, track_index, stype, grid, laps, pool, no_time_ratio)
+
+        name = f"{ts:%y%m%d_%H%M%S}_{stype}.json"
+        with open(os.path.join(out_dir, name), "w", encoding="utf-16le") as f:
+            json.dump(data, f, indent=2)
+        names.append(name)
+
+        # FP -> Q -> R 20 minutes apart, then the next event an hour after the race
+        ts += timedelta(minutes=20) if slot < len(SESSION_TYPES) - 1 else timedelta(hours=1)
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic ACC server result files.")
+    parser.add_argument("out_dir", help="Directory to write the files into")
+    parser.add_argument("--files", type=int, default=300, help="Number of files (default: 300)")
+    parser.add_argument("--tracks", default=",".join(DEFAULT_TRACKS), help="Comma-separated track names")
+    parser.add_argument("--grid", type=int, default=30, help="Cars per session (default: 30)")
+    parser.add_argument("--laps", type=int, default=20, help="Race laps per car (default: 20)")
+    parser.add_argument("--drivers", type=int, default=200, help="Driver pool size (default: 200)")
+    parser.add_argument("--no-time-ratio", type=float, default=0.05,
+                        help="Share of cars without a valid lap, written with sentinel times (default: 0.05)")
+    parser.add_argument("--empty-ratio", type=float, default=0.1,
+                        help="Share of FP sessions written as empty templates (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    names = generate(
+        args.out_dir, args.files, tracks=[t for t in args.tracks.split(",") if t],
+        grid=args.grid, laps=args.laps, drivers=args.drivers,
+        no_time_ratio=args.no_time_ratio, empty_ratio=args.empty_ratio, seed=args.seed,
+    )
+    print(f"Wrote {len(names)} file(s) to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
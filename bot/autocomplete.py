@@ -1,32 +1,39 @@
 """Autocomplete handlers for Discord slash commands."""
-import sqlite3
 import discord
 from discord import app_commands
 
-from config import DB_PATH
 from constants import DISCORD_AUTOCOMPLETE_LIMIT
-from db.queries import fetch_available_tracks, fetch_all_players
+from bot.database import database
+from bot.name_index import names
 from utils.logging_config import logger
 
+# Shortest input that gets typo-tolerant matches (one trigram)
+FUZZY_MIN_LENGTH = 3
+
+
+async def _with_fuzzy_matches(matches: list[str], current: str, search) -> list[str]:
+    """
+    Fill up substring matches with typo-tolerant ones ("verstapen", "bathurst")
+    from the trigram search, when there is room left.
+    """
+    if len(matches) >= DISCORD_AUTOCOMPLETE_LIMIT or len(current.strip()) < FUZZY_MIN_LENGTH:
+        return matches
+    for name in await search(current, DISCORD_AUTOCOMPLETE_LIMIT):
+        if name not in matches:
+            matches.append(name)
+    return matches[:DISCORD_AUTOCOMPLETE_LIMIT]
+
 
 async def track_autocomplete(
     interaction: discord.Interaction,
     current: str,
 ) -> list[app_commands.Choice[str]]:
     """Autocomplete for track names."""
-    con = sqlite3.connect(DB_PATH)
-    available = fetch_available_tracks(con)
-    con.close()
-    
-    # Filter tracks based on current input
-    current_lower = current.lower()
-    matches = [
-        app_commands.Choice(name=track[0], value=track[0])
-        for track in available
-        if current_lower in track[0].lower()
-    ][:DISCORD_AUTOCOMPLETE_LIMIT]
-    
-    return matches
+    await names.refresh()
+    tracks = await _with_fuzzy_matches(
+        names.tracks.search(current, DISCORD_AUTOCOMPLETE_LIMIT), current, database.search_tracks
+    )
+    return [app_commands.Choice(name=track, value=track) for track in tracks]
 
 
 async def player_first_name_autocomplete(
@@ -35,31 +42,11 @@ async def player_first_name_autocomplete(
 ) -> list[app_commands.Choice[str]]:
     """Autocomplete for player first names."""
     try:
-        con = sqlite3.connect(DB_PATH)
-        players = fetch_all_players(con)
-        con.close()
-        
-        # Get unique first names (filter out empty strings)
-        first_names = sorted(set([p[0] for p in players if p[0] and p[0].strip()]))
-        
-        if not first_names:
-            return []
-        
-        current_lower = current.lower() if current else ""
-        if current_lower:
-            matches = [
-                app_commands.Choice(name=name, value=name)
-                for name in first_names
-                if current_lower in name.lower()
-            ][:DISCORD_AUTOCOMPLETE_LIMIT]
-        else:
-            # If no input, return first N names
-            matches = [
-                app_commands.Choice(name=name, value=name)
-                for name in first_names[:DISCORD_AUTOCOMPLETE_LIMIT]
-            ]
-        
-        return matches
+        await names.refresh()
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in names.first_names.search(current or "", DISCORD_AUTOCOMPLETE_LIMIT)
+        ]
     except Exception as e:
         logger.warning(f"Error in first_name autocomplete: {e}", exc_info=True)
         return []
@@ -79,25 +66,13 @@ async def player_last_name_autocomplete(
         except:
             pass
         
-        con = sqlite3.connect(DB_PATH)
-        players = fetch_all_players(con)
-        con.close()
-        
+        await names.refresh()
         # Filter by first name if provided
-        if first_name:
-            matching_players = [p for p in players if p[0] == first_name]
-            last_names = sorted(set([p[1] for p in matching_players if p[1]]))
-        else:
-            last_names = sorted(set([p[1] for p in players if p[1]]))
-        
-        current_lower = current.lower()
-        matches = [
+        last_names = names.last_names_for(first_name) if first_name else names.last_names
+        return [
             app_commands.Choice(name=name, value=name)
-            for name in last_names
-            if current_lower in name.lower()
-        ][:DISCORD_AUTOCOMPLETE_LIMIT]
-        
-        return matches
+            for name in last_names.search(current, DISCORD_AUTOCOMPLETE_LIMIT)
+        ]
     except Exception as e:
         logger.warning(f"Error in last_name autocomplete: {e}", exc_info=True)
         return []
@@ -109,50 +84,14 @@ async def player_name_autocomplete(
 ) -> list[app_commands.Choice[str]]:
     """Autocomplete for full player names (first + last)."""
     try:
-        con = sqlite3.connect(DB_PATH)
-        players = fetch_all_players(con)
-        con.close()
-        
-        if not players:
-            return []
-        
-        # Create full names
-        full_names = []
-        for first, last in players:
-            try:
-                if first or last:
-                    full_name = f"{first or ''} {last or ''}".strip()
-                    if full_name:
-                        full_names.append(full_name)
-            except Exception as e:
-                logger.warning(f"Error processing player name: {e}", exc_info=True)
-                continue
-        
-        if not full_names:
-            return []
-        
-        # Remove duplicates and sort
-        unique_names = sorted(set(full_names))
-        
-        # Filter based on current input
-        current_lower = current.lower() if current else ""
-        if current_lower:
-            matches = [
-                app_commands.Choice(name=name, value=name)
-                for name in unique_names
-                if current_lower in name.lower()
-            ][:DISCORD_AUTOCOMPLETE_LIMIT]
-        else:
-            # If no input, return first N names
-            matches = [
-                app_commands.Choice(name=name, value=name)
-                for name in unique_names[:DISCORD_AUTOCOMPLETE_LIMIT]
-            ]
-        
-        return matches
+        await names.refresh()
+        players = await _with_fuzzy_matches(
+            names.players.search(current or "", DISCORD_AUTOCOMPLETE_LIMIT), current or "",
+            database.search_driver_names
+        )
+        return [app_commands.Choice(name=name, value=name) for name in players]
     except Exception as e:
         # Log error but return empty list to prevent Discord from showing error
         logger.error(f"Error in player_name autocomplete: {e}", exc_info=True)
         # Return empty list so Discord doesn't show error to user
         return []
-
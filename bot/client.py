@@ -1,26 +1,139 @@
 """Discord bot client and main event loop."""
-import sqlite3
 import asyncio
 import discord
 from discord import app_commands
 
-from config import DB_PATH, CHANNEL_ID, POLL_SECONDS
-from db.queries import (
-    fetch_queue, mark_sent, fetch_race_results_queue, 
-    fetch_race_session_data, mark_race_results_sent,
-    get_previous_track_record, get_player_rank, get_player_previous_rank
-)
-from bot.embeds import build_track_record_embed, build_personal_best_embed, build_race_results_embed
+from config import CHANNEL_ID, POLL_SECONDS, NOTIFY_PORT, INGEST_IN_BOT
+from db.connection import data_version
+from bot.database import database
+from bot.ingest import run_ingestion
+from bot.rank_index import ranks
+from bot.track_index import track_index
+from bot.scheduler import AnnouncementScheduler, RACE_RESULTS, RECORD
+from bot.digest import plan_posts
+from bot.track_images import load_track_image_urls, load_track_images
 from bot.commands.records import setup_records_command
 from bot.commands.pb import setup_pb_command
 from bot.commands.leaders import setup_leaders_command
 from bot.commands.tracks import setup_tracks_command
 from bot.commands.sync import setup_sync_command
 from bot.commands.help import setup_help_command
+from ingest.notify import listen_for_changes
 from utils.logging_config import logger
+from utils.loop_monitor import monitor_loop_lag
 from utils.errors import handle_database_error
 
 
+async def queue_pending_announcements(scheduler: AnnouncementScheduler, announcement_ids: list[int] | None = None,
+                                      race_results_ids: list[int] | None = None) -> int:
+    """
+    Hand queued TR/PB and race results announcements to `scheduler`: all of
+    them, or only the given IDs (skipping any that were sent meanwhile).
+    Announcements the scheduler already has are skipped too. They are
+    grouped into per-session digests as configured (see bot/digest.py).
+
+    Returns:
+        Number of posts queued
+    """
+    # Process record announcements (TR and PB)
+    rows = [
+        row for row in await database.fetch_queue(announcement_ids, limit=None)
+        if not scheduler.is_pending(RECORD, row[0])
+    ]
+
+    # Process race results announcements
+    race_rows = []
+    try:
+        for (announcement_id, session_id, track, when_utc) in await database.fetch_race_results_queue(race_results_ids, limit=None):
+            if scheduler.is_pending(RACE_RESULTS, announcement_id):
+                # Already queued; don't fetch the session again
+                continue
+            session_data, entries = await database.fetch_race_session_data(session_id)
+
+            if session_data and entries:
+                race_rows.append((announcement_id, session_id, track, when_utc, session_data, entries))
+            else:
+                logger.warning(f"No data found for race session {session_id}")
+    except Exception as e:
+        # Table might not exist yet, ignore
+        if "no such table" not in str(e).lower():
+            handle_database_error(e, "processing race results")
+
+    # Submitted together, so every lane is filled before the first post goes out
+    return sum(scheduler.submit(*post) for post in plan_posts(rows, race_rows))
+
+
+async def run_announcer(channel, events: asyncio.Queue | None = None) -> None:
+    """
+    Send queued announcements whenever the database changes.
+
+    The importer pings NOTIFY_PORT after each commit, which wakes this loop
+    right away. Every POLL_SECONDS it also checks PRAGMA data_version, so
+    changes are still picked up if a ping is lost or the importer runs
+    elsewhere; when nothing changed that check is all the work done.
+
+    With in-process ingestion (bot/ingest.py), IngestResults arrive on
+    `events` and their announcements are queued straight away by ID.
+
+    Posting itself is done by an AnnouncementScheduler (bot/scheduler.py):
+    track records first, then race results, then personal bests, within
+    the channel's rate limit.
+    """
+    wake = asyncio.Event()
+    try:
+        listener = await listen_for_changes(wake.set, NOTIFY_PORT)
+        logger.info(f"Listening for importer notifications on UDP port {NOTIFY_PORT}")
+    except OSError as e:
+        listener = None
+        logger.warning(
+            f"Could not listen on UDP port {NOTIFY_PORT} ({e}); "
+            f"checking for changes every {POLL_SECONDS}s instead"
+        )
+
+    scheduler = AnnouncementScheduler(channel)
+    scheduler.start()
+    seen_version = None
+    try:
+        while True:
+            try:
+                # On the writer connection, so marking posts as sent doesn't count as a change
+                version = await database.write(data_version)
+                if scheduler.failed:
+                    # A post failed and is still pending in the database; look again
+                    scheduler.failed = False
+                    seen_version = None
+                if version != seen_version:
+                    seen_version = version
+                    await queue_pending_announcements(scheduler)
+            except Exception as e:
+                logger.warning(f"Error in announcement loop: {e}", exc_info=True)
+                # Retry on the next tick
+                seen_version = None
+
+            waiters = [asyncio.ensure_future(wake.wait())]
+            if events is not None:
+                waiters.append(asyncio.ensure_future(events.get()))
+            done, pending = await asyncio.wait(waiters, timeout=POLL_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in pending:
+                waiter.cancel()
+            wake.clear()
+
+            results = [waiter.result() for waiter in done if waiter is not waiters[0]]
+            while events is not None and not events.empty():
+                results.append(events.get_nowait())
+            for result in results:
+                try:
+                    race_ids = [result.race_results_announcement_id] if result.race_results_announcement_id else []
+                    await queue_pending_announcements(scheduler, result.announcement_ids, race_ids)
+                except Exception as e:
+                    # Still queued in the database; the data_version check retries it
+                    logger.warning(f"Error announcing {result.filename}: {e}", exc_info=True)
+    finally:
+        await scheduler.stop()
+        if listener is not None:
+            listener.close()
+
+
 def create_bot() -> tuple[discord.Client, app_commands.CommandTree]:
     """Create and configure the Discord bot client."""
     intents = discord.Intents.default()
@@ -35,8 +148,11 @@ def create_bot() -> tuple[discord.Client, app_commands.CommandTree]:
     setup_sync_command(tree)
     setup_help_command(tree)
     
+    announcer_started = False
+
     @client.event
     async def on_ready():
+        nonlocal announcer_started
         channel = client.get_channel(CHANNEL_ID)
         if channel is None:
             logger.error(f"Could not find channel {CHANNEL_ID}. Is the bot in the server and has access?")
@@ -52,71 +168,34 @@ def create_bot() -> tuple[discord.Client, app_commands.CommandTree]:
         except Exception as e:
             logger.error(f"Failed to sync commands: {e}", exc_info=True)
 
-        while True:
-            try:
-                con = sqlite3.connect(DB_PATH)
-                
-                # Process record announcements (TR and PB)
-                rows = fetch_queue(con)
-                for (
-                    announcement_id, track, stype, best_ms, when_utc,
-                    announcement_type, player_id, first, last, short, car_model
-                ) in rows:
-                    # Build embed based on announcement type
-                    if announcement_type == "PB":
-                        # Get rank information for PB subtitle
-                        current_rank, _ = get_player_rank(con, track, stype, best_ms, first or "", last or "")
-                        previous_rank = get_player_previous_rank(con, track, stype, best_ms, first or "", last or "")
-                        
-                        embed, img_file = build_personal_best_embed(
-                            track, stype, best_ms, when_utc, first, last, short, car_model,
-                            previous_rank=previous_rank, current_rank=current_rank
-                        )
-                    else:  # TR (Track Record)
-                        # Get previous record for improvement subtitle
-                        previous_record_ms = get_previous_track_record(con, track, stype, best_ms)
-                        
-                        embed, img_file = build_track_record_embed(
-                            track, stype, best_ms, when_utc, first, last, short, car_model,
-                            previous_record_ms=previous_record_ms
-                        )
-                    
-                    # Send embed with image if available
-                    if img_file:
-                        sent = await channel.send(embed=embed, file=img_file)
-                    else:
-                        sent = await channel.send(embed=embed)
-                    
-                    mark_sent(con, announcement_id, sent.id)
-                
-                # Process race results announcements
-                try:
-                    race_rows = fetch_race_results_queue(con)
-                    for (announcement_id, session_id, track, when_utc) in race_rows:
-                        session_data, entries = fetch_race_session_data(con, session_id)
-                        
-                        if session_data and entries:
-                            embed, img_file = build_race_results_embed(track, session_data, entries, when_utc)
-                            
-                            if img_file:
-                                sent = await channel.send(embed=embed, file=img_file)
-                            else:
-                                sent = await channel.send(embed=embed)
-                            
-                            mark_race_results_sent(con, announcement_id, sent.id)
-                        else:
-                            logger.warning(f"No data found for race session {session_id}")
-                except Exception as e:
-                    # Table might not exist yet, ignore
-                    if "no such table" not in str(e).lower():
-                        handle_database_error(e, "processing race results")
+        if announcer_started:
+            # on_ready fires again after a reconnect; one announcer is enough
+            return
+        announcer_started = True
 
-                con.close()
+        # Warm up the caches announcements and commands use
+        await load_track_images()
+        await load_track_image_urls()
+        try:
+            await ranks.refresh()
+        except Exception as e:
+            logger.warning(f"Could not build the rank index yet: {e}", exc_info=True)
+        try:
+            await track_index.refresh()
+        except Exception as e:
+            logger.warning(f"Could not build the track index yet: {e}", exc_info=True)
 
-            except Exception as e:
-                logger.warning(f"Error in announcement loop: {e}", exc_info=True)
+        # Background tasks run as long as the announcer does
+        background_tasks = [asyncio.create_task(monitor_loop_lag())]
+        events = None
+        if INGEST_IN_BOT:
+            events = asyncio.Queue()
+            background_tasks.append(asyncio.create_task(run_ingestion(events)))
+        try:
+            await run_announcer(channel, events)
+        finally:
+            for task in background_tasks:
+                task.cancel()
 
-            await asyncio.sleep(POLL_SECONDS)
-    
     return client, tree
 
@@ -1,14 +1,13 @@
 """Help command - show all available commands and usage."""
-import sqlite3
 import discord
 from discord import app_commands
 
-from config import CHANNEL_ID, DB_PATH
+from config import CHANNEL_ID
 from utils.errors import create_channel_restriction_embed, handle_command_error
 from utils.formatting import format_track_name, format_driver_name
 from utils.logging_config import logger
 from constants import DEFAULT_TOP_TIMES_LIMIT
-from db.queries import fetch_available_tracks, fetch_all_players
+from bot.database import database
 
 
 def setup_help_command(tree: app_commands.CommandTree) -> None:
@@ -29,20 +28,16 @@ def setup_help_command(tree: app_commands.CommandTree) -> None:
         example_player = None
         
         try:
-            con = sqlite3.connect(DB_PATH)
-            
             # Get first available track as example
-            tracks = fetch_available_tracks(con)
+            tracks = await database.fetch_available_tracks()
             if tracks:
                 example_track = format_track_name(tracks[0][0])
             
             # Get first available player as example
-            players = fetch_all_players(con)
+            players = await database.fetch_all_players()
             if players:
                 first_name, last_name = players[0]
                 example_player = format_driver_name(first_name, last_name, None)
-            
-            con.close()
         except Exception as e:
             logger.warning(f"Failed to fetch examples for help command: {e}")
             # Continue with default examples if database query fails
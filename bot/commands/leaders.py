@@ -3,9 +3,9 @@ import sqlite3
 import discord
 from discord import app_commands
 
-from config import DB_PATH, CHANNEL_ID
+from config import CHANNEL_ID
 from constants import DISCORD_FIELD_VALUE_LIMIT, DISCORD_EMBED_FIELD_LIMIT, TRACKS_PER_FIELD, DEFAULT_TOP_TIMES_LIMIT
-from db.queries import fetch_all_tracks_top_times
+from bot.database import database
 from utils.formatting import fmt_ms, fmt_dt, fmt_car_model, format_driver_name, format_track_name
 from utils.errors import handle_command_error, create_channel_restriction_embed
 from utils.logging_config import logger
@@ -25,9 +25,7 @@ def setup_leaders_command(tree: app_commands.CommandTree) -> None:
         await interaction.response.defer(thinking=True)
 
         try:
-            con = sqlite3.connect(DB_PATH)
-            tracks_data = fetch_all_tracks_top_times(con)
-            con.close()
+            tracks_data = await database.fetch_all_tracks_top_times()
 
             if not tracks_data:
                 embed = discord.Embed(
@@ -155,15 +153,7 @@ def setup_leaders_command(tree: app_commands.CommandTree) -> None:
                 await handle_command_error(interaction, e, "sending the results")
                 
         except sqlite3.Error as e:
-            try:
-                con.close()
-            except:
-                pass
             await handle_command_error(interaction, e, "retrieving leaderboard data")
         except Exception as e:
-            try:
-                con.close()
-            except:
-                pass
             await handle_command_error(interaction, e, "processing your request")
 
@@ -4,14 +4,14 @@ import json
 import discord
 from discord import app_commands
 
-from config import DB_PATH, CHANNEL_ID
+from config import CHANNEL_ID
 from constants import MEDAL_EMOJIS, TOP_3_POSITIONS
-from db.queries import (
-    find_track_match, fetch_player_pb_with_sectors, fetch_track_record_with_sectors,
-    get_player_rank, get_session_count, get_previous_pb
-)
+from bot.database import database
+from bot.rank_index import ranks
+from bot.track_index import track_index
+from bot.track_images import remember_track_image
 from utils.formatting import fmt_ms, fmt_dt, fmt_split_ms, fmt_car_model, format_track_name
-from utils.images import find_track_image
+from utils.images import track_thumbnail
 from utils.errors import handle_command_error, create_warning_embed, create_channel_restriction_embed
 from utils.logging_config import logger
 from bot.autocomplete import player_name_autocomplete, track_autocomplete
@@ -32,25 +32,25 @@ def setup_pb_command(tree: app_commands.CommandTree) -> None:
         await interaction.response.defer(thinking=True)
 
         try:
-            # Parse full name into first and last name
-            name_parts = player.strip().split(None, 1)
-            if len(name_parts) == 1:
-                first_name = name_parts[0]
-                last_name = ""
-            else:
-                first_name = name_parts[0]
-                last_name = name_parts[1]
+            # Find the player by any name they've raced under
+            found = await database.find_player(player)
+            player_key, player_name = found if found else (None, player)
 
-            con = sqlite3.connect(DB_PATH)
-            
             # Find matching track name
-            actual_track = find_track_match(con, track)
+            actual_track = await track_index.resolve(track)
             if not actual_track:
-                con.close()
+                suggestions = await database.search_tracks(track)
+                did_you_mean = ""
+                if suggestions:
+                    did_you_mean = "Did you mean " + ", ".join(
+                        f"**{format_track_name(t)}**" for t in suggestions
+                    ) + "?\n\n"
+
                 embed = create_warning_embed(
                     title="Track Not Found",
                     description=(
                         f"Track **{track}** not found.\n\n"
+                        f"{did_you_mean}"
                         f"Use `/tracks` to see all available tracks."
                     )
                 )
@@ -58,16 +58,26 @@ def setup_pb_command(tree: app_commands.CommandTree) -> None:
                 return
 
             # Get PB data for both Q and R
-            q_pb = fetch_player_pb_with_sectors(con, first_name or "", last_name or "", actual_track, "Q")
-            r_pb = fetch_player_pb_with_sectors(con, first_name or "", last_name or "", actual_track, "R")
+            q_pb = r_pb = None
+            if player_key is not None:
+                q_pb = await database.fetch_player_pb_with_sectors(player_key, actual_track, "Q")
+                r_pb = await database.fetch_player_pb_with_sectors(player_key, actual_track, "R")
 
             if not q_pb and not r_pb:
-                con.close()
                 formatted_track = format_track_name(actual_track)
+                suggestions = [
+                    name for name in await database.search_driver_names(player)
+                    if name.lower() != player.strip().lower()
+                ]
+                did_you_mean = ""
+                if suggestions:
+                    did_you_mean = "Did you mean " + ", ".join(f"**{name}**" for name in suggestions) + "?\n\n"
+
                 embed = create_warning_embed(
                     title="No Personal Bests Found",
                     description=(
                         f"No personal bests found for **{player}** at **{formatted_track}**.\n\n"
+                        f"{did_you_mean}"
                         f"*Make sure you've spelled the name correctly. Use autocomplete to help find the correct name.*"
                     )
                 )
@@ -75,23 +85,23 @@ def setup_pb_command(tree: app_commands.CommandTree) -> None:
                 return
 
             # Get track records for comparison
-            q_record = fetch_track_record_with_sectors(con, actual_track, "Q")
-            r_record = fetch_track_record_with_sectors(con, actual_track, "R")
+            q_record = await database.fetch_track_record_with_sectors(actual_track, "Q")
+            r_record = await database.fetch_track_record_with_sectors(actual_track, "R")
 
             # Format track name for display
             formatted_track = format_track_name(actual_track)
             
             # Create embed
             embed = discord.Embed(
-                title=f"🎯 Personal Best: {player}",
+                title=f"🎯 Personal Best: {player_name}",
                 description=f"🏁 **{formatted_track}**",
                 color=discord.Color.green()
             )
 
             # Add track image thumbnail
-            img_filename, img_file = find_track_image(actual_track)
-            if img_file:
-                embed.set_thumbnail(url=f"attachment://{img_filename}")
+            thumbnail_url, img_file = track_thumbnail(actual_track)
+            if thumbnail_url:
+                embed.set_thumbnail(url=thumbnail_url)
 
             # Helper function to parse sectors from JSON
             def parse_sectors(splits_json):
@@ -198,7 +208,7 @@ def setup_pb_command(tree: app_commands.CommandTree) -> None:
                     q_value += f"📅 **Set**: {fmt_dt(q_set_at_utc)}\n"
                 
                 # Add rank
-                rank, total = get_player_rank(con, actual_track, "Q", q_best_ms, first_name or "", last_name or "")
+                rank, total = await ranks.get_player_rank(actual_track, "Q", q_best_ms)
                 if rank and total:
                     medal = MEDAL_EMOJIS.get(rank, "")
                     q_value += f"📊 **Rank**: {medal} #{rank} of {total}\n"
@@ -213,7 +223,7 @@ def setup_pb_command(tree: app_commands.CommandTree) -> None:
                         q_value += f"🏆 **vs Record**: +{gap_str}\n"
                 
                 # Add session count
-                session_count = get_session_count(con, actual_track, "Q", first_name or "", last_name or "")
+                session_count = await database.get_session_count(actual_track, "Q", player_key)
                 if session_count > 0:
                     q_value += f"🔄 **Sessions**: {session_count}\n"
                 
@@ -253,7 +263,7 @@ def setup_pb_command(tree: app_commands.CommandTree) -> None:
                     r_value += f"📅 **Set**: {fmt_dt(r_set_at_utc)}\n"
                 
                 # Add rank
-                rank, total = get_player_rank(con, actual_track, "R", r_best_ms, first_name or "", last_name or "")
+                rank, total = await ranks.get_player_rank(actual_track, "R", r_best_ms)
                 if rank and total:
                     medal = MEDAL_EMOJIS.get(rank, "")
                     r_value += f"📊 **Rank**: {medal} #{rank} of {total}\n"
@@ -268,7 +278,7 @@ def setup_pb_command(tree: app_commands.CommandTree) -> None:
                         r_value += f"🏆 **vs Record**: +{gap_str}\n"
                 
                 # Add session count
-                session_count = get_session_count(con, actual_track, "R", first_name or "", last_name or "")
+                session_count = await database.get_session_count(actual_track, "R", player_key)
                 if session_count > 0:
                     r_value += f"🔄 **Sessions**: {session_count}\n"
                 
@@ -287,12 +297,11 @@ def setup_pb_command(tree: app_commands.CommandTree) -> None:
                         inline=False
                     )
 
-            con.close()
-
             # Send embed
             try:
                 if img_file:
-                    await interaction.followup.send(embed=embed, file=img_file)
+                    sent = await interaction.followup.send(embed=embed, file=img_file, wait=True)
+                    await remember_track_image(img_file, sent)
                 else:
                     await interaction.followup.send(embed=embed)
             except Exception as e:
@@ -300,14 +309,6 @@ def setup_pb_command(tree: app_commands.CommandTree) -> None:
                 await handle_command_error(interaction, e, "sending the results")
                 
         except sqlite3.Error as e:
-            try:
-                con.close()
-            except:
-                pass
             await handle_command_error(interaction, e, "retrieving personal best data")
         except Exception as e:
-            try:
-                con.close()
-            except:
-                pass
             await handle_command_error(interaction, e, "processing your request")
@@ -3,11 +3,13 @@ import sqlite3
 import discord
 from discord import app_commands
 
-from config import DB_PATH, CHANNEL_ID
+from config import CHANNEL_ID
 from constants import DEFAULT_TOP_TIMES_LIMIT, MEDAL_EMOJIS
-from db.queries import find_track_match, fetch_track_top_times, fetch_available_tracks
+from bot.database import database
+from bot.track_index import track_index
+from bot.track_images import remember_track_image
 from utils.formatting import fmt_ms, fmt_dt, fmt_split_ms, fmt_car_model, format_driver_name, format_track_name
-from utils.images import find_track_image
+from utils.images import track_thumbnail
 from utils.errors import handle_command_error, create_error_embed, create_warning_embed, create_channel_restriction_embed
 from utils.logging_config import logger
 from bot.autocomplete import track_autocomplete
@@ -28,22 +30,21 @@ def setup_records_command(tree: app_commands.CommandTree) -> None:
         await interaction.response.defer(thinking=True)
 
         try:
-            con = sqlite3.connect(DB_PATH)
-            
             # Try to find matching track name (case-insensitive)
-            actual_track = find_track_match(con, track)
+            actual_track = await track_index.resolve(track)
             if not actual_track:
-                available = fetch_available_tracks(con)
-                con.close()
-                
-                track_list = ", ".join([t[0] for t in available[:20]])  # Show first 20
-                if len(available) > 20:
-                    track_list += f", ... ({len(available)} total)"
-                
+                suggestions = await database.search_tracks(track)
+                did_you_mean = ""
+                if suggestions:
+                    did_you_mean = "Did you mean " + ", ".join(
+                        f"**{format_track_name(t)}**" for t in suggestions
+                    ) + "?\n\n"
+
                 embed = create_warning_embed(
                     title="Track Not Found",
                     description=(
                         f"No track found matching **{track}**.\n\n"
+                        f"{did_you_mean}"
                         f"Use `/tracks` to see all available tracks.\n"
                         f"*Track names are case-insensitive and can use spaces or underscores.*"
                     )
@@ -52,8 +53,7 @@ def setup_records_command(tree: app_commands.CommandTree) -> None:
                 return
             
             # Get top times for both Q and R
-            q_times, r_times = fetch_track_top_times(con, actual_track, limit=DEFAULT_TOP_TIMES_LIMIT)
-            con.close()
+            q_times, r_times = await database.fetch_track_top_times(actual_track, limit=DEFAULT_TOP_TIMES_LIMIT)
 
             if not q_times and not r_times:
                 formatted_track = format_track_name(actual_track)
@@ -67,11 +67,9 @@ def setup_records_command(tree: app_commands.CommandTree) -> None:
                 await interaction.followup.send(embed=embed)
                 return
         except sqlite3.Error as e:
-            con.close()
             await handle_command_error(interaction, e, "retrieving track records")
             return
         except Exception as e:
-            con.close()
             await handle_command_error(interaction, e, "processing your request")
             return
 
@@ -85,9 +83,9 @@ def setup_records_command(tree: app_commands.CommandTree) -> None:
         )
         
         # Try to find and attach track image as thumbnail (appears near top, under title)
-        img_filename, img_file = find_track_image(actual_track)
-        if img_file:
-            embed.set_thumbnail(url=f"attachment://{img_filename}")
+        thumbnail_url, img_file = track_thumbnail(actual_track)
+        if thumbnail_url:
+            embed.set_thumbnail(url=thumbnail_url)
         
         # Qualifying section
         if q_times:
@@ -157,7 +155,8 @@ def setup_records_command(tree: app_commands.CommandTree) -> None:
         # Send embed with image file if found
         try:
             if img_file:
-                await interaction.followup.send(embed=embed, file=img_file)
+                sent = await interaction.followup.send(embed=embed, file=img_file, wait=True)
+                await remember_track_image(img_file, sent)
             else:
                 await interaction.followup.send(embed=embed)
         except Exception as e:
@@ -3,11 +3,10 @@ import sqlite3
 import discord
 from discord import app_commands
 
-from config import DB_PATH, CHANNEL_ID
+from config import CHANNEL_ID
 from constants import DISCORD_FIELD_VALUE_LIMIT
-from db.queries import fetch_available_tracks
+from bot.track_index import track_index
 from utils.errors import handle_command_error, create_channel_restriction_embed
-from utils.formatting import format_track_name
 from utils.logging_config import logger
 
 
@@ -25,9 +24,7 @@ def setup_tracks_command(tree: app_commands.CommandTree) -> None:
         await interaction.response.defer(thinking=True)
 
         try:
-            con = sqlite3.connect(DB_PATH)
-            available = fetch_available_tracks(con)
-            con.close()
+            available = await track_index.available()
 
             if not available:
                 embed = discord.Embed(
@@ -39,8 +36,7 @@ def setup_tracks_command(tree: app_commands.CommandTree) -> None:
                 return
 
             # Format track list - format names for display
-            track_names = [t[0] for t in available]
-            sorted_tracks = sorted([format_track_name(name) for name in track_names])
+            sorted_tracks = sorted(track_index.display_name(name) for name in available)
         
             # Create embed
             embed = discord.Embed(
@@ -91,15 +87,7 @@ def setup_tracks_command(tree: app_commands.CommandTree) -> None:
                 await handle_command_error(interaction, e, "sending the results")
                 
         except sqlite3.Error as e:
-            try:
-                con.close()
-            except:
-                pass
             await handle_command_error(interaction, e, "retrieving track list")
         except Exception as e:
-            try:
-                con.close()
-            except:
-                pass
             await handle_command_error(interaction, e, "processing your request")
 
@@ -0,0 +1,119 @@
+"""
+Async database access for the bot.
+
+sqlite3 calls block, so running them inside a command handler stalls the
+event loop: gateway heartbeats and every other user's interaction wait for
+the query. Queries go through `database` instead, which runs them on a small
+thread pool. Each reader thread keeps one long-lived read-only connection,
+and writes (marking announcements as sent) go through a single writer thread
+with its own read-write connection.
+
+Every function in db/queries.py is available as an awaitable method with the
+connection argument left out:
+
+    tracks = await database.fetch_available_tracks()
+    q_times, r_times = await database.fetch_track_top_times(track, limit=10)
+"""
+import asyncio
+import functools
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import db.queries as queries
+from config import DB_PATH
+from db.connection import begin_write, connect, data_version
+
+# Concurrent read queries; SQLite readers don't block each other in WAL mode
+DB_READER_THREADS = 4
+
+
+class AsyncDatabase:
+    """Thread pool of database connections with awaitable query methods."""
+
+    def __init__(self, db_path: str, readers: int = DB_READER_THREADS) -> None:
+        self.db_path = db_path
+        self._local = threading.local()
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        # In-memory indexes check for changes on every lookup: never behind queries or writes
+        self._version = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-version")
+
+    def _call(self, readonly: bool, func: Callable, args: tuple, kwargs: dict) -> Any:
+        """Run func(con, ...) with this thread's connection (opened on first use)."""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._local.con = connect(self.db_path, readonly=readonly)
+        try:
+            return func(con, *args, **kwargs)
+        except sqlite3.Error:
+            # Start over with a fresh connection next time (e.g. the file was replaced)
+            if con.in_transaction:
+                con.rollback()
+            con.close()
+            self._local.con = None
+            raise
+
+    async def read(self, func: Callable, *args, **kwargs) -> Any:
+        """Await func(con, *args, **kwargs) on a read-only connection."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._readers, functools.partial(self._call, True, func, args, kwargs)
+        )
+
+    async def write(self, func: Callable, *args, **kwargs) -> Any:
+        """Await func(con, *args, **kwargs) on the writer thread's read-write connection."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._writer, functools.partial(self._call, False, func, args, kwargs)
+        )
+
+    async def data_version(self) -> int:
+        """
+        PRAGMA data_version on a connection of its own, for caches that
+        rebuild when the database changes. Only compare it with earlier
+        results of this method; the bot's own writes count as changes here.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._version, functools.partial(self._call, True, data_version, (), {})
+        )
+
+    async def mark_sent(self, announcement_id: int, message_id: int) -> None:
+        await self.write(_in_write_transaction(queries.mark_sent), announcement_id, message_id)
+
+    async def mark_race_results_sent(self, announcement_id: int, message_id: int) -> None:
+        await self.write(_in_write_transaction(queries.mark_race_results_sent), announcement_id, message_id)
+
+    async def mark_announcements_sent(self, record_messages: list[tuple[int, int]],
+                                      race_results_messages: list[tuple[int, int]]) -> None:
+        await self.write(_in_write_transaction(queries.mark_announcements_sent), record_messages, race_results_messages)
+
+    async def save_track_image_urls(self, urls: list[tuple[str, str, str]]) -> None:
+        await self.write(_in_write_transaction(queries.save_track_image_urls), urls)
+
+    async def save_track_details(self, details: list[tuple[str, str | None, str]]) -> None:
+        await self.write(_in_write_transaction(queries.save_track_details), details)
+
+    def __getattr__(self, name: str) -> Callable:
+        func = getattr(queries, name, None)
+        if name.startswith("_") or not callable(func):
+            raise AttributeError(name)
+
+        @functools.wraps(func)
+        async def query(*args, **kwargs):
+            return await self.read(func, *args, **kwargs)
+        return query
+
+
+def _in_write_transaction(func: Callable) -> Callable:
+    """Wrap a db.queries write so it takes the write lock first (see begin_write)."""
+    @functools.wraps(func)
+    def wrapper(con, *args, **kwargs):
+        begin_write(con)
+        return func(con, *args, **kwargs)
+    return wrapper
+
+
+database = AsyncDatabase(DB_PATH)
@@ -0,0 +1,189 @@
+"""
+Turn queued announcements into posts, optionally one digest per session.
+
+ANNOUNCEMENT_DIGEST in config.py sets the mode for each announcement type
+("TR", "PB" and "RACE" for race results):
+
+- "single": one message per announcement
+- "digest": the session's announcements share one message (up to 10
+  embeds per message, more messages if needed)
+- "compact": PBs only; one embed lists every driver's PB of the session,
+  posted with the session's digest
+
+A busy qualifying session (a TR and a dozen PBs) then takes one or two
+messages and one track image upload, instead of a message and an upload
+per driver.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import discord
+
+from config import ANNOUNCEMENT_DIGEST
+from constants import DISCORD_MESSAGE_CHAR_LIMIT, DISCORD_MESSAGE_EMBED_LIMIT
+from bot.database import database
+from bot.rank_index import ranks
+from bot.embeds import (
+    build_personal_best_digest_embed, build_personal_best_embed, build_race_results_embed,
+    build_track_record_embed,
+)
+from bot.scheduler import (
+    Message, PRIORITY_PERSONAL_BEST, PRIORITY_RACE_RESULTS, PRIORITY_TRACK_RECORD, RACE_RESULTS, RECORD,
+)
+
+SINGLE = "single"
+DIGEST = "digest"
+COMPACT = "compact"
+
+# ANNOUNCEMENT_DIGEST key for race results
+RACE_RESULTS_TYPE = "RACE"
+
+# (priority, keys, build) as taken by AnnouncementScheduler.submit()
+PlannedPost = tuple[int, list[tuple[str, int]], Callable[[], Awaitable[list[Message]]]]
+
+
+def digest_mode(announcement_type: str) -> str:
+    """Configured mode for an announcement type ("TR", "PB" or "RACE")."""
+    mode = ANNOUNCEMENT_DIGEST.get(announcement_type, SINGLE)
+    if mode == COMPACT and announcement_type != "PB":
+        # Only PBs have a compact embed
+        return DIGEST
+    if mode not in (SINGLE, DIGEST, COMPACT):
+        return SINGLE
+    return mode
+
+
+async def build_record_embed(row: tuple[Any, ...]) -> tuple[discord.Embed, discord.File | None]:
+    """Embed for one fetch_queue() row, with its rank or previous record subtitle."""
+    (
+        announcement_id, track, stype, best_ms, when_utc,
+        announcement_type, player_key, first, last, short, car_model, session_id
+    ) = row
+    if announcement_type == "PB":
+        # Get rank information for PB subtitle
+        current_rank, _ = await ranks.get_player_rank(track, stype, best_ms)
+        previous_rank = None
+        if player_key is not None:
+            previous_rank = await ranks.get_player_previous_rank(track, stype, best_ms, player_key)
+
+        return build_personal_best_embed(
+            track, stype, best_ms, when_utc, first, last, short, car_model,
+            previous_rank=previous_rank, current_rank=current_rank
+        )
+
+    # TR (Track Record): get previous record for improvement subtitle
+    previous_record_ms = await database.get_previous_track_record(track, stype, best_ms)
+
+    return build_track_record_embed(
+        track, stype, best_ms, when_utc, first, last, short, car_model,
+        previous_record_ms=previous_record_ms
+    )
+
+
+async def _personal_best_line(row: tuple[Any, ...]) -> tuple[Any, ...]:
+    """One driver's entry for build_personal_best_digest_embed()."""
+    _, track, stype, best_ms, _, _, player_key, first, last, short, car_model, _ = row
+    current_rank, _ = await ranks.get_player_rank(track, stype, best_ms)
+    previous_rank = None
+    if player_key is not None:
+        previous_rank = await ranks.get_player_previous_rank(track, stype, best_ms, player_key)
+    return first, last, short, car_model, best_ms, previous_rank, current_rank
+
+
+def pack_messages(parts: list[tuple[discord.Embed, discord.File | None]]) -> list[Message]:
+    """
+    Pack embeds into as few messages as Discord allows (embeds and characters
+    per message). Embeds of one session share a track image, so each
+    message uploads it once and the duplicate files are closed.
+    """
+    messages: list[Message] = []
+    embeds: list[discord.Embed] = []
+    img_file = None
+    chars = 0
+    for embed, part_file in parts:
+        if embeds and (len(embeds) >= DISCORD_MESSAGE_EMBED_LIMIT or chars + len(embed) > DISCORD_MESSAGE_CHAR_LIMIT):
+            messages.append((embeds, img_file))
+            embeds, img_file, chars = [], None, 0
+        embeds.append(embed)
+        chars += len(embed)
+        if part_file is None:
+            continue
+        if img_file is None:
+            img_file = part_file
+        else:
+            part_file.close()
+    if embeds:
+        messages.append((embeds, img_file))
+    return messages
+
+
+def plan_posts(record_rows: list[tuple[Any, ...]], race_rows: list[tuple[Any, ...]]) -> list[PlannedPost]:
+    """
+    Group announcements into posts according to ANNOUNCEMENT_DIGEST.
+
+    Args:
+        record_rows: fetch_queue() rows
+        race_rows: (announcement_id, session_id, track, when_utc, session_data, entries)
+            for race results, with the session data already fetched
+
+    Returns:
+        (priority, keys, build) for each post; a digest takes the priority of
+        its most important announcement
+    """
+    posts: list[PlannedPost] = []
+    # session_id -> announcements of digest types, in the order they appear in the digest
+    sessions: dict[int, dict[str, list]] = {}
+
+    def session(session_id: int) -> dict[str, list]:
+        return sessions.setdefault(session_id, {"TR": [], RACE_RESULTS_TYPE: [], "PB": []})
+
+    for row in record_rows:
+        announcement_type, session_id = row[5], row[11]
+        if announcement_type != "PB":
+            announcement_type = "TR"
+        if session_id is None or digest_mode(announcement_type) == SINGLE:
+            priority = PRIORITY_PERSONAL_BEST if announcement_type == "PB" else PRIORITY_TRACK_RECORD
+
+            async def build(row=row):
+                return pack_messages([await build_record_embed(row)])
+            posts.append((priority, [(RECORD, row[0])], build))
+        else:
+            session(session_id)[announcement_type].append(row)
+
+    for race in race_rows:
+        announcement_id, session_id, track, when_utc, session_data, entries = race
+        if digest_mode(RACE_RESULTS_TYPE) == SINGLE:
+            async def build(race=race):
+                return pack_messages([build_race_results_embed(race[2], race[4], race[5], race[3])])
+            posts.append((PRIORITY_RACE_RESULTS, [(RACE_RESULTS, announcement_id)], build))
+        else:
+            session(session_id)[RACE_RESULTS_TYPE].append(race)
+
+    for grouped in sessions.values():
+        track_records, races, personal_bests = grouped["TR"], grouped[RACE_RESULTS_TYPE], grouped["PB"]
+        keys = (
+            [(RECORD, row[0]) for row in track_records]
+            + [(RACE_RESULTS, race[0]) for race in races]
+            + [(RECORD, row[0]) for row in personal_bests]
+        )
+        priority = min(
+            lane for members, lane in (
+                (track_records, PRIORITY_TRACK_RECORD),
+                (races, PRIORITY_RACE_RESULTS),
+                (personal_bests, PRIORITY_PERSONAL_BEST),
+            ) if members
+        )
+
+        async def build(track_records=track_records, races=races, personal_bests=personal_bests):
+            parts = [await build_record_embed(row) for row in track_records]
+            parts += [build_race_results_embed(race[2], race[4], race[5], race[3]) for race in races]
+            if digest_mode("PB") == COMPACT and len(personal_bests) > 1:
+                _, track, stype, _, when_utc, *_ = personal_bests[0]
+                lines = await asyncio.gather(*(_personal_best_line(row) for row in personal_bests))
+                parts.append(build_personal_best_digest_embed(track, stype, when_utc, list(lines)))
+            else:
+                parts += await asyncio.gather(*(build_record_embed(row) for row in personal_bests))
+            return pack_messages(parts)
+        posts.append((priority, keys, build))
+
+    return posts
@@ -3,9 +3,12 @@ import discord
 from datetime import datetime, timezone
 from typing import Any
 
-from constants import MEDAL_EMOJIS, MAX_RACE_RESULTS_DISPLAY, TOP_3_POSITIONS
+from constants import (
+    DISCORD_EMBED_FIELD_LIMIT, DISCORD_FIELD_VALUE_LIMIT, DISCORD_MESSAGE_CHAR_LIMIT,
+    MEDAL_EMOJIS, MAX_RACE_RESULTS_DISPLAY, TOP_3_POSITIONS,
+)
 from utils.formatting import fmt_ms, fmt_dt, fmt_split_ms, fmt_car_model, format_driver_name, format_track_name
-from utils.images import find_track_image
+from utils.images import track_thumbnail
 
 
 def build_track_record_embed(
@@ -69,13 +72,12 @@ def build_track_record_embed(
         inline=False
     )
     
-    # Try to add track image thumbnail
-    img_filename, img_file = find_track_image(track)
-    if img_file:
-        embed.set_thumbnail(url=f"attachment://{img_filename}")
-        return embed, img_file
+    # Track image thumbnail: an already uploaded copy, or the file to upload
+    thumbnail_url, img_file = track_thumbnail(track)
+    if thumbnail_url:
+        embed.set_thumbnail(url=thumbnail_url)
     
-    return embed, None
+    return embed, img_file
 
 
 def build_personal_best_embed(
@@ -142,13 +144,85 @@ def build_personal_best_embed(
         inline=False
     )
     
-    # Try to add track image thumbnail
-    img_filename, img_file = find_track_image(track)
-    if img_file:
-        embed.set_thumbnail(url=f"attachment://{img_filename}")
-        return embed, img_file
+    # Track image thumbnail: an already uploaded copy, or the file to upload
+    thumbnail_url, img_file = track_thumbnail(track)
+    if thumbnail_url:
+        embed.set_thumbnail(url=thumbnail_url)
     
-    return embed, None
+    return embed, img_file
+
+
+def build_personal_best_digest_embed(
+    track: str,
+    stype: str,
+    when_utc: str,
+    pbs: list[tuple[str | None, str | None, str | None, int | None, int, int | None, int | None]]
+) -> tuple[discord.Embed, discord.File | None]:
+    """
+    Build one Discord embed listing every personal best set in a session.
+    
+    Args:
+        track: Track name
+        stype: Session type ('Q' or 'R')
+        when_utc: When the session finished
+        pbs: (first, last, short, car_model, best_ms, previous_rank, current_rank)
+            for each personal best
+    """
+    session_label = "Qualifying" if stype == "Q" else "Race"
+    session_emoji = "🏁" if stype == "Q" else "🏎️"
+    formatted_track = format_track_name(track)
+    
+    embed = discord.Embed(
+        title="🎯 PERSONAL BESTS ACHIEVED! 🎯",
+        description=(
+            f"{session_emoji} **{formatted_track}** - {session_label}\n"
+            f"**{len(pbs)} driver{'s' if len(pbs) != 1 else ''} set a new personal best**"
+        ),
+        color=discord.Color.green(),
+        timestamp=datetime.now(timezone.utc)
+    )
+    
+    # One line per driver, fastest first, with the same rank notes as the single PB embed
+    lines = []
+    for first, last, short, car_model, best_ms, previous_rank, current_rank in sorted(pbs, key=lambda pb: pb[4]):
+        line = f"**{fmt_ms(best_ms)}** — {format_driver_name(first, last, short)} `{fmt_car_model(car_model)}`"
+        if previous_rank is not None and current_rank is not None and previous_rank > current_rank:
+            line += f" 🚀 +{previous_rank - current_rank}"
+        elif previous_rank is None and current_rank is not None:
+            line += f" ✨ #{current_rank}"
+        lines.append(line)
+    
+    # Split the lines over as many fields as needed, leaving room for the date field
+    fields = []
+    chars = len(embed.title) + len(embed.description)
+    while lines and len(fields) < DISCORD_EMBED_FIELD_LIMIT - 1:
+        value = lines[0]
+        taken = 1
+        while taken < len(lines) and len(value) + 1 + len(lines[taken]) <= DISCORD_FIELD_VALUE_LIMIT:
+            value += "\n" + lines[taken]
+            taken += 1
+        if chars + len(value) > DISCORD_MESSAGE_CHAR_LIMIT - 200:
+            break
+        fields.append(value)
+        chars += len(value) + len("👤 Drivers (cont.)")
+        lines = lines[taken:]
+    for i, value in enumerate(fields):
+        embed.add_field(name="👤 Drivers" if i == 0 else "👤 Drivers (cont.)", value=value, inline=False)
+    if lines:
+        embed.add_field(name="➕ More", value=f"...and {len(lines)} more", inline=False)
+    
+    embed.add_field(
+        name="📅 Set On",
+        value=fmt_dt(when_utc),
+        inline=False
+    )
+    
+    # Track image thumbnail: an already uploaded copy, or the file to upload
+    thumbnail_url, img_file = track_thumbnail(track)
+    if thumbnail_url:
+        embed.set_thumbnail(url=thumbnail_url)
+    
+    return embed, img_file
 
 
 def build_race_results_embed(
@@ -184,10 +258,10 @@ def build_race_results_embed(
     race_date = fmt_dt(when_utc) if when_utc else "Unknown"
     embed.description = f"📅 {race_date} | 🔄 {lap_count} Laps | {conditions}"
     
-    # Try to add track image
-    img_filename, img_file = find_track_image(track)
-    if img_file:
-        embed.set_thumbnail(url=f"attachment://{img_filename}")
+    # Track image thumbnail: an already uploaded copy, or the file to upload
+    thumbnail_url, img_file = track_thumbnail(track)
+    if thumbnail_url:
+        embed.set_thumbnail(url=thumbnail_url)
     
     # Get leader's total time for gap calculations
     leader_total_ms = entries[0][7] if entries and entries[0][7] else None
@@ -273,7 +347,5 @@ def build_race_results_embed(
     # Set footer
     embed.set_footer(text=f"{server_name or 'ACC Server'}")
     
-    if img_file:
-        return embed, img_file
-    return embed, None
+    return embed, img_file
 
@@ -0,0 +1,119 @@
+"""In-process ingestion: watch the results folder and import files inside the bot."""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DB_PATH, RESULTS_DIR
+from import_acc_results import LOCK_RETRY_SECONDS, Ingester, IngestResult, filename_ts_key
+from ingest.lock import ImportLock
+from ingest.watcher import ResultsWatcher
+from utils.logging_config import logger
+
+# Wait before restarting the watcher after it failed, doubled while it keeps failing
+INGEST_RESTART_SECONDS = 5.0
+INGEST_MAX_RESTART_SECONDS = 300.0
+
+
+async def _queue_results(events: asyncio.Queue, results: list[IngestResult]) -> None:
+    for result in results:
+        if result.status == "failed":
+            logger.warning(f"Failed to import {result.filename}")
+        elif result.status == "imported":
+            logger.info(f"Imported {result.filename} ({result.rows} entries)")
+        if result.has_announcements:
+            await events.put(result)
+
+
+async def _ingest(loop, db_thread, ingester: Ingester, events: asyncio.Queue, paths, retry: set[str]) -> None:
+    """Import files one at a time; one that raises is logged and kept in `retry`."""
+    for path in paths:
+        try:
+            result = await loop.run_in_executor(db_thread, ingester.ingest_file, path)
+        except Exception as e:
+            # e.g. the database stayed locked or the file can't be read: try again later
+            logger.error(f"Could not import {os.path.basename(path)}, will retry: {e}", exc_info=True)
+            retry.add(path)
+            continue
+        retry.discard(path)
+        await _queue_results(events, [result])
+
+
+async def _watch(loop, lock: ImportLock, events: asyncio.Queue, results_dir: str, retry: set[str]) -> None:
+    """Catch up, then import files as the watcher reports them. Only returns by raising."""
+    db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-db")
+    watch_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-watch")
+    ingester = None
+    watcher = None
+    try:
+        ingester = await loop.run_in_executor(db_thread, Ingester, DB_PATH, results_dir)
+
+        async def scan() -> None:
+            lock.clear_pending()
+            paths = await loop.run_in_executor(db_thread, ingester.new_files)
+            await _ingest(loop, db_thread, ingester, events, sorted(set(paths) | retry), retry)
+
+        # Catch up on anything written while the bot wasn't running
+        await scan()
+
+        watcher = ResultsWatcher(results_dir, accept=lambda name: filename_ts_key(name) is not None)
+        batches = watcher.batches()
+        logger.info(f"Watching {results_dir} for new ACC result files ({type(watcher.source).__name__})")
+        while True:
+            batch = await loop.run_in_executor(watch_thread, next, batches)
+            if not batch:
+                logger.info("Result folder events may have been missed, rescanning")
+                await scan()
+                continue
+            paths = [os.path.join(results_dir, name) for name in batch]
+            # Files that failed earlier go along with the next batch
+            await _ingest(loop, db_thread, ingester, events, sorted(retry - set(paths)) + paths, retry)
+            if lock.has_pending():
+                await scan()
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        if ingester is not None:
+            db_thread.submit(ingester.close)
+        db_thread.shutdown(wait=False)
+        watch_thread.shutdown(wait=False)
+
+
+async def run_ingestion(events: asyncio.Queue, results_dir: str = RESULTS_DIR) -> None:
+    """
+    Import result files as the server writes them and hand the results to
+    the announcer through `events`.
+
+    Takes the same lock as import_acc_results.py, so a separate importer
+    can't write at the same time; one-off importer runs started meanwhile
+    leave a "pending" marker and are picked up here with a scan. Imports
+    run on a single worker thread that owns the importer's connection, and
+    the folder is watched on another, so the event loop never blocks.
+
+    A file that fails to import is retried with the next batch. If the
+    watcher or the importer itself fails, both are restarted after
+    INGEST_RESTART_SECONDS, doubling up to INGEST_MAX_RESTART_SECONDS while
+    they keep failing (like the restart loop in watch_results.ps1).
+    """
+    loop = asyncio.get_running_loop()
+    lock = ImportLock(DB_PATH + ".lock")
+    if not lock.acquire():
+        logger.info("Another importer is running; in-process ingestion waits for it to finish")
+        while not lock.acquire():
+            await asyncio.sleep(LOCK_RETRY_SECONDS)
+
+    retry: set[str] = set()
+    delay = INGEST_RESTART_SECONDS
+    try:
+        while True:
+            started = loop.time()
+            try:
+                await _watch(loop, lock, events, results_dir, retry)
+            except Exception as e:
+                # Ran fine for a while: this is a new problem, start the backoff over
+                if loop.time() - started > INGEST_MAX_RESTART_SECONDS:
+                    delay = INGEST_RESTART_SECONDS
+                logger.error(f"In-process ingestion stopped: {e}; restarting in {delay:g}s", exc_info=True)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, INGEST_MAX_RESTART_SECONDS)
+    finally:
+        lock.release()
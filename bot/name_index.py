@@ -0,0 +1,115 @@
+"""
+In-memory name indexes for autocomplete.
+
+Autocomplete runs on every keystroke, and Discord gives it 3 seconds.
+Instead of a SELECT DISTINCT over all entries per keystroke, the bot keeps
+the player and track names in memory (sorted, with an n-gram map for
+substring search) and rebuilds them only when the database has changed
+(PRAGMA data_version), checked at most every NAME_INDEX_CHECK_SECONDS.
+"""
+import asyncio
+import time
+from typing import Iterable
+
+from bot.database import database
+
+# Longest n-gram in the map; longer queries are narrowed down with their n-grams
+NGRAM_LENGTH = 3
+# Lists this short are just scanned
+SCAN_BELOW = 64
+# How often autocomplete checks whether the database changed
+NAME_INDEX_CHECK_SECONDS = 1.0
+
+
+class NameIndex:
+    """Sorted names with case-insensitive substring search."""
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self.names = sorted(set(names))
+        self._lower = [name.lower() for name in self.names]
+        # n-gram (1 to NGRAM_LENGTH characters) -> positions of names containing it, ascending
+        self._grams: dict[str, list[int]] = {}
+        if len(self.names) < SCAN_BELOW:
+            return
+        for i, name in enumerate(self._lower):
+            grams = {
+                name[start:start + n]
+                for n in range(1, NGRAM_LENGTH + 1)
+                for start in range(len(name) - n + 1)
+            }
+            for gram in grams:
+                self._grams.setdefault(gram, []).append(i)
+
+    def search(self, query: str, limit: int) -> list[str]:
+        """Up to `limit` names containing `query` (case-insensitive), in sorted order."""
+        query = query.lower()
+        if not query:
+            return self.names[:limit]
+        if not self._grams:
+            candidates: Iterable[int] = range(len(self.names))
+        else:
+            # The rarest n-gram of the query gives the fewest names to check
+            grams = (
+                [query] if len(query) <= NGRAM_LENGTH
+                else [query[start:start + NGRAM_LENGTH] for start in range(len(query) - NGRAM_LENGTH + 1)]
+            )
+            candidates = min((self._grams.get(gram, []) for gram in grams), key=len)
+
+        matches = []
+        for i in candidates:
+            if query in self._lower[i]:
+                matches.append(self.names[i])
+                if len(matches) >= limit:
+                    break
+        return matches
+
+
+class AutocompleteNames:
+    """Player and track name indexes, rebuilt when the database changes."""
+
+    def __init__(self) -> None:
+        self.tracks = NameIndex([])
+        self.players = NameIndex([])
+        self.first_names = NameIndex([])
+        self.last_names = NameIndex([])
+        self._last_names_by_first: dict[str, NameIndex] = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def last_names_for(self, first_name: str) -> NameIndex:
+        """Last names of the players with exactly this first name."""
+        return self._last_names_by_first.get(first_name) or NameIndex([])
+
+    def _build(self, tracks: list[tuple[str]], players: list[tuple[str, str]]) -> None:
+        self.tracks = NameIndex(track for (track,) in tracks)
+        self.players = NameIndex(
+            full_name
+            for first, last in players
+            if (full_name := f"{first or ''} {last or ''}".strip())
+        )
+        self.first_names = NameIndex(first for first, _ in players if first and first.strip())
+        self.last_names = NameIndex(last for _, last in players if last)
+        by_first: dict[str, list[str]] = {}
+        for first, last in players:
+            if last:
+                by_first.setdefault(first, []).append(last)
+        self._last_names_by_first = {first: NameIndex(lasts) for first, lasts in by_first.items()}
+
+    async def refresh(self) -> None:
+        """Rebuild the indexes if the database changed since the last build."""
+        if time.monotonic() - self._checked_at < NAME_INDEX_CHECK_SECONDS:
+            return
+        async with self._lock:
+            if time.monotonic() - self._checked_at < NAME_INDEX_CHECK_SECONDS:
+                return
+            version = await database.data_version()
+            if version != self._version:
+                tracks = await database.fetch_available_tracks()
+                players = await database.fetch_all_players()
+                await asyncio.get_running_loop().run_in_executor(None, self._build, tracks, players)
+                self._version = version
+            self._checked_at = time.monotonic()
+
+
+names = AutocompleteNames()
@@ -0,0 +1,177 @@
+"""
+In-memory rank index for leaderboard positions.
+
+get_player_rank() in db/queries.py runs two grouped aggregations over every
+entry on the track, and a PB announcement or /pb response needs it several
+times. The bot keeps this index instead: per (track, session_type), a
+sorted list of each driver's best time, so a rank is one bisect.
+
+It is built from the entries table on first use and brought up to date
+before every lookup with the entries added since (entries are only ever
+appended, so that is a primary key range query that usually returns
+nothing). The methods answer exactly like the queries they replace:
+
+    rank, total = await ranks.get_player_rank(track, stype, best_ms)
+    previous_rank = await ranks.get_player_previous_rank(track, stype, best_ms, player_key)
+
+Each driver's best is also kept as a history by session time, so
+get_player_rank_at() answers the rank a lap would have had at a past
+moment (e.g. when a session was driven). That bisects every driver's
+history on the track by time, so it costs O(drivers * log sessions)
+rather than one bisect.
+"""
+import asyncio
+from bisect import bisect_left, bisect_right, insort
+from typing import Any
+
+from bot.database import database
+
+
+class _Leaderboard:
+    """Best times on one track and session type."""
+
+    def __init__(self) -> None:
+        # Best time per player, like the GROUP BY in get_player_rank
+        self.bests: dict[int, int] = {}
+        self.sorted_bests: list[int] = []
+        # Every distinct lap time per player, for get_previous_pb
+        self.driver_times: dict[int, list[int]] = {}
+        # Per player: session times (sorted), the lap of each and the best as of each
+        self.history: dict[int, tuple[list[str], list[int], list[int]]] = {}
+
+    def _add_history(self, player_key: int, best_lap_ms: int, at_utc: str) -> None:
+        times, laps, bests = self.history.setdefault(player_key, ([], [], []))
+        # Sessions can be imported out of order (backfill): usually appends
+        i = bisect_right(times, at_utc)
+        times.insert(i, at_utc)
+        laps.insert(i, best_lap_ms)
+        bests.insert(i, best_lap_ms)
+        # Best-so-far from i on; stops once a later best is already lower
+        for j in range(i, len(times)):
+            best = laps[j] if j == 0 else min(laps[j], bests[j - 1])
+            if j > i and bests[j] == best:
+                break
+            bests[j] = best
+
+    def best_at(self, player_key: int, at_utc: str) -> int | None:
+        """A player's best time from sessions up to `at_utc`, or None."""
+        times, _, bests = self.history[player_key]
+        i = bisect_right(times, at_utc)
+        return bests[i - 1] if i else None
+
+    def add(self, player_key: int, best_lap_ms: int, at_utc: str) -> None:
+        self._add_history(player_key, best_lap_ms, at_utc)
+        times = self.driver_times.setdefault(player_key, [])
+        i = bisect_left(times, best_lap_ms)
+        if i == len(times) or times[i] != best_lap_ms:
+            times.insert(i, best_lap_ms)
+
+        old = self.bests.get(player_key)
+        if old is not None:
+            if old <= best_lap_ms:
+                return
+            del self.sorted_bests[bisect_left(self.sorted_bests, old)]
+        self.bests[player_key] = best_lap_ms
+        insort(self.sorted_bests, best_lap_ms)
+
+
+class RankIndex:
+    """Leaderboards of every track and session type, answering rank queries with bisect."""
+
+    def __init__(self) -> None:
+        self._boards: dict[tuple[str, str], _Leaderboard] = {}
+        self._last_entry_id = 0
+        self._lock = asyncio.Lock()
+
+    def _apply(self, rows: list[tuple[Any, ...]]) -> None:
+        for entry_id, track, session_type, player_key, best_lap_ms, at_utc in rows:
+            self._last_entry_id = entry_id
+            if player_key is None:
+                continue
+            board = self._boards.get((track, session_type))
+            if board is None:
+                board = self._boards[(track, session_type)] = _Leaderboard()
+            board.add(player_key, best_lap_ms, at_utc)
+
+    async def refresh(self) -> None:
+        """Add entries imported since the last refresh (all of them the first time)."""
+        async with self._lock:
+            await self._refresh()
+
+    async def _refresh(self) -> None:
+        rows = await database.fetch_ranked_entries(self._last_entry_id)
+        if rows:
+            # Applied off the event loop; the first build covers every entry
+            await asyncio.get_running_loop().run_in_executor(None, self._apply, rows)
+
+    def _rank(self, track: str, session_type: str, best_lap_ms: int) -> tuple[int, int]:
+        board = self._boards.get((track, session_type))
+        if board is None:
+            return 1, 0
+        return bisect_left(board.sorted_bests, best_lap_ms) + 1, len(board.bests)
+
+    def _rank_at(self, track: str, session_type: str, best_lap_ms: int, at_utc: str) -> tuple[int, int]:
+        board = self._boards.get((track, session_type))
+        if board is None:
+            return 1, 0
+        faster = total = 0
+        for player_key in board.history:
+            best = board.best_at(player_key, at_utc)
+            if best is not None:
+                total += 1
+                faster += best < best_lap_ms
+        return faster + 1, total
+
+    def _previous_pb(self, track: str, session_type: str, current_pb_ms: int, player_key: int) -> int | None:
+        board = self._boards.get((track, session_type))
+        times = board.driver_times.get(player_key) if board else None
+        if not times:
+            return None
+        i = bisect_right(times, current_pb_ms)
+        return times[i] if i < len(times) else None
+
+    async def get_player_rank(self, track: str, session_type: str, best_lap_ms: int) -> tuple[int, int]:
+        """
+        Rank a lap time would have on a track, and the number of drivers
+        there. Same result as db.queries.get_player_rank().
+
+        Returns:
+            Tuple of (rank, total_drivers) where rank is 1-indexed
+        """
+        async with self._lock:
+            await self._refresh()
+            return self._rank(track, session_type, best_lap_ms)
+
+    async def get_player_rank_at(self, track: str, session_type: str, best_lap_ms: int,
+                                 at_utc: str) -> tuple[int, int]:
+        """
+        Rank a lap time would have had on a track counting only sessions up
+        to `at_utc` (a file_mtime_utc), and the number of drivers then.
+
+        Returns:
+            Tuple of (rank, total_drivers) where rank is 1-indexed
+        """
+        async with self._lock:
+            await self._refresh()
+            return self._rank_at(track, session_type, best_lap_ms, at_utc)
+
+    async def get_previous_pb(self, track: str, session_type: str, current_pb_ms: int,
+                              player_key: int) -> int | None:
+        """A player's next slower time on a track; same result as db.queries.get_previous_pb()."""
+        async with self._lock:
+            await self._refresh()
+            return self._previous_pb(track, session_type, current_pb_ms, player_key)
+
+    async def get_player_previous_rank(self, track: str, session_type: str, current_best_ms: int,
+                                       player_key: int) -> int | None:
+        """Rank of a player's previous PB; same result as db.queries.get_player_previous_rank()."""
+        async with self._lock:
+            await self._refresh()
+            previous_pb = self._previous_pb(track, session_type, current_best_ms, player_key)
+            if previous_pb is None:
+                return None
+            rank, _ = self._rank(track, session_type, previous_pb)
+            return rank
+
+
+ranks = RankIndex()
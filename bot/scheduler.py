@@ -0,0 +1,231 @@
+"""
+Outbound scheduler for announcement posts.
+
+Posts are queued with a priority (track records first, then race
+results, then personal bests) and posted by a few concurrent senders, within
+Discord's per-channel budget of DISCORD_CHANNEL_SEND_LIMIT messages per
+DISCORD_CHANNEL_SEND_WINDOW seconds. If Discord answers 429 anyway, every
+sender pauses for the retry-after and the post is queued again.
+
+A post covers one or more announcements (a per-session digest covers all of
+a session's) and may take more than one message.
+
+Posted message IDs are written back in batches, one transaction per flush,
+instead of one commit per post. Until then the rows are still pending in the
+database, so the scheduler remembers what it has queued and posted and the
+announcer skips those when it looks at the queue again.
+"""
+import asyncio
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+import discord
+
+from bot.database import database
+from bot.track_images import remember_track_image
+from constants import DISCORD_CHANNEL_SEND_LIMIT, DISCORD_CHANNEL_SEND_WINDOW
+from utils.logging_config import logger
+
+# Priority lanes, lowest first
+PRIORITY_TRACK_RECORD = 0
+PRIORITY_RACE_RESULTS = 1
+PRIORITY_PERSONAL_BEST = 2
+
+# Announcement tables, as used in scheduler keys
+RECORD = "record"
+RACE_RESULTS = "race_results"
+
+# Posted message IDs are collected this long before they are written back
+FLUSH_SECONDS = 1.0
+
+# One message: its embeds and the image file they refer to, if any
+Message = tuple[list[discord.Embed], discord.File | None]
+# Builds the messages of a post
+MessageBuilder = Callable[[], Awaitable[list[Message]]]
+
+
+class SendBudget:
+    """Sliding-window limit on messages per channel, plus 429 pauses."""
+
+    def __init__(self, limit: int = DISCORD_CHANNEL_SEND_LIMIT, window: float = DISCORD_CHANNEL_SEND_WINDOW) -> None:
+        self.limit = limit
+        self.window = window
+        self._sent_at: deque[float] = deque()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every sender for `seconds` (Discord's retry-after)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        """Wait until one more message fits in the budget, and claim it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                while self._sent_at and now - self._sent_at[0] >= self.window:
+                    self._sent_at.popleft()
+                if len(self._sent_at) < self.limit:
+                    self._sent_at.append(now)
+                    return
+                await asyncio.sleep(self.window - (now - self._sent_at[0]))
+
+
+def _retry_after(error: discord.HTTPException) -> float | None:
+    """Seconds to wait if `error` is a rate limit, else None."""
+    if isinstance(error, discord.RateLimited):
+        return error.retry_after
+    if error.status != 429:
+        return None
+    try:
+        return float(error.response.headers.get("Retry-After", 1.0))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
+
+
+@dataclass
+class Post:
+    """Queued post: the (table, announcement_id) keys it covers and how to build it."""
+    keys: list[tuple[str, int]]
+    build: MessageBuilder
+    # Messages already sent; after a rate limit only the rest is sent
+    sent: int = 0
+    # The first message, recorded for every announcement in the post
+    message_id: int | None = None
+
+
+class AnnouncementScheduler:
+    """Prioritized, rate-limited posting of announcements to one channel."""
+
+    def __init__(self, channel, senders: int = DISCORD_CHANNEL_SEND_LIMIT,
+                 flush_seconds: float = FLUSH_SECONDS) -> None:
+        self.channel = channel
+        self.senders = senders
+        self.flush_seconds = flush_seconds
+        self.budget = SendBudget()
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._order = itertools.count()
+        # (table, announcement_id) queued or posted but not written back yet
+        self._pending: set[tuple[str, int]] = set()
+        self._posted: list[tuple[str, int, int]] = []
+        self._posted_event = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        # Set when a post failed; the announcer should look at the queue again
+        self.failed = False
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._sender()) for _ in range(self.senders)]
+        self._tasks.append(asyncio.create_task(self._flusher()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+
+    def is_pending(self, table: str, announcement_id: int) -> bool:
+        """Whether this announcement is queued here or posted but not written back yet."""
+        return (table, announcement_id) in self._pending
+
+    def submit(self, priority: int, keys: list[tuple[str, int]], build: MessageBuilder) -> bool:
+        """
+        Queue a post covering the announcements in `keys`. `build` is awaited
+        right before sending, so building (rank queries, image lookup) doesn't
+        hold up higher priority posts.
+
+        Returns:
+            False if any of the announcements is already pending here
+        """
+        if any(key in self._pending for key in keys):
+            return False
+        self._pending.update(keys)
+        self._queue.put_nowait((priority, next(self._order), Post(keys, build)))
+        return True
+
+    async def _sender(self) -> None:
+        while True:
+            priority, order, post = await self._queue.get()
+            try:
+                messages = await post.build()
+                for embeds, img_file in messages[:post.sent]:
+                    if img_file:
+                        img_file.close()
+                for embeds, img_file in messages[post.sent:]:
+                    await self.budget.acquire()
+                    if img_file:
+                        sent = await self.channel.send(embeds=embeds, file=img_file)
+                        await remember_track_image(img_file, sent)
+                    else:
+                        sent = await self.channel.send(embeds=embeds)
+                    post.sent += 1
+                    if post.message_id is None:
+                        post.message_id = sent.id
+            except discord.HTTPException as e:
+                retry_after = _retry_after(e)
+                if retry_after is None:
+                    self._failed(post, e)
+                else:
+                    logger.warning(f"Rate limited by Discord, pausing announcements for {retry_after:.1f}s")
+                    self.budget.pause(retry_after)
+                    # Same place in its lane; the messages are rebuilt (fresh files) on retry
+                    self._queue.put_nowait((priority, order, post))
+            except Exception as e:
+                self._failed(post, e)
+            else:
+                self._mark_posted(post)
+            finally:
+                self._queue.task_done()
+
+    def _mark_posted(self, post: Post) -> None:
+        self._posted.extend((table, announcement_id, post.message_id) for table, announcement_id in post.keys)
+        self._posted_event.set()
+
+    def _failed(self, post: Post, error: Exception) -> None:
+        table, announcement_id = post.keys[0]
+        logger.warning(
+            f"Failed to post {table} announcement {announcement_id}"
+            f"{f' (and {len(post.keys) - 1} more)' if len(post.keys) > 1 else ''}: {error}",
+            exc_info=True
+        )
+        if post.message_id is not None:
+            # Part of it is on Discord already; mark it sent rather than post it twice
+            self._mark_posted(post)
+            return
+        # Still pending in the database, so the next look at the queue retries it
+        self._pending.difference_update(post.keys)
+        self.failed = True
+
+    async def _flusher(self) -> None:
+        while True:
+            await self._posted_event.wait()
+            # Let a burst of posts finish, so they share one transaction
+            await asyncio.sleep(self.flush_seconds)
+            self._posted_event.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Failed to mark announcements as sent: {e}", exc_info=True)
+                self._posted_event.set()
+
+    async def flush(self) -> None:
+        """Write back the message IDs of everything posted so far, in one transaction."""
+        if not self._posted:
+            return
+        posted, self._posted = self._posted, []
+        try:
+            await database.mark_announcements_sent(
+                [(announcement_id, message_id) for table, announcement_id, message_id in posted if table == RECORD],
+                [(announcement_id, message_id) for table, announcement_id, message_id in posted if table == RACE_RESULTS],
+            )
+        except Exception:
+            self._posted = posted + self._posted
+            raise
+        for table, announcement_id, _ in posted:
+            self._pending.discard((table, announcement_id))
@@ -0,0 +1,45 @@
+"""
+Reuse of uploaded track images.
+
+Every embed with a track thumbnail used to upload the image file again.
+After the first upload the bot keeps the attachment's URL (in memory and in
+the track_image_urls table) and later embeds point at it instead, so they
+go out without an upload. See TrackImageUrls in utils/images.py for when a
+URL is dropped (changed file, signed URL about to expire).
+
+The image files themselves are read once at startup into the
+TrackImageRegistry (utils/images.py), which embeds attach them from.
+"""
+import discord
+
+from bot.database import database
+from utils.images import track_image_registry, track_image_urls
+from utils.logging_config import logger
+
+
+async def load_track_images() -> None:
+    """Read the track images into memory, e.g. at startup (off the event loop)."""
+    await track_image_registry.refresh_async(force=True)
+
+
+async def load_track_image_urls() -> None:
+    """Load the stored URLs, e.g. at startup."""
+    try:
+        track_image_urls.load(await database.fetch_track_image_urls())
+    except Exception as e:
+        # Table might not exist yet (the importer creates it), images are just uploaded again
+        logger.warning(f"Could not load stored track image URLs: {e}")
+
+
+async def remember_track_image(img_file: discord.File, message: discord.Message | None) -> None:
+    """Keep the URL of the track image uploaded with `message` for later embeds."""
+    if message is None:
+        return
+    remembered = track_image_urls.remember(img_file.filename, message)
+    if remembered is None:
+        return
+    try:
+        await database.save_track_image_urls([remembered])
+    except Exception as e:
+        # Still reused until the bot restarts
+        logger.warning(f"Could not store track image URL for {img_file.filename}: {e}")
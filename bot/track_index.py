@@ -0,0 +1,110 @@
+"""
+In-memory track resolver.
+
+/records and /pb resolve the typed track name on every call, and /tracks
+lists every track. The bot keeps the tracks table (see db/tracks.py) and the
+track aliases in memory instead, rebuilt only when the database has changed
+(PRAGMA data_version), so resolving and listing tracks never queries the
+database. Matching follows find_track_match(): an exact name or alias first,
+then the first alias containing the input.
+
+The tracks table's display_name and image_file depend on the bot's
+formatting and img/ folder, so they're worked out here and stored back
+whenever they differ; a change in img/ rebuilds the index too.
+"""
+import asyncio
+import time
+
+from bot.database import database
+from db.search import alias_key, search_text
+from utils.formatting import format_track_name
+from utils.images import find_track_image_file, track_image_registry
+from utils.logging_config import logger
+
+# How often the resolver checks whether the database changed
+TRACK_INDEX_CHECK_SECONDS = 1.0
+
+
+class TrackIndex:
+    """Tracks and their aliases, rebuilt when the database changes."""
+
+    def __init__(self) -> None:
+        self._available: list[str] = []
+        self._details: dict[str, tuple[str, str | None]] = {}
+        self._by_alias: dict[str, str] = {}
+        # (search_name, track) in alias_id order, for substring matches
+        self._search_names: list[tuple[str, str]] = []
+        self._version = None
+        self._images_version = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _build(self, tracks: list[tuple], aliases: list[tuple[str, str, str]]) -> list[tuple[str, str | None, str]]:
+        """Rebuild from fetch_tracks()/fetch_track_aliases() rows; returns the details to store."""
+        self._available = [row[0] for row in tracks if row[5] or row[6]]
+        self._by_alias = {}
+        for alias, _, track in aliases:
+            self._by_alias.setdefault(alias, track)
+        self._search_names = [(name, track) for _, name, track in aliases]
+
+        details = {}
+        changed = []
+        for track, _, display_name, image_file, *_ in tracks:
+            details[track] = (format_track_name(track), find_track_image_file(track))
+            if details[track] != (display_name, image_file):
+                changed.append((*details[track], track))
+        self._details = details
+        return changed
+
+    async def refresh(self) -> None:
+        """Rebuild if the database or img/ changed since the last build."""
+        if time.monotonic() - self._checked_at < TRACK_INDEX_CHECK_SECONDS:
+            return
+        async with self._lock:
+            if time.monotonic() - self._checked_at < TRACK_INDEX_CHECK_SECONDS:
+                return
+            version = await database.data_version()
+            await track_image_registry.refresh_async()
+            images_version = track_image_registry.version
+            if version != self._version or images_version != self._images_version:
+                tracks = await database.fetch_tracks()
+                aliases = await database.fetch_track_aliases()
+                changed = await asyncio.get_running_loop().run_in_executor(None, self._build, tracks, aliases)
+                self._version = version
+                self._images_version = images_version
+                if changed:
+                    try:
+                        await database.save_track_details(changed)
+                    except Exception as e:
+                        # Worked out again after the next import
+                        logger.warning(f"Could not store track display names/images: {e}")
+            self._checked_at = time.monotonic()
+
+    async def resolve(self, track_input: str) -> str | None:
+        """The track name `track_input` refers to (see find_track_match()), or None."""
+        await self.refresh()
+        track = self._by_alias.get(alias_key(track_input))
+        if track is not None:
+            return track
+        text = search_text(track_input)
+        if not text:
+            return None
+        return next((track for name, track in self._search_names if text in name), None)
+
+    async def available(self) -> list[str]:
+        """Tracks with Q/R lap times, sorted by name."""
+        await self.refresh()
+        return list(self._available)
+
+    def display_name(self, track: str) -> str:
+        """Display name of a track (format_track_name())."""
+        details = self._details.get(track)
+        return details[0] if details else format_track_name(track)
+
+    def image_file(self, track: str) -> str | None:
+        """Image file name in IMG_DIR for a track, or None."""
+        details = self._details.get(track)
+        return details[1] if details else find_track_image_file(track)
+
+
+track_index = TrackIndex()
@@ -13,6 +13,21 @@ ROLE_ID =
 POLL_SECONDS = 5
 BATCH_SIZE = 10
 
+# The importer pings NOTIFY_PORT (localhost UDP) after committing new sessions,
+# so announcements go out without waiting for POLL_SECONDS. It and RESULTS_DIR
+# are shared with import_acc_results.py: change them in ingest/settings.py
+from ingest.settings import NOTIFY_PORT, RESULTS_DIR
+
+# Import result files inside the bot (watching RESULTS_DIR) instead of
+# running import_acc_results.py / watch_results.ps1 separately
+INGEST_IN_BOT = False
+
+# How announcements are grouped per session, by type ("TR", "PB", "RACE" = race results):
+# "single" posts each one on its own, "digest" puts a session's announcements
+# in one message (up to 10 embeds), "compact" (PB only) lists all of a
+# session's PBs in one embed
+ANNOUNCEMENT_DIGEST = {"TR": "single", "PB": "compact", "RACE": "single"}
+
 # Directories
 IMG_DIR = os.path.join(os.path.dirname(__file__), "img")
 
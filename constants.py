@@ -4,6 +4,10 @@
 DISCORD_FIELD_VALUE_LIMIT = 1024  # Maximum characters in an embed field value
 DISCORD_AUTOCOMPLETE_LIMIT = 25    # Maximum autocomplete choices Discord allows
 DISCORD_EMBED_FIELD_LIMIT = 25     # Maximum fields per embed
+DISCORD_MESSAGE_EMBED_LIMIT = 10   # Maximum embeds per message
+DISCORD_MESSAGE_CHAR_LIMIT = 6000  # Maximum characters across all embeds of a message
+DISCORD_CHANNEL_SEND_LIMIT = 5     # Messages per channel per rate-limit window
+DISCORD_CHANNEL_SEND_WINDOW = 5.0  # Length of that window in seconds
 
 # Display Limits
 DEFAULT_TOP_TIMES_LIMIT = 3        # Default number of top times to show
@@ -13,3 +17,22 @@ MAX_RACE_RESULTS_DISPLAY = 10       # Maximum race results to display in embed
 # Medal Positions
 TOP_3_POSITIONS = {1, 2, 3}        # Positions that get medals
 MEDAL_EMOJIS = {1: "🥇", 2: "🥈", 3: "🥉"}  # Medal emoji mapping
+
+# Other names drivers use for tracks, by ACC track name (for track search)
+TRACK_ALIASES = {
+    "spa": ["Spa-Francorchamps"],
+    "mount_panorama": ["Bathurst"],
+    "cota": ["Circuit of the Americas", "Austin"],
+    "paul_ricard": ["Circuit Paul Ricard", "Le Castellet"],
+    "valencia": ["Circuit Ricardo Tormo"],
+    "barcelona": ["Catalunya", "Montmelo"],
+    "red_bull_ring": ["Spielberg"],
+    "hungaroring": ["Budapest"],
+    "imola": ["Enzo e Dino Ferrari"],
+    "laguna_seca": ["WeatherTech Raceway"],
+    "watkins_glen": ["The Glen"],
+    "indianapolis": ["Indy"],
+    "nurburgring_24h": ["Nordschleife"],
+    "brands_hatch": ["Brands Hatch GP"],
+    "silverstone": ["Silverstone GP"],
+}
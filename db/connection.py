@@ -0,0 +1,128 @@
+"""
+Connection factory shared by the importer and the bot.
+
+Every connection gets the same profile: WAL journal (readers never block the
+importer and the importer never blocks readers), a busy timeout so writers
+queue for the lock instead of failing with "database is locked",
+synchronous=NORMAL (safe with WAL, and commits don't wait for an fsync) and
+a larger page cache. The bot's command paths only read, so they open the
+file read-only through a `mode=ro` URI.
+
+Write transactions should be started with begin_write(), which takes the
+write lock up front (BEGIN IMMEDIATE) and records how long that took, so
+lock contention between the importer and the bot shows up in the logs
+instead of as unexplained slowness.
+"""
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+# How long a writer waits for the lock before "database is locked"
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+
+# Page cache per connection, in KiB (SQLite takes negative cache_size as KiB)
+DEFAULT_CACHE_KIB = 16 * 1024
+
+# Lock waits at least this long are logged as they happen
+LOCK_WAIT_WARN_SECONDS = 0.5
+
+logger = logging.getLogger("acc_bot.db")
+
+
+class LockWaitStats:
+    """Running totals of the time spent waiting for the write lock."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.total_seconds:.3f}s waiting for the write lock over {self.count} "
+            f"transaction(s), longest {self.max_seconds:.3f}s"
+        )
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3 connection that keeps LockWaitStats for begin_write()."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.lock_waits = LockWaitStats()
+
+
+def connect(db_path: str, readonly: bool = False, busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+            cache_kib: int = DEFAULT_CACHE_KIB) -> ProfiledConnection:
+    """
+    Open a database connection with the shared profile.
+
+    Args:
+        db_path: Database file
+        readonly: Open with `mode=ro`; writes fail and WAL isn't switched on
+        busy_timeout_ms: How long to wait for a lock before giving up
+        cache_kib: Page cache size in KiB
+
+    Returns:
+        Connection (a ProfiledConnection)
+
+    Raises:
+        sqlite3.OperationalError: If the file can't be opened (a read-only
+            connection also fails if the database doesn't exist yet)
+    """
+    if readonly:
+        uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+        con = sqlite3.connect(uri, uri=True, factory=ProfiledConnection)
+    else:
+        con = sqlite3.connect(db_path, factory=ProfiledConnection)
+
+    con.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    con.execute(f"PRAGMA cache_size = {-int(cache_kib)}")
+    if not readonly:
+        # journal_mode is stored in the file; the others are per connection
+        con.execute("PRAGMA journal_mode = WAL")
+        con.execute("PRAGMA synchronous = NORMAL")
+    return con
+
+
+def begin_write(con: sqlite3.Connection) -> float:
+    """
+    Start a write transaction now instead of at the first write.
+
+    Does nothing if a transaction is already open. The wait for the lock
+    is added to `con.lock_waits` (for a ProfiledConnection) and logged if
+    it took LOCK_WAIT_WARN_SECONDS or more.
+
+    Returns:
+        Seconds spent waiting for the write lock
+    """
+    if con.in_transaction:
+        return 0.0
+
+    started = time.perf_counter()
+    con.execute("BEGIN IMMEDIATE")
+    waited = time.perf_counter() - started
+
+    stats = getattr(con, "lock_waits", None)
+    if stats is not None:
+        stats.add(waited)
+    if waited >= LOCK_WAIT_WARN_SECONDS:
+        logger.warning(f"Waited {waited:.2f}s for the database write lock")
+    return waited
+
+
+def data_version(con: sqlite3.Connection) -> int:
+    """
+    PRAGMA data_version: changes whenever another connection commits to the
+    database. Commits on `con` itself don't change it.
+    """
+    return con.execute("PRAGMA data_version").fetchone()[0]
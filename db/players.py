@@ -0,0 +1,117 @@
+"""
+Players and the names they have raced under.
+
+Entries reference drivers by two integer keys instead of repeating the ACC
+playerId and names on every row (see schema v9):
+
+- players: one row per ACC playerId, with an integer player_key and the
+  canonical name (the one from the driver's most recent session)
+- player_names: every (first, last, short) name a driver has appeared
+  under, with when it was first and last seen; entries.name_id points at
+  the name of that session, so results still show the name as it was
+- player_names_fts: a player's names, trigram-indexed for driver search
+  (see schema v12); rewritten whenever the player gets a new name
+
+The importer resolves each session's drivers with resolve_drivers() before
+inserting its entries.
+"""
+from typing import Iterable
+
+from db.search import index_player_names
+
+
+def full_name(first_name: str | None, last_name: str | None) -> str:
+    """Full name ("First Last") as shown in autocomplete and typed into /pb."""
+    return f"{first_name or ''} {last_name or ''}".strip()
+
+
+def _player_key(cur, player_id: str, first_name, last_name, short_name, seen_at_utc: str) -> int:
+    """player_key for an ACC playerId, adding the player or updating its canonical name."""
+    row = cur.execute(
+        "SELECT player_key, last_seen_utc FROM players WHERE player_id = ?",
+        (player_id,)
+    ).fetchone()
+    if row is None:
+        cur.execute(
+            """
+            INSERT INTO players (player_id, first_name, last_name, short_name, last_seen_utc)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (player_id, first_name, last_name, short_name, seen_at_utc)
+        )
+        return cur.lastrowid
+
+    player_key, last_seen_utc = row
+    # Sessions can be imported out of order (backfill): only a newer one renames
+    if seen_at_utc >= last_seen_utc:
+        cur.execute(
+            """
+            UPDATE players SET first_name = ?, last_name = ?, short_name = ?, last_seen_utc = ?
+            WHERE player_key = ?
+            """,
+            (first_name, last_name, short_name, seen_at_utc, player_key)
+        )
+    return player_key
+
+
+def _name_id(cur, player_key: int | None, first_name, last_name, short_name, seen_at_utc: str) -> int:
+    """name_id of a driver's name, adding it to the alias history if it's new."""
+    row = cur.execute(
+        """
+        SELECT name_id, first_seen_utc, last_seen_utc FROM player_names
+        WHERE player_key IS ? AND first_name IS ? AND last_name IS ? AND short_name IS ?
+        """,
+        (player_key, first_name, last_name, short_name)
+    ).fetchone()
+    if row is None:
+        cur.execute(
+            """
+            INSERT INTO player_names
+            (player_key, first_name, last_name, short_name, full_name, first_seen_utc, last_seen_utc)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (player_key, first_name, last_name, short_name, full_name(first_name, last_name),
+             seen_at_utc, seen_at_utc)
+        )
+        name_id = cur.lastrowid
+        if player_key is not None:
+            # Driver search has one row per player with all their names
+            index_player_names(cur, (player_key,))
+        return name_id
+
+    name_id, first_seen_utc, last_seen_utc = row
+    if not first_seen_utc <= seen_at_utc <= last_seen_utc:
+        cur.execute(
+            "UPDATE player_names SET first_seen_utc = ?, last_seen_utc = ? WHERE name_id = ?",
+            (min(first_seen_utc, seen_at_utc), max(last_seen_utc, seen_at_utc), name_id)
+        )
+    return name_id
+
+
+def resolve_drivers(cur, drivers: Iterable[tuple], seen_at_utc: str) -> list[tuple[int | None, int | None]]:
+    """
+    (player_key, name_id) for each (player_id, first_name, last_name,
+    short_name) of one session, adding new players and names.
+
+    player_key is None without a playerId, name_id is None without any name.
+    """
+    keys: dict[str, int] = {}
+    name_ids: dict[tuple, int] = {}
+    resolved = []
+    for player_id, first_name, last_name, short_name in drivers:
+        player_key = None
+        if player_id is not None:
+            player_key = keys.get(player_id)
+            if player_key is None:
+                player_key = keys[player_id] = _player_key(
+                    cur, player_id, first_name, last_name, short_name, seen_at_utc
+                )
+
+        name_id = None
+        if first_name is not None or last_name is not None or short_name is not None:
+            name = (player_key, first_name, last_name, short_name)
+            name_id = name_ids.get(name)
+            if name_id is None:
+                name_id = name_ids[name] = _name_id(cur, *name, seen_at_utc)
+        resolved.append((player_key, name_id))
+    return resolved
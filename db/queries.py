@@ -1,53 +1,41 @@
 """Database query functions."""
 import sqlite3
+from datetime import datetime, timezone
 from typing import Any
 from config import BATCH_SIZE
 from constants import DEFAULT_TOP_TIMES_LIMIT
+from db.search import (
+    MIN_SHARED_TRIGRAMS, alias_key, search_text, shared_trigrams, substring_match, trigram_match,
+)
 
-# SQL Query Constants - Reusable query fragments
-# This subquery pattern is used to find driver info from entries when not in records table
-# Used in fetch_queue() to fallback to entries table if record not in records table
-def _get_driver_info_subquery(field_name: str) -> str:
-    """
-    Generate a subquery to get driver info from entries table.
-    
-    Args:
-        field_name: The field name to select (e.g., 'player_id', 'first_name')
-    
-    Returns:
-        SQL subquery string
-    """
-    return f"""
-    (SELECT e2.{field_name} FROM entries e2 
-     JOIN sessions s2 ON e2.session_id = s2.session_id 
-     WHERE s2.track = a.track 
-       AND s2.session_type = a.session_type 
-       AND e2.best_lap_ms = a.best_lap_ms 
-       AND e2.player_id IS NOT NULL 
-     LIMIT 1)
-    """
+
+def _ids_filter(column: str, ids: list[int] | None) -> tuple[str, list[int]]:
+    """SQL condition (and parameters) restricting `column` to `ids`; no condition for None."""
+    if ids is None:
+        return "", []
+    return f"AND {column} IN ({', '.join('?' * len(ids)) or 'NULL'})", list(ids)
 
 
-def fetch_queue(con: sqlite3.Connection) -> list[tuple[Any, ...]]:
+def fetch_queue(con: sqlite3.Connection, announcement_ids: list[int] | None = None,
+                limit: int | None = BATCH_SIZE) -> list[tuple[Any, ...]]:
     """
-    Pull queued announcements and join to records for the extra fields.
+    Pull queued announcements (track records and personal bests) that haven't
+    been sent to Discord yet.
     
-    This query fetches pending announcements (track records and personal bests) that haven't
-    been sent to Discord yet. It uses a LEFT JOIN with the records table to get driver info,
-    and falls back to subqueries on the entries table if the record isn't in the records table.
+    The driver, car and session are stored on each announcement when the
+    importer queues it, so this is a plain scan of the pending rows (the
+    driver's player_key is looked up by playerId).
+    
+    Args:
+        con: Database connection
+        announcement_ids: Only these announcements (those still pending), e.g.
+            the ones an in-process import just queued
+        limit: Maximum number of rows, None for all of them
     
     Returns:
         List of tuples containing announcement data with driver information
     """
-    # Build driver info subqueries for fallback when record not in records table
-    # These subqueries find the driver info from entries matching the announcement's track,
-    # session type, and best lap time
-    player_id_subq = _get_driver_info_subquery("player_id")
-    first_name_subq = _get_driver_info_subquery("first_name")
-    last_name_subq = _get_driver_info_subquery("last_name")
-    short_name_subq = _get_driver_info_subquery("short_name")
-    car_model_subq = _get_driver_info_subquery("car_model")
-    
+    ids_sql, ids_params = _ids_filter("a.announcement_id", announcement_ids)
     return con.execute(
         f"""
         SELECT
@@ -57,24 +45,20 @@ def fetch_queue(con: sqlite3.Connection) -> list[tuple[Any, ...]]:
           a.best_lap_ms,
           a.announced_at_utc,
           COALESCE(a.announcement_type, 'TR') as announcement_type,
-          -- Try to get driver info from records table first, fallback to entries subquery
-          COALESCE(r.player_id, {player_id_subq}) as player_id,
-          COALESCE(r.first_name, {first_name_subq}) as first_name,
-          COALESCE(r.last_name, {last_name_subq}) as last_name,
-          COALESCE(r.short_name, {short_name_subq}) as short_name,
-          COALESCE(r.car_model, {car_model_subq}) as car_model
+          pl.player_key,
+          a.first_name,
+          a.last_name,
+          a.short_name,
+          a.car_model,
+          a.session_id
         FROM record_announcements a
-        -- LEFT JOIN: Get driver info from records if available
-        -- Join condition: match track, session type, and best lap time
-        LEFT JOIN records r
-          ON r.track = a.track
-         AND r.session_type = a.session_type
-         AND r.best_lap_ms = a.best_lap_ms
+        LEFT JOIN players pl ON pl.player_id = a.player_id
         WHERE a.discord_message_id IS NULL
+          {ids_sql}
         ORDER BY a.announced_at_utc ASC
         LIMIT ?
         """,
-        (BATCH_SIZE,),
+        (*ids_params, -1 if limit is None else limit),
     ).fetchall()
 
 
@@ -92,31 +76,42 @@ def mark_sent(con: sqlite3.Connection, announcement_id: int, message_id: int) ->
 
 
 def find_track_match(con: sqlite3.Connection, track_input: str) -> str | None:
-    """Find the actual track name in DB that matches the input (case-insensitive)."""
-    # Try exact case-insensitive match first
+    """
+    Find the actual track name in DB that matches the input.
+    
+    Case, accents, spaces, underscores and punctuation are ignored, and known
+    aliases count ("Bathurst", "Spa-Francorchamps"). Otherwise the first track
+    with a name containing the input is returned. Misspellings don't match;
+    see search_tracks() for suggestions.
+    """
+    # Try exact match on a name or alias first
     result = con.execute(
-        """
-        SELECT DISTINCT track 
-        FROM sessions 
-        WHERE LOWER(track) = LOWER(?)
-        LIMIT 1
-        """,
-        (track_input,)
+        "SELECT track FROM track_aliases WHERE alias = ?",
+        (alias_key(track_input),)
     ).fetchone()
     
     if result:
         return result[0]
     
-    # Try partial match
-    result = con.execute(
-        """
-        SELECT DISTINCT track 
-        FROM sessions 
-        WHERE LOWER(track) LIKE LOWER(?)
-        LIMIT 1
-        """,
-        (f"%{track_input}%",)
-    ).fetchone()
+    # Try partial match (trigram index; inputs too short for it scan the small alias table)
+    match = substring_match(track_input)
+    if match:
+        result = con.execute(
+            """
+            SELECT a.track
+            FROM track_aliases_fts f
+            JOIN track_aliases a ON a.alias_id = f.rowid
+            WHERE track_aliases_fts MATCH ?
+            ORDER BY a.alias_id
+            LIMIT 1
+            """,
+            (match,)
+        ).fetchone()
+    elif search_text(track_input):
+        result = con.execute(
+            "SELECT track FROM track_aliases WHERE instr(search_name, ?) > 0 ORDER BY alias_id LIMIT 1",
+            (search_text(track_input),)
+        ).fetchone()
     
     if result:
         return result[0]
@@ -124,6 +119,73 @@ def find_track_match(con: sqlite3.Connection, track_input: str) -> str | None:
     return None
 
 
+# Candidates fetched per requested suggestion, before the shared-trigram cut
+SEARCH_CANDIDATES = 10
+
+
+def _close_matches(query: str, rows: list[tuple[Any, ...]], limit: int) -> list[str]:
+    """
+    Names from (name, score, *texts) rows in bm25 order, keeping those whose
+    texts have at least MIN_SHARED_TRIGRAMS of the query's trigrams, most
+    shared first. Sharing a common trigram or two isn't a suggestion.
+    """
+    best: dict[str, tuple[float, float]] = {}
+    for name, score, *texts in rows:
+        shared = shared_trigrams(query, *texts)
+        if shared >= MIN_SHARED_TRIGRAMS and (name not in best or (-shared, score) < best[name]):
+            best[name] = (-shared, score)
+    return sorted(best, key=best.get)[:limit]
+
+
+def search_tracks(con: sqlite3.Connection, query: str, limit: int = 5) -> list[str]:
+    """
+    Tracks whose names or aliases look like `query`, best match first
+    (typo-tolerant: ranked by shared trigrams).
+    """
+    match = trigram_match(query)
+    if match is None:
+        return []
+    return _close_matches(query, con.execute(
+        """
+        SELECT a.track, f.rank, a.search_name
+        FROM track_aliases_fts f
+        JOIN track_aliases a ON a.alias_id = f.rowid
+        WHERE track_aliases_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+        """,
+        (match, limit * SEARCH_CANDIDATES)
+    ).fetchall(), limit)
+
+
+def search_driver_names(con: sqlite3.Connection, query: str, limit: int = 5) -> list[str]:
+    """
+    Full names of drivers any of whose names or short names look like
+    `query`, best match first (typo-tolerant: ranked by shared trigrams).
+    Drivers are suggested under their current name.
+    """
+    match = trigram_match(query)
+    if match is None:
+        return []
+    rows = con.execute(
+        """
+        SELECT TRIM(COALESCE(p.first_name, '') || ' ' || COALESCE(p.last_name, '')),
+               f.rank, f.search_name, f.search_short
+        FROM player_names_fts f
+        JOIN players p ON p.player_key = f.rowid
+        WHERE player_names_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+        """,
+        (match, limit * SEARCH_CANDIDATES)
+    ).fetchall()
+    # One line per name the driver has raced under
+    return _close_matches(query, [
+        (name, score, *names.split("\n"), *shorts.split("\n"))
+        for name, score, names, shorts in rows if name
+    ], limit)
+
+
 def _get_top_times_for_session_type(
     con: sqlite3.Connection,
     track_name: str,
@@ -147,16 +209,18 @@ def _get_top_times_for_session_type(
         SELECT
           s.session_type,
           e.best_lap_ms,
-          e.first_name,
-          e.last_name,
-          e.short_name,
+          n.first_name,
+          n.last_name,
+          n.short_name,
           e.car_model,
           s.file_mtime_utc
         FROM entries e
         -- JOIN sessions to get track and session type info
         JOIN sessions s ON e.session_id = s.session_id
+        -- The driver's name as it was in that session
+        LEFT JOIN player_names n ON n.name_id = e.name_id
         WHERE s.track = ?
-          AND UPPER(s.session_type) = ?
+          AND s.session_type = ?
           AND e.best_lap_ms IS NOT NULL
         ORDER BY e.best_lap_ms ASC
         LIMIT ?
@@ -190,8 +254,8 @@ def fetch_available_tracks(con: sqlite3.Connection) -> list[tuple[str]]:
     """
     Get list of all tracks that have Q/R sessions with best lap times.
     
-    Uses DISTINCT to ensure each track appears only once, and JOINs with entries
-    to filter out tracks that don't have any actual lap times recorded.
+    Reads the tracks table the importer keeps up to date (see db/tracks.py)
+    instead of joining sessions and entries.
     
     Args:
         con: Database connection
@@ -201,33 +265,84 @@ def fetch_available_tracks(con: sqlite3.Connection) -> list[tuple[str]]:
     """
     return con.execute(
         """
-        SELECT DISTINCT s.track
-        FROM sessions s
-        -- JOIN entries to ensure we only get tracks with actual lap times
-        JOIN entries e ON s.session_id = e.session_id
-        WHERE UPPER(s.session_type) IN ('Q', 'R')
-          AND e.best_lap_ms IS NOT NULL
-        ORDER BY s.track ASC
+        SELECT track
+        FROM tracks
+        WHERE q_sessions > 0 OR r_sessions > 0
+        ORDER BY track ASC
         """
     ).fetchall()
 
 
+def fetch_tracks(con: sqlite3.Connection) -> list[tuple[Any, ...]]:
+    """
+    Every track with its counts: (track, track_key, display_name, image_file,
+    sessions, q_sessions, r_sessions, last_session_utc).
+    """
+    return con.execute(
+        """
+        SELECT track, track_key, display_name, image_file, sessions, q_sessions, r_sessions, last_session_utc
+        FROM tracks
+        ORDER BY track ASC
+        """
+    ).fetchall()
+
+
+def fetch_track_aliases(con: sqlite3.Connection) -> list[tuple[str, str, str]]:
+    """Every track alias as (alias, search_name, track), in the order find_track_match() tries them."""
+    return con.execute(
+        "SELECT alias, search_name, track FROM track_aliases ORDER BY alias_id"
+    ).fetchall()
+
+
+def save_track_details(con: sqlite3.Connection, details: list[tuple[str, str | None, str]]) -> None:
+    """Store (display_name, image_file, track) as worked out by the bot."""
+    con.executemany(
+        "UPDATE tracks SET display_name = ?, image_file = ? WHERE track = ?",
+        details,
+    )
+    con.commit()
+
+
 def fetch_all_players(con: sqlite3.Connection) -> list[tuple[str, str]]:
-    """Get list of all unique players (first_name, last_name) from entries."""
+    """Get list of all unique players (first_name, last_name), by their current name."""
     return con.execute(
         """
         SELECT DISTINCT 
             COALESCE(first_name, '') as first_name,
             COALESCE(last_name, '') as last_name
-        FROM entries
-        WHERE (first_name IS NOT NULL OR last_name IS NOT NULL)
-          AND player_id IS NOT NULL
+        FROM players
+        WHERE first_name IS NOT NULL OR last_name IS NOT NULL
         ORDER BY first_name, last_name
         """
     ).fetchall()
 
 
-def fetch_player_pbs(con: sqlite3.Connection, first_name: str, last_name: str) -> list[tuple[Any, ...]]:
+def find_player(con: sqlite3.Connection, name: str) -> tuple[int, str] | None:
+    """
+    Find a player by full name ("First Last", case-insensitive), including
+    names they raced under before.
+    
+    If several players match, a current name wins over an old one, then the
+    most recently seen player.
+    
+    Returns:
+        Tuple of (player_key, current full name) or None
+    """
+    return con.execute(
+        """
+        SELECT p.player_key, TRIM(COALESCE(p.first_name, '') || ' ' || COALESCE(p.last_name, ''))
+        FROM player_names n
+        JOIN players p ON p.player_key = n.player_key
+        WHERE n.full_name = ? COLLATE NOCASE
+        ORDER BY (n.first_name IS p.first_name AND n.last_name IS p.last_name) DESC,
+                 p.last_seen_utc DESC
+        LIMIT 1
+        """,
+        (name.strip(),)
+    ).fetchone()
+
+
+def fetch_player_pbs(con: sqlite3.Connection, player_key: int) -> list[tuple[Any, ...]]:
     """
     Get personal bests for a specific player across all tracks.
     
@@ -236,8 +351,7 @@ def fetch_player_pbs(con: sqlite3.Connection, first_name: str, last_name: str) -
     
     Args:
         con: Database connection
-        first_name: Player's first name
-        last_name: Player's last name
+        player_key: The player's key (see find_player)
     
     Returns:
         List of tuples containing track, session_type, best_lap_ms, car_model, and timestamp
@@ -249,23 +363,22 @@ def fetch_player_pbs(con: sqlite3.Connection, first_name: str, last_name: str) -
         WITH player_entries AS (
             SELECT 
                 s.track,
-                UPPER(s.session_type) as session_type,
+                s.session_type,
                 e.best_lap_ms,
                 e.car_model,
                 s.file_mtime_utc,
                 -- Window function: Partition by track and session type, order by best lap time
                 -- rn = 1 means this is the player's best time for this track/session combo
                 ROW_NUMBER() OVER (
-                    PARTITION BY s.track, UPPER(s.session_type) 
+                    PARTITION BY s.track, s.session_type 
                     ORDER BY e.best_lap_ms ASC
                 ) as rn
             FROM entries e
             -- JOIN sessions to get track and session type
             JOIN sessions s ON e.session_id = s.session_id
-            WHERE UPPER(s.session_type) IN ('Q', 'R')
+            WHERE s.session_type IN ('Q', 'R')
               AND e.best_lap_ms IS NOT NULL
-              AND e.first_name = ?
-              AND e.last_name = ?
+              AND e.player_key = ?
         )
         -- Select only the best time (rn = 1) for each track/session combination
         SELECT 
@@ -278,10 +391,10 @@ def fetch_player_pbs(con: sqlite3.Connection, first_name: str, last_name: str) -
         WHERE rn = 1
         ORDER BY track, session_type
         """
-    , (first_name, last_name)).fetchall()
+    , (player_key,)).fetchall()
 
 
-def get_player_rank(con: sqlite3.Connection, track: str, session_type: str, best_lap_ms: int, first_name: str, last_name: str) -> tuple[int, int]:
+def get_player_rank(con: sqlite3.Connection, track: str, session_type: str, best_lap_ms: int) -> tuple[int, int]:
     """
     Get player's rank on a track. Returns (rank, total_drivers).
     
@@ -294,8 +407,6 @@ def get_player_rank(con: sqlite3.Connection, track: str, session_type: str, best
         track: Track name
         session_type: Session type ('Q' or 'R')
         best_lap_ms: Player's best lap time in milliseconds
-        first_name: Player's first name (for context, not used in query)
-        last_name: Player's last name (for context, not used in query)
     
     Returns:
         Tuple of (rank, total_drivers) where rank is 1-indexed
@@ -308,17 +419,16 @@ def get_player_rank(con: sqlite3.Connection, track: str, session_type: str, best
         -- GROUP BY ensures we only count each player once (their best time)
         WITH player_bests AS (
             SELECT 
-                e.first_name,
-                e.last_name,
+                e.player_key,
                 MIN(e.best_lap_ms) as best_time
             FROM entries e
             -- JOIN sessions to filter by track and session type
             JOIN sessions s ON e.session_id = s.session_id
             WHERE s.track = ?
-              AND UPPER(s.session_type) = ?
+              AND s.session_type = ?
               AND e.best_lap_ms IS NOT NULL
-              AND e.player_id IS NOT NULL
-            GROUP BY e.player_id, e.first_name, e.last_name
+              AND e.player_key IS NOT NULL
+            GROUP BY e.player_key
         )
         -- Count players with better (lower) times, then add 1 for rank
         -- If 0 players have better times, rank = 1 (first place)
@@ -333,14 +443,14 @@ def get_player_rank(con: sqlite3.Connection, track: str, session_type: str, best
     # Step 2: Get total number of unique drivers with times on this track
     total_result = con.execute(
         """
-        SELECT COUNT(DISTINCT e.player_id)
+        SELECT COUNT(DISTINCT e.player_key)
         FROM entries e
         -- JOIN sessions to filter by track and session type
         JOIN sessions s ON e.session_id = s.session_id
         WHERE s.track = ?
-          AND UPPER(s.session_type) = ?
+          AND s.session_type = ?
           AND e.best_lap_ms IS NOT NULL
-          AND e.player_id IS NOT NULL
+          AND e.player_key IS NOT NULL
         """,
         (track, session_type)
     ).fetchone()
@@ -365,40 +475,37 @@ def get_track_record(con: sqlite3.Connection, track: str, session_type: str) ->
     return result[0] if result else None
 
 
-def get_session_count(con: sqlite3.Connection, track: str, session_type: str, first_name: str, last_name: str) -> int:
+def get_session_count(con: sqlite3.Connection, track: str, session_type: str, player_key: int) -> int:
     """Get the number of sessions a player has completed on a track."""
     result = con.execute(
         """
         SELECT COUNT(DISTINCT s.session_id)
         FROM entries e
         JOIN sessions s ON e.session_id = s.session_id
-        WHERE s.track = ?
-          AND UPPER(s.session_type) = ?
-          AND e.first_name = ?
-          AND e.last_name = ?
+        WHERE e.player_key = ?
           AND e.best_lap_ms IS NOT NULL
+          AND s.track = ?
+          AND s.session_type = ?
         """,
-        (track, session_type, first_name, last_name)
+        (player_key, track, session_type)
     ).fetchone()
     
     return result[0] if result else 0
 
 
-def get_previous_pb(con: sqlite3.Connection, track: str, session_type: str, current_pb_ms: int, first_name: str, last_name: str) -> int | None:
+def get_previous_pb(con: sqlite3.Connection, track: str, session_type: str, current_pb_ms: int, player_key: int) -> int | None:
     """Get the previous PB (second best time) for a player on a track. Returns None if no previous PB exists."""
     result = con.execute(
         """
         SELECT MIN(e.best_lap_ms)
         FROM entries e
         JOIN sessions s ON e.session_id = s.session_id
-        WHERE s.track = ?
-          AND UPPER(s.session_type) = ?
-          AND e.first_name = ?
-          AND e.last_name = ?
-          AND e.best_lap_ms IS NOT NULL
+        WHERE e.player_key = ?
           AND e.best_lap_ms > ?
+          AND s.track = ?
+          AND s.session_type = ?
         """,
-        (track, session_type, first_name, last_name, current_pb_ms)
+        (player_key, current_pb_ms, track, session_type)
     ).fetchone()
     
     return result[0] if result else None
@@ -432,16 +539,17 @@ def _get_best_time_for_track_session(
         """
         SELECT
           e.best_lap_ms,
-          e.first_name,
-          e.last_name,
-          e.short_name,
+          n.first_name,
+          n.last_name,
+          n.short_name,
           e.car_model,
           s.file_mtime_utc
         FROM entries e
         -- JOIN sessions to get track and session type info
         JOIN sessions s ON e.session_id = s.session_id
+        LEFT JOIN player_names n ON n.name_id = e.name_id
         WHERE s.track = ?
-          AND UPPER(s.session_type) = ?
+          AND s.session_type = ?
           AND e.best_lap_ms IS NOT NULL
         ORDER BY e.best_lap_ms ASC
         LIMIT 1
@@ -466,18 +574,8 @@ def fetch_all_tracks_top_times(con: sqlite3.Connection) -> dict[str, dict[str, t
     """
     tracks_data = {}
     
-    # Get all unique tracks that have Q/R sessions with times
-    all_tracks = con.execute(
-        """
-        SELECT DISTINCT s.track
-        FROM sessions s
-        -- JOIN entries to ensure we only get tracks with actual lap times
-        JOIN entries e ON s.session_id = e.session_id
-        WHERE UPPER(s.session_type) IN ('Q', 'R')
-          AND e.best_lap_ms IS NOT NULL
-        ORDER BY s.track ASC
-        """
-    ).fetchall()
+    # Get all tracks that have Q/R sessions with times
+    all_tracks = fetch_available_tracks(con)
     
     # For each track, get best Q and R times using helper function
     for (track,) in all_tracks:
@@ -492,10 +590,12 @@ def fetch_all_tracks_top_times(con: sqlite3.Connection) -> dict[str, dict[str, t
     return tracks_data
 
 
-def fetch_race_results_queue(con: sqlite3.Connection) -> list[tuple[Any, ...]]:
-    """Fetch pending race results announcements."""
+def fetch_race_results_queue(con: sqlite3.Connection, announcement_ids: list[int] | None = None,
+                             limit: int | None = BATCH_SIZE) -> list[tuple[Any, ...]]:
+    """Fetch pending race results announcements (optionally only `announcement_ids`; limit None = all)."""
+    ids_sql, ids_params = _ids_filter("r.announcement_id", announcement_ids)
     return con.execute(
-        """
+        f"""
         SELECT
           r.announcement_id,
           r.session_id,
@@ -503,10 +603,11 @@ def fetch_race_results_queue(con: sqlite3.Connection) -> list[tuple[Any, ...]]:
           r.announced_at_utc
         FROM race_results_announcements r
         WHERE r.discord_message_id IS NULL
+          {ids_sql}
         ORDER BY r.announced_at_utc ASC
         LIMIT ?
         """,
-        (BATCH_SIZE,),
+        (*ids_params, -1 if limit is None else limit),
     ).fetchall()
 
 
@@ -544,19 +645,20 @@ def fetch_race_session_data(con: sqlite3.Connection, session_id: int) -> tuple[t
     entries = con.execute(
         """
         SELECT 
-            position,
-            first_name,
-            last_name,
-            short_name,
-            car_model,
-            race_number,
-            best_lap_ms,
-            total_time_ms,
-            lap_count,
-            car_group
-        FROM entries
-        WHERE session_id = ?
-        ORDER BY position ASC
+            e.position,
+            n.first_name,
+            n.last_name,
+            n.short_name,
+            e.car_model,
+            e.race_number,
+            e.best_lap_ms,
+            e.total_time_ms,
+            e.lap_count,
+            e.car_group
+        FROM entries e
+        LEFT JOIN player_names n ON n.name_id = e.name_id
+        WHERE e.session_id = ?
+        ORDER BY e.position ASC
         """,
         (session_id,)
     ).fetchall()
@@ -564,17 +666,16 @@ def fetch_race_session_data(con: sqlite3.Connection, session_id: int) -> tuple[t
     return session, entries
 
 
-def fetch_player_pb_with_sectors(con: sqlite3.Connection, first_name: str, last_name: str, track: str, session_type: str) -> tuple[int, str | None, int | None, str] | None:
+def fetch_player_pb_with_sectors(con: sqlite3.Connection, player_key: int, track: str, session_type: str) -> tuple[int, str | None, int | None, str] | None:
     """
     Get player's personal best for a specific track/session with sector data.
     
-    Uses GROUP BY to handle cases where the same player might have multiple entries
-    with the same best time, and MIN() to get the earliest timestamp when that time was set.
+    If the player set the same best time more than once, the earliest
+    session is the one that counts.
     
     Args:
         con: Database connection
-        first_name: Player's first name
-        last_name: Player's last name
+        player_key: The player's key (see find_player)
         track: Track name
         session_type: Session type ('Q' or 'R')
     
@@ -587,22 +688,19 @@ def fetch_player_pb_with_sectors(con: sqlite3.Connection, first_name: str, last_
             e.best_lap_ms,
             e.best_splits_json,
             e.car_model,
-            -- MIN() gets the earliest timestamp if multiple entries have the same best time
-            MIN(s.file_mtime_utc) as set_at_utc
+            s.file_mtime_utc as set_at_utc
         FROM entries e
         -- JOIN sessions to filter by track and session type
         JOIN sessions s ON e.session_id = s.session_id
-        WHERE s.track = ?
-          AND UPPER(s.session_type) = ?
+        WHERE e.player_key = ?
           AND e.best_lap_ms IS NOT NULL
-          AND e.first_name = ?
-          AND e.last_name = ?
-        -- GROUP BY ensures we aggregate properly if player has multiple entries
-        GROUP BY e.first_name, e.last_name
-        ORDER BY e.best_lap_ms ASC
+          AND s.track = ?
+          AND s.session_type = ?
+        -- Fastest lap; the earliest session if the same time was set more than once
+        ORDER BY e.best_lap_ms ASC, s.file_mtime_utc ASC
         LIMIT 1
         """,
-        (track, session_type, first_name, last_name)
+        (player_key, track, session_type)
     ).fetchone()
     
     return result
@@ -633,7 +731,7 @@ def fetch_track_record_with_sectors(con: sqlite3.Connection, track: str, session
                 FROM entries e 
                 JOIN sessions s ON e.session_id = s.session_id
                 WHERE s.track = r.track 
-                  AND UPPER(s.session_type) = r.session_type
+                  AND s.session_type = r.session_type
                   AND e.best_lap_ms = r.best_lap_ms
                   AND e.best_splits_json IS NOT NULL
                 LIMIT 1) as best_splits_json
@@ -659,6 +757,30 @@ def mark_race_results_sent(con: sqlite3.Connection, announcement_id: int, messag
     con.commit()
 
 
+def mark_announcements_sent(
+    con: sqlite3.Connection,
+    record_messages: list[tuple[int, int]],
+    race_results_messages: list[tuple[int, int]],
+) -> None:
+    """
+    Mark several announcements as sent in one transaction.
+    
+    Args:
+        con: Database connection
+        record_messages: (announcement_id, message_id) pairs for record_announcements
+        race_results_messages: (announcement_id, message_id) pairs for race_results_announcements
+    """
+    con.executemany(
+        "UPDATE record_announcements SET discord_message_id = ? WHERE announcement_id = ?",
+        [(str(message_id), announcement_id) for announcement_id, message_id in record_messages],
+    )
+    con.executemany(
+        "UPDATE race_results_announcements SET discord_message_id = ? WHERE announcement_id = ?",
+        [(str(message_id), announcement_id) for announcement_id, message_id in race_results_messages],
+    )
+    con.commit()
+
+
 def get_previous_track_record(con: sqlite3.Connection, track: str, session_type: str, current_best_ms: int) -> int | None:
     """
     Get the previous track record (second-best time) for a track and session type.
@@ -670,7 +792,7 @@ def get_previous_track_record(con: sqlite3.Connection, track: str, session_type:
         FROM entries e
         JOIN sessions s ON e.session_id = s.session_id
         WHERE s.track = ?
-          AND UPPER(s.session_type) = ?
+          AND s.session_type = ?
           AND e.best_lap_ms IS NOT NULL
           AND e.best_lap_ms > ?
         ORDER BY e.best_lap_ms ASC
@@ -682,18 +804,62 @@ def get_previous_track_record(con: sqlite3.Connection, track: str, session_type:
     return result[0] if result else None
 
 
-def get_player_previous_rank(con: sqlite3.Connection, track: str, session_type: str, current_best_ms: int, first_name: str, last_name: str) -> int | None:
+def get_player_previous_rank(con: sqlite3.Connection, track: str, session_type: str, current_best_ms: int, player_key: int) -> int | None:
     """
     Get player's previous rank on a track (based on their previous PB).
     Returns None if no previous PB exists.
     """
     # Get player's previous best time (excluding current one)
-    previous_pb = get_previous_pb(con, track, session_type, current_best_ms, first_name, last_name)
+    previous_pb = get_previous_pb(con, track, session_type, current_best_ms, player_key)
     
     if previous_pb is None:
         return None
     
     # Calculate rank with previous PB
-    rank, _ = get_player_rank(con, track, session_type, previous_pb, first_name, last_name)
+    rank, _ = get_player_rank(con, track, session_type, previous_pb)
     return rank
 
+
+
+def fetch_ranked_entries(con: sqlite3.Connection, after_entry_id: int = 0) -> list[tuple[Any, ...]]:
+    """
+    Entries with a lap time, for the bot's in-memory rank index (bot/rank_index.py).
+    
+    Entries are only ever appended, so the index passes the last entry_id it
+    has seen and gets just the new ones.
+    
+    Returns:
+        (entry_id, track, session_type, player_key, best_lap_ms,
+        file_mtime_utc) ordered by entry_id
+    """
+    return con.execute(
+        """
+        SELECT e.entry_id, s.track, s.session_type, e.player_key, e.best_lap_ms, s.file_mtime_utc
+        FROM entries e
+        JOIN sessions s ON e.session_id = s.session_id
+        WHERE e.entry_id > ?
+          AND e.best_lap_ms IS NOT NULL
+        ORDER BY e.entry_id
+        """,
+        (after_entry_id,)
+    ).fetchall()
+
+
+def fetch_track_image_urls(con: sqlite3.Connection) -> list[tuple[str, str, str]]:
+    """Stored Discord URLs of uploaded track images: (image_file, content_hash, url)."""
+    return con.execute(
+        "SELECT image_file, content_hash, url FROM track_image_urls"
+    ).fetchall()
+
+
+def save_track_image_urls(con: sqlite3.Connection, urls: list[tuple[str, str, str]]) -> None:
+    """Store (image_file, content_hash, url) for uploaded track images, replacing older URLs."""
+    uploaded_at_utc = datetime.now(timezone.utc).isoformat()
+    con.executemany(
+        """
+        INSERT OR REPLACE INTO track_image_urls (image_file, content_hash, url, uploaded_at_utc)
+        VALUES (?, ?, ?, ?)
+        """,
+        [(*row, uploaded_at_utc) for row in urls],
+    )
+    con.commit()
@@ -0,0 +1,294 @@
+"""
+Bulk rebuild of the tables derived from sessions/entries.
+
+The importer maintains records, personal_bests, the tracks session counts
+and the TR/PB announcement ledger incrementally, one session at a time. If they ever get out of sync
+(manual edits, an interrupted experiment, a bug), replaying every session
+through maybe_update_records() is O(sessions x history). This module
+recomputes them in bulk with window functions instead, one track at a time,
+so tracks can be computed concurrently.
+
+The result matches a session-by-session replay in import (session_id) order
+with every announcement already sent:
+
+- records: the first session to set the fastest lap per track/type
+- TR announcements: every session whose best lap beat all earlier sessions
+- PB announcements: every time a driver beat all of their own earlier
+  sessions, except when that lap was the session's new track record, and
+  only when no earlier session announced the same track/type/lap time
+  (that one would have been treated as already announced); drivers tying
+  within one session each get theirs
+"""
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from db.connection import begin_write, connect
+from db.tracks import rebuild_tracks
+
+# Stored in discord_message_id for rebuilt announcements: sent, but no real message
+REBUILT_MESSAGE_ID = "rebuilt"
+
+
+def _record_rows(con: sqlite3.Connection, track: str) -> list[tuple]:
+    """Track record rows (records table layout) for one track."""
+    return con.execute(
+        """
+        SELECT track, session_type, best_lap_ms, player_id, first_name, last_name, short_name,
+               car_model, race_number, cup_category, session_id, file_mtime_utc
+        FROM (
+            SELECT s.track, s.session_type, e.best_lap_ms, pl.player_id, n.first_name, n.last_name,
+                   n.short_name, e.car_model, e.race_number, e.cup_category, s.session_id, s.file_mtime_utc,
+                   -- Fastest lap; on a tie the earliest session keeps the record
+                   ROW_NUMBER() OVER (
+                       PARTITION BY s.session_type
+                       ORDER BY e.best_lap_ms ASC, s.session_id ASC, e.entry_id ASC
+                   ) AS rn
+            FROM entries e
+            JOIN sessions s ON e.session_id = s.session_id
+            LEFT JOIN players pl ON pl.player_key = e.player_key
+            LEFT JOIN player_names n ON n.name_id = e.name_id
+            WHERE s.track = ?
+              AND s.session_type IN ('Q', 'R')
+              AND e.best_lap_ms IS NOT NULL
+        )
+        WHERE rn = 1
+        """,
+        (track,)
+    ).fetchall()
+
+
+def _personal_best_rows(con: sqlite3.Connection, track: str) -> list[tuple]:
+    """personal_bests rows for one track."""
+    return con.execute(
+        """
+        SELECT s.track, s.session_type, e.player_key, MIN(e.best_lap_ms)
+        FROM entries e
+        JOIN sessions s ON e.session_id = s.session_id
+        WHERE s.track = ?
+          AND s.session_type IN ('Q', 'R')
+          AND e.best_lap_ms IS NOT NULL AND e.player_key IS NOT NULL
+        GROUP BY s.session_type, e.player_key
+        """,
+        (track,)
+    ).fetchall()
+
+
+def _announcement_rows(con: sqlite3.Connection, track: str) -> list[tuple]:
+    """
+    TR/PB ledger rows for one track.
+
+    Returns (session_id, order, track, session_type, best_lap_ms,
+    announced_at_utc, announcement_type, player_id, first_name, last_name,
+    short_name, car_model) tuples; order (0 for TR, then entry order) only
+    sorts the final insert.
+    """
+    # Sessions whose best lap beat every earlier session on this track/type
+    track_records = con.execute(
+        """
+        WITH session_best AS (
+            -- Fastest entry per session (the first one on a tie, as the importer picks it)
+            SELECT session_id, session_type, file_mtime_utc, best_lap_ms,
+                   player_id, first_name, last_name, short_name, car_model
+            FROM (
+                SELECT s.session_id, s.session_type, s.file_mtime_utc, e.best_lap_ms,
+                       pl.player_id, n.first_name, n.last_name, n.short_name, e.car_model,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY s.session_id ORDER BY e.best_lap_ms ASC, e.entry_id ASC
+                       ) AS rn
+                FROM sessions s
+                JOIN entries e ON e.session_id = s.session_id
+                LEFT JOIN players pl ON pl.player_key = e.player_key
+                LEFT JOIN player_names n ON n.name_id = e.name_id
+                WHERE s.track = ?
+                  AND s.session_type IN ('Q', 'R')
+                  AND e.best_lap_ms IS NOT NULL
+            )
+            WHERE rn = 1
+        ),
+        running AS (
+            SELECT *,
+                   MIN(best_lap_ms) OVER (
+                       PARTITION BY session_type ORDER BY session_id
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                   ) AS previous_best
+            FROM session_best
+        )
+        SELECT session_id, session_type, best_lap_ms, file_mtime_utc,
+               player_id, first_name, last_name, short_name, car_model
+        FROM running
+        WHERE previous_best IS NULL OR best_lap_ms < previous_best
+        """,
+        (track,)
+    ).fetchall()
+
+    # Each driver's best per session, where it beat all their earlier sessions
+    personal_bests = con.execute(
+        """
+        WITH player_session AS (
+            -- The driver's fastest entry per session (the first one on a tie, as the importer picks it)
+            SELECT session_id, session_type, file_mtime_utc, player_key, best_lap_ms, entry_id
+            FROM (
+                SELECT s.session_id, s.session_type, s.file_mtime_utc, e.player_key, e.best_lap_ms, e.entry_id,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY s.session_id, e.player_key ORDER BY e.best_lap_ms ASC, e.entry_id ASC
+                       ) AS rn
+                FROM sessions s
+                JOIN entries e ON e.session_id = s.session_id
+                WHERE s.track = ?
+                  AND s.session_type IN ('Q', 'R')
+                  AND e.best_lap_ms IS NOT NULL AND e.player_key IS NOT NULL
+            )
+            WHERE rn = 1
+        ),
+        running AS (
+            SELECT *,
+                   MIN(best_lap_ms) OVER (
+                       PARTITION BY session_type, player_key ORDER BY session_id
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                   ) AS previous_best
+            FROM player_session
+        )
+        SELECT r.session_id, r.session_type, r.best_lap_ms, r.file_mtime_utc, r.entry_id,
+               pl.player_id, n.first_name, n.last_name, n.short_name, e.car_model
+        FROM running r
+        JOIN entries e ON e.entry_id = r.entry_id
+        JOIN players pl ON pl.player_key = e.player_key
+        LEFT JOIN player_names n ON n.name_id = e.name_id
+        WHERE r.previous_best IS NULL OR r.best_lap_ms < r.previous_best
+        ORDER BY r.session_id, r.entry_id
+        """,
+        (track,)
+    ).fetchall()
+
+    rows = [
+        (session_id, 0, track, stype, best_lap_ms, at, "TR", *driver)
+        for session_id, stype, best_lap_ms, at, *driver in track_records
+    ]
+    new_record_lap = {row[0]: row[2] for row in track_records}
+    # (session_type, best_lap_ms) announced by earlier sessions; the importer
+    # only checks those, so drivers tying a PB within one session all get one
+    announced = set()
+    current_session, current_laps = None, set()
+    for session_id, stype, best_lap_ms, at, entry_id, *driver in personal_bests:
+        if session_id != current_session:
+            announced |= current_laps
+            current_session, current_laps = session_id, set()
+        # Same lap as the session's new track record: the TR covers it
+        if new_record_lap.get(session_id) == best_lap_ms:
+            continue
+        # Same track/type/time as a PB from an earlier session: counted as already announced
+        if (stype, best_lap_ms) in announced:
+            continue
+        current_laps.add((stype, best_lap_ms))
+        rows.append((session_id, entry_id, track, stype, best_lap_ms, at, "PB", *driver))
+    return rows
+
+
+def compute_track(con: sqlite3.Connection, track: str, announcements: bool = False) -> tuple[list, list, list]:
+    """
+    Compute the derived rows for one track.
+
+    Returns:
+        Tuple of (record_rows, personal_best_rows, announcement_rows);
+        announcement_rows is empty unless `announcements` is set
+    """
+    return (
+        _record_rows(con, track),
+        _personal_best_rows(con, track),
+        _announcement_rows(con, track) if announcements else [],
+    )
+
+
+def _compute_track_worker(job):
+    """Worker-process side of rebuild_derived(): read-only connection per track."""
+    db_path, track, announcements = job
+    con = connect(db_path, readonly=True)
+    try:
+        return compute_track(con, track, announcements)
+    finally:
+        con.close()
+
+
+def rebuild_derived(con: sqlite3.Connection, db_path: str | None = None, workers: int = 1,
+                    announcements: bool = False) -> dict:
+    """
+    Recompute records, personal_bests and the tracks counts (and optionally
+    the TR/PB announcement ledger) from sessions and entries.
+
+    The write lock is taken first, so the importer can't add sessions
+    while the rebuild runs; tracks are then computed in `workers` processes
+    reading `db_path` (or on `con` itself with one worker) and written back
+    in one transaction. Rebuilt announcements replace every TR/PB row and
+    are marked as sent, so the bot won't post history again.
+
+    Args:
+        con: Database connection (schema already migrated)
+        db_path: Database file, needed for workers > 1
+        workers: Number of processes computing tracks in parallel
+        announcements: Also rebuild the TR/PB rows in record_announcements
+
+    Returns:
+        Dict with the number of tracks, records, personal_bests and announcements written
+    """
+    if con.in_transaction:
+        con.commit()
+    begin_write(con)
+    try:
+        tracks = [row[0] for row in con.execute(
+            "SELECT DISTINCT track FROM sessions WHERE session_type IN ('Q', 'R') ORDER BY track"
+        )]
+
+        if workers > 1 and db_path and len(tracks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_compute_track_worker, [(db_path, t, announcements) for t in tracks]))
+        else:
+            results = [compute_track(con, t, announcements) for t in tracks]
+
+        record_rows = [row for r in results for row in r[0]]
+        personal_best_rows = [row for r in results for row in r[1]]
+        announcement_rows = sorted(row for r in results for row in r[2])
+
+        con.execute("DELETE FROM records")
+        con.executemany(
+            """
+            INSERT INTO records
+            (track, session_type, best_lap_ms, player_id, first_name, last_name, short_name,
+             car_model, race_number, cup_category, set_session_id, set_at_utc)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            record_rows,
+        )
+
+        con.execute("DELETE FROM personal_bests")
+        con.executemany(
+            "INSERT INTO personal_bests (track, session_type, player_key, best_lap_ms) VALUES (?, ?, ?, ?)",
+            personal_best_rows,
+        )
+
+        rebuild_tracks(con)
+
+        if announcements:
+            con.execute(
+                "DELETE FROM record_announcements WHERE COALESCE(announcement_type, 'TR') IN ('TR', 'PB')"
+            )
+            con.executemany(
+                """
+                INSERT INTO record_announcements
+                (track, session_type, best_lap_ms, announced_at_utc, discord_message_id, announcement_type,
+                 session_id, player_id, first_name, last_name, short_name, car_model)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [row[2:6] + (REBUILT_MESSAGE_ID, row[6], row[0]) + row[7:] for row in announcement_rows],
+            )
+
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+    return {
+        "tracks": len(tracks),
+        "records": len(record_rows),
+        "personal_bests": len(personal_best_rows),
+        "announcements": len(announcement_rows),
+    }
@@ -0,0 +1,694 @@
+"""
+Database schema and versioned migrations.
+
+The schema version is stored in PRAGMA user_version. migrate() applies every
+migration newer than that version, each in its own transaction, so a fresh
+file and a database created by older versions of the importer both end up
+with the same layout.
+
+To change the schema, append a new migration to MIGRATIONS; never edit one
+that has already shipped.
+"""
+import sqlite3
+from typing import Callable
+
+from db.search import add_track_aliases, index_player_names, search_text
+from db.tracks import rebuild_tracks
+
+
+def _columns(cur: sqlite3.Cursor, table: str) -> set[str]:
+    return {row[1] for row in cur.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_column(cur: sqlite3.Cursor, table: str, column: str, definition: str) -> None:
+    """Add a column unless it already exists (older databases got some of these ad hoc)."""
+    if column not in _columns(cur, table):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _v1_base_tables(cur: sqlite3.Cursor) -> None:
+    """Base tables, plus the columns/tables earlier importers added on the fly."""
+    # Session metadata
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_file TEXT NOT NULL UNIQUE,
+            session_type TEXT NOT NULL,
+            track TEXT NOT NULL,
+            server_name TEXT,
+            is_wet INTEGER,
+            session_index INTEGER,
+            race_weekend_index INTEGER,
+            file_mtime_utc TEXT NOT NULL
+        )
+    """)
+
+    # Driver entries per session
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS entries (
+            entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            car_id INTEGER,
+            race_number INTEGER,
+            car_model INTEGER,
+            cup_category INTEGER,
+            car_group TEXT,
+            player_id TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            short_name TEXT,
+            best_lap_ms INTEGER,
+            total_time_ms INTEGER,
+            lap_count INTEGER,
+            missing_mandatory_pitstop INTEGER,
+            FOREIGN KEY(session_id) REFERENCES sessions(session_id)
+        )
+    """)
+    _add_column(cur, "entries", "best_splits_json", "TEXT")
+
+    # Track records (Q/R per track)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS records (
+            track TEXT NOT NULL,
+            session_type TEXT NOT NULL,
+            best_lap_ms INTEGER NOT NULL,
+            player_id TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            short_name TEXT,
+            car_model INTEGER,
+            race_number INTEGER,
+            cup_category INTEGER,
+            set_session_id INTEGER,
+            set_at_utc TEXT NOT NULL,
+            PRIMARY KEY(track, session_type),
+            FOREIGN KEY(set_session_id) REFERENCES sessions(session_id)
+        )
+    """)
+
+    # Queue for track record and personal best announcements
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS record_announcements (
+            announcement_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            track TEXT NOT NULL,
+            session_type TEXT NOT NULL,
+            best_lap_ms INTEGER NOT NULL,
+            announced_at_utc TEXT NOT NULL,
+            discord_message_id TEXT
+        )
+    """)
+    _add_column(cur, "record_announcements", "announcement_type", "TEXT DEFAULT 'TR'")
+
+    # Queue for race result announcements
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS race_results_announcements (
+            announcement_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL UNIQUE,
+            track TEXT NOT NULL,
+            announced_at_utc TEXT NOT NULL,
+            discord_message_id TEXT,
+            FOREIGN KEY(session_id) REFERENCES sessions(session_id)
+        )
+    """)
+
+    # Per-car lap data, packed (see ingest/laps.py for the format)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS session_laps (
+            session_id INTEGER NOT NULL,
+            car_id INTEGER NOT NULL,
+            lap_count INTEGER NOT NULL,
+            split_count INTEGER NOT NULL,
+            lap_times BLOB NOT NULL,
+            splits BLOB,
+            valid_bitmap BLOB NOT NULL,
+            driver_indexes BLOB,
+            PRIMARY KEY(session_id, car_id),
+            FOREIGN KEY(session_id) REFERENCES sessions(session_id)
+        ) WITHOUT ROWID
+    """)
+
+    # One row per result file the importer has looked at, so later runs can
+    # skip it without opening the file or querying sessions.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS import_manifest (
+            filename TEXT PRIMARY KEY,
+            source_file TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            file_mtime_ns INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            session_id INTEGER,
+            updated_at_utc TEXT NOT NULL,
+            FOREIGN KEY(session_id) REFERENCES sessions(session_id)
+        )
+    """)
+
+    # Importer key/value state (e.g. the filename watermark)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS import_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+
+def _v2_upper_session_types(cur: sqlite3.Cursor) -> None:
+    """Store session_type upper case everywhere, so queries can compare it directly."""
+    cur.execute("UPDATE sessions SET session_type = UPPER(session_type) WHERE session_type != UPPER(session_type)")
+    cur.execute(
+        "UPDATE record_announcements SET session_type = UPPER(session_type) WHERE session_type != UPPER(session_type)"
+    )
+
+    # records is keyed by (track, session_type): if both spellings exist, keep the faster one
+    cur.execute("""
+        DELETE FROM records
+        WHERE EXISTS (
+            SELECT 1 FROM records other
+            WHERE other.track = records.track
+              AND other.session_type != records.session_type
+              AND UPPER(other.session_type) = UPPER(records.session_type)
+              AND (other.best_lap_ms < records.best_lap_ms
+                   OR (other.best_lap_ms = records.best_lap_ms AND other.session_type = UPPER(other.session_type)))
+        )
+    """)
+    cur.execute("UPDATE records SET session_type = UPPER(session_type) WHERE session_type != UPPER(session_type)")
+
+
+def _v3_personal_bests(cur: sqlite3.Cursor) -> None:
+    """Best lap per driver, track and session type (Q/R), maintained by the importer."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS personal_bests (
+            track TEXT NOT NULL,
+            session_type TEXT NOT NULL,
+            player_id TEXT NOT NULL,
+            best_lap_ms INTEGER NOT NULL,
+            PRIMARY KEY(track, session_type, player_id)
+        ) WITHOUT ROWID
+    """)
+
+    # Rebuild from the imported history
+    cur.execute("DELETE FROM personal_bests")
+    cur.execute("""
+        INSERT INTO personal_bests (track, session_type, player_id, best_lap_ms)
+        SELECT s.track, s.session_type, e.player_id, MIN(e.best_lap_ms)
+        FROM entries e
+        JOIN sessions s ON e.session_id = s.session_id
+        WHERE s.session_type IN ('Q', 'R')
+          AND e.best_lap_ms IS NOT NULL AND e.player_id IS NOT NULL
+        GROUP BY s.track, s.session_type, e.player_id
+    """)
+
+
+def _v4_indexes(cur: sqlite3.Cursor) -> None:
+    """Indexes for the importer's record/PB checks and the bot's query paths."""
+    # Replaces the single-column index earlier importers created ad hoc
+    cur.execute("DROP INDEX IF EXISTS idx_entries_session")
+
+    # Session filters by track + type; covers the file_mtime_utc the bot displays
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_track_type ON sessions(track, session_type, file_mtime_utc)"
+    )
+
+    # Entries of a session, in finishing order (race results, session best)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_session ON entries(session_id, position)")
+    # Per-driver lookups by player ID (PB checks, rank)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_player_best ON entries(player_id, best_lap_ms)")
+    # Per-driver lookups by name (/pb)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_entries_name ON entries(first_name, last_name, best_lap_ms)"
+    )
+    # Entry that set a given lap time (announcement driver/sector fallbacks)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_best_lap ON entries(best_lap_ms)")
+
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_record_announcements_track_type "
+        "ON record_announcements(track, session_type, best_lap_ms)"
+    )
+    # Pending queues, in the order the bot sends them
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_record_announcements_pending "
+        "ON record_announcements(announced_at_utc) WHERE discord_message_id IS NULL"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_race_results_announcements_pending "
+        "ON race_results_announcements(announced_at_utc) WHERE discord_message_id IS NULL"
+    )
+
+
+def _v5_content_hashes(cur: sqlite3.Cursor) -> None:
+    """Content hash per session and manifest row, so moved/copied files are recognized."""
+    # NULL for sessions imported before this; the importer fills them in on a full rescan
+    _add_column(cur, "sessions", "content_hash", "TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_content_hash ON sessions(content_hash)")
+
+    # Which path (and file name) each hash was seen under
+    _add_column(cur, "import_manifest", "content_hash", "TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_import_manifest_content_hash ON import_manifest(content_hash)")
+
+
+def _v6_announcement_identity(cur: sqlite3.Cursor) -> None:
+    """Driver and session on each TR/PB announcement, written by the importer when it queues one."""
+    _add_column(cur, "record_announcements", "session_id", "INTEGER REFERENCES sessions(session_id)")
+    _add_column(cur, "record_announcements", "player_id", "TEXT")
+    # Name and car as they were in that session, not as the driver is called today
+    _add_column(cur, "record_announcements", "first_name", "TEXT")
+    _add_column(cur, "record_announcements", "last_name", "TEXT")
+    _add_column(cur, "record_announcements", "short_name", "TEXT")
+    _add_column(cur, "record_announcements", "car_model", "INTEGER")
+
+    # Backfill existing rows the way the bot used to resolve them: the current
+    # record holder if the time matches the record...
+    cur.execute("""
+        UPDATE record_announcements
+        SET (session_id, player_id, first_name, last_name, short_name, car_model) = (
+            SELECT r.set_session_id, r.player_id, r.first_name, r.last_name, r.short_name, r.car_model
+            FROM records r
+            WHERE r.track = record_announcements.track
+              AND r.session_type = record_announcements.session_type
+              AND r.best_lap_ms = record_announcements.best_lap_ms
+        )
+        WHERE session_id IS NULL
+          AND EXISTS (
+              SELECT 1 FROM records r
+              WHERE r.track = record_announcements.track
+                AND r.session_type = record_announcements.session_type
+                AND r.best_lap_ms = record_announcements.best_lap_ms
+          )
+    """)
+    # ...otherwise the first entry with that lap time on that track/type
+    cur.execute("""
+        UPDATE record_announcements
+        SET (session_id, player_id, first_name, last_name, short_name, car_model) = (
+            SELECT s.session_id, e.player_id, e.first_name, e.last_name, e.short_name, e.car_model
+            FROM entries e
+            JOIN sessions s ON e.session_id = s.session_id
+            WHERE s.track = record_announcements.track
+              AND s.session_type = record_announcements.session_type
+              AND e.best_lap_ms = record_announcements.best_lap_ms
+              AND e.player_id IS NOT NULL
+            ORDER BY s.session_id, e.entry_id
+            LIMIT 1
+        )
+        WHERE session_id IS NULL
+    """)
+
+
+def _v7_track_image_urls(cur: sqlite3.Cursor) -> None:
+    """Discord URLs of uploaded track images, so the bot can reuse them instead of uploading again."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS track_image_urls (
+            image_file TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            url TEXT NOT NULL,
+            uploaded_at_utc TEXT NOT NULL
+        )
+    """)
+
+
+def _add_driver_names(cur, names) -> None:
+    """Add (first_name, last_name, short_name) tuples to driver_names (schema v8 to v11)."""
+    rows = []
+    for first, last, short in names:
+        first, last, short = first or "", last or "", short or ""
+        full_name = f"{first} {last}".strip()
+        rows.append((first, last, short, full_name, search_text(full_name), search_text(short)))
+    cur.executemany(
+        """
+        INSERT OR IGNORE INTO driver_names
+        (first_name, last_name, short_name, full_name, search_name, search_short)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+
+
+def _v8_search(cur: sqlite3.Cursor) -> None:
+    """Driver names and track aliases with FTS5 trigram indexes, for typo-tolerant search."""
+    # One row per name a driver has appeared under; search_* hold db.search.search_text()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS driver_names (
+            name_id INTEGER PRIMARY KEY,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            short_name TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            search_name TEXT NOT NULL,
+            search_short TEXT NOT NULL,
+            UNIQUE(first_name, last_name, short_name)
+        )
+    """)
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS driver_names_fts USING fts5(
+            search_name, search_short, content='driver_names', content_rowid='name_id', tokenize='trigram'
+        )
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS driver_names_fts_insert AFTER INSERT ON driver_names BEGIN
+            INSERT INTO driver_names_fts (rowid, search_name, search_short)
+            VALUES (new.name_id, new.search_name, new.search_short);
+        END
+    """)
+
+    # Every name a track goes by; alias is db.search.alias_key(), looked up exactly
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS track_aliases (
+            alias_id INTEGER PRIMARY KEY,
+            alias TEXT NOT NULL UNIQUE,
+            search_name TEXT NOT NULL,
+            track TEXT NOT NULL
+        )
+    """)
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS track_aliases_fts USING fts5(
+            search_name, content='track_aliases', content_rowid='alias_id', tokenize='trigram'
+        )
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS track_aliases_fts_insert AFTER INSERT ON track_aliases BEGIN
+            INSERT INTO track_aliases_fts (rowid, search_name) VALUES (new.alias_id, new.search_name);
+        END
+    """)
+
+    _add_driver_names(cur, cur.execute("""
+        SELECT DISTINCT first_name, last_name, short_name
+        FROM entries
+        WHERE (first_name IS NOT NULL OR last_name IS NOT NULL)
+          AND player_id IS NOT NULL
+    """).fetchall())
+    for (track,) in cur.execute("SELECT DISTINCT track FROM sessions").fetchall():
+        add_track_aliases(cur, track)
+
+
+def _v9_players(cur: sqlite3.Cursor) -> None:
+    """
+    Players keyed by an integer instead of matching names: entries and
+    personal_bests reference players and player_names (see db/players.py)
+    rather than repeating the playerId and names on every row.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS players (
+            player_key INTEGER PRIMARY KEY,
+            player_id TEXT NOT NULL UNIQUE,
+            first_name TEXT,
+            last_name TEXT,
+            short_name TEXT,
+            last_seen_utc TEXT NOT NULL
+        )
+    """)
+    # Alias history; player_key is NULL for names seen without a playerId
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS player_names (
+            name_id INTEGER PRIMARY KEY,
+            player_key INTEGER REFERENCES players(player_key),
+            first_name TEXT,
+            last_name TEXT,
+            short_name TEXT,
+            full_name TEXT NOT NULL,
+            first_seen_utc TEXT NOT NULL,
+            last_seen_utc TEXT NOT NULL
+        )
+    """)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_player_names_player "
+        "ON player_names(player_key, first_name, last_name, short_name)"
+    )
+    # /pb looks drivers up by the name it's given
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_player_names_full_name ON player_names(full_name COLLATE NOCASE)"
+    )
+
+    # Canonical name: the one from the driver's latest session
+    cur.execute("""
+        INSERT INTO players (player_id, first_name, last_name, short_name, last_seen_utc)
+        SELECT player_id, first_name, last_name, short_name, file_mtime_utc
+        FROM (
+            SELECT e.player_id, e.first_name, e.last_name, e.short_name, s.file_mtime_utc,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY e.player_id ORDER BY s.file_mtime_utc DESC, e.entry_id DESC
+                   ) AS rn,
+                   MIN(e.entry_id) OVER (PARTITION BY e.player_id) AS first_entry_id
+            FROM entries e
+            JOIN sessions s ON e.session_id = s.session_id
+            WHERE e.player_id IS NOT NULL
+        )
+        WHERE rn = 1
+        ORDER BY first_entry_id
+    """)
+    cur.execute("""
+        INSERT INTO player_names
+        (player_key, first_name, last_name, short_name, full_name, first_seen_utc, last_seen_utc)
+        SELECT p.player_key, e.first_name, e.last_name, e.short_name,
+               TRIM(COALESCE(e.first_name, '') || ' ' || COALESCE(e.last_name, '')),
+               MIN(s.file_mtime_utc), MAX(s.file_mtime_utc)
+        FROM entries e
+        JOIN sessions s ON e.session_id = s.session_id
+        LEFT JOIN players p ON p.player_id = e.player_id
+        WHERE e.first_name IS NOT NULL OR e.last_name IS NOT NULL OR e.short_name IS NOT NULL
+        GROUP BY p.player_key, e.first_name, e.last_name, e.short_name
+        ORDER BY MIN(e.entry_id)
+    """)
+
+    # Rebuild entries with the two keys in place of player_id and the names
+    cur.execute("""
+        CREATE TABLE entries_v9 (
+            entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            car_id INTEGER,
+            race_number INTEGER,
+            car_model INTEGER,
+            cup_category INTEGER,
+            car_group TEXT,
+            player_key INTEGER,
+            name_id INTEGER,
+            best_lap_ms INTEGER,
+            total_time_ms INTEGER,
+            lap_count INTEGER,
+            missing_mandatory_pitstop INTEGER,
+            best_splits_json TEXT,
+            FOREIGN KEY(session_id) REFERENCES sessions(session_id),
+            FOREIGN KEY(player_key) REFERENCES players(player_key),
+            FOREIGN KEY(name_id) REFERENCES player_names(name_id)
+        )
+    """)
+    cur.execute("""
+        INSERT INTO entries_v9
+        (entry_id, session_id, position, car_id, race_number, car_model, cup_category, car_group,
+         player_key, name_id, best_lap_ms, total_time_ms, lap_count, missing_mandatory_pitstop, best_splits_json)
+        SELECT e.entry_id, e.session_id, e.position, e.car_id, e.race_number, e.car_model, e.cup_category,
+               e.car_group, p.player_key, n.name_id, e.best_lap_ms, e.total_time_ms, e.lap_count,
+               e.missing_mandatory_pitstop, e.best_splits_json
+        FROM entries e
+        LEFT JOIN players p ON p.player_id = e.player_id
+        LEFT JOIN player_names n
+          ON n.player_key IS p.player_key
+         AND n.first_name IS e.first_name
+         AND n.last_name IS e.last_name
+         AND n.short_name IS e.short_name
+        ORDER BY e.entry_id
+    """)
+    cur.execute("DROP TABLE entries")
+    cur.execute("ALTER TABLE entries_v9 RENAME TO entries")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_session ON entries(session_id, position)")
+    # Per-driver lookups (PB checks, /pb, rank)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_player_best ON entries(player_key, best_lap_ms)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_best_lap ON entries(best_lap_ms)")
+
+    cur.execute("""
+        CREATE TABLE personal_bests_v9 (
+            track TEXT NOT NULL,
+            session_type TEXT NOT NULL,
+            player_key INTEGER NOT NULL,
+            best_lap_ms INTEGER NOT NULL,
+            PRIMARY KEY(track, session_type, player_key)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("""
+        INSERT INTO personal_bests_v9 (track, session_type, player_key, best_lap_ms)
+        SELECT pb.track, pb.session_type, p.player_key, pb.best_lap_ms
+        FROM personal_bests pb
+        JOIN players p ON p.player_id = pb.player_id
+    """)
+    cur.execute("DROP TABLE personal_bests")
+    cur.execute("ALTER TABLE personal_bests_v9 RENAME TO personal_bests")
+
+
+def _v10_tracks(cur: sqlite3.Cursor) -> None:
+    """
+    Tracks dimension maintained by the importer (see db/tracks.py), so the
+    bot can list and resolve tracks without scanning sessions and entries.
+    """
+    # track_key is db.search.alias_key(track); q/r_sessions count Q/R sessions
+    # with lap times. display_name and image_file are filled in by the bot.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS tracks (
+            track_id INTEGER PRIMARY KEY,
+            track TEXT NOT NULL UNIQUE,
+            track_key TEXT NOT NULL,
+            display_name TEXT,
+            image_file TEXT,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            q_sessions INTEGER NOT NULL DEFAULT 0,
+            r_sessions INTEGER NOT NULL DEFAULT 0,
+            last_session_utc TEXT NOT NULL
+        )
+    """)
+    rebuild_tracks(cur)
+
+
+def _v11_unique_announcements(cur: sqlite3.Cursor) -> None:
+    """
+    One TR/PB announcement per session, type and driver, so the importer's
+    INSERT OR IGNORE can't queue the same one twice. Rows from before
+    schema v6 without a session or driver are left alone.
+    """
+    # v6 gave announcements the first entry with their lap time, so drivers
+    # tying in one session share a driver: hand the others the next entries
+    # of that session with the same time
+    shared = cur.execute("""
+        SELECT announcement_id, session_id, announcement_type, best_lap_ms
+        FROM (
+            SELECT announcement_id, session_id, announcement_type, best_lap_ms,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY session_id, announcement_type, player_id ORDER BY announcement_id
+                   ) AS rn
+            FROM record_announcements
+            WHERE session_id IS NOT NULL AND player_id IS NOT NULL
+        )
+        WHERE rn > 1
+        ORDER BY announcement_id
+    """).fetchall()
+    for announcement_id, session_id, announcement_type, best_lap_ms in shared:
+        driver = cur.execute("""
+            SELECT p.player_id, n.first_name, n.last_name, n.short_name, e.car_model
+            FROM entries e
+            JOIN players p ON p.player_key = e.player_key
+            LEFT JOIN player_names n ON n.name_id = e.name_id
+            WHERE e.session_id = ?
+              AND e.best_lap_ms = ?
+              AND p.player_id NOT IN (
+                  SELECT player_id FROM record_announcements
+                  WHERE session_id = ? AND announcement_type IS ? AND player_id IS NOT NULL
+              )
+            ORDER BY e.entry_id
+            LIMIT 1
+        """, (session_id, best_lap_ms, session_id, announcement_type)).fetchone()
+        if driver is not None:
+            cur.execute(
+                """
+                UPDATE record_announcements
+                SET player_id = ?, first_name = ?, last_name = ?, short_name = ?, car_model = ?
+                WHERE announcement_id = ?
+                """,
+                (*driver, announcement_id)
+            )
+
+    # Left: one driver queued twice (two entries in a session). Keep the one
+    # already posted, else the fastest lap, as --rebuild-derived would
+    cur.execute("""
+        DELETE FROM record_announcements
+        WHERE session_id IS NOT NULL
+          AND player_id IS NOT NULL
+          AND announcement_id NOT IN (
+              SELECT announcement_id FROM (
+                  SELECT announcement_id,
+                         ROW_NUMBER() OVER (
+                             PARTITION BY session_id, announcement_type, player_id
+                             ORDER BY discord_message_id IS NULL, best_lap_ms, announcement_id
+                         ) AS rn
+                  FROM record_announcements
+                  WHERE session_id IS NOT NULL AND player_id IS NOT NULL
+              )
+              WHERE rn = 1
+          )
+    """)
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_record_announcements_identity "
+        "ON record_announcements(session_id, announcement_type, player_id)"
+    )
+
+
+def _v12_player_search(cur: sqlite3.Cursor) -> None:
+    """
+    Driver search on player_names: one trigram-indexed row per player with
+    every name they've raced under, replacing driver_names, which the
+    importer had to keep in step with player_names.
+    """
+    cur.execute("DROP TRIGGER IF EXISTS driver_names_fts_insert")
+    cur.execute("DROP TABLE IF EXISTS driver_names_fts")
+    cur.execute("DROP TABLE IF EXISTS driver_names")
+    # rowid is player_key; search_* hold each distinct db.search.search_text() name on its own line
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS player_names_fts USING fts5(
+            search_name, search_short, tokenize='trigram'
+        )
+    """)
+    index_player_names(cur, (
+        player_key for (player_key,) in
+        cur.execute("SELECT player_key FROM players ORDER BY player_key").fetchall()
+    ))
+
+
+# (version, migration) in order; the version is written to PRAGMA user_version
+MIGRATIONS: list[tuple[int, Callable[[sqlite3.Cursor], None]]] = [
+    (1, _v1_base_tables),
+    (2, _v2_upper_session_types),
+    (3, _v3_personal_bests),
+    (4, _v4_indexes),
+    (5, _v5_content_hashes),
+    (6, _v6_announcement_identity),
+    (7, _v7_track_image_urls),
+    (8, _v8_search),
+    (9, _v9_players),
+    (10, _v10_tracks),
+    (11, _v11_unique_announcements),
+    (12, _v12_player_search),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(con: sqlite3.Connection) -> int:
+    """Return the schema version stored in the database (0 for a new file)."""
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(con: sqlite3.Connection) -> int:
+    """
+    Bring the database schema up to SCHEMA_VERSION.
+
+    Each pending migration runs in its own transaction together with the
+    user_version bump, so an interrupted upgrade resumes where it stopped.
+
+    Args:
+        con: Database connection
+
+    Returns:
+        The schema version before migrating
+
+    Raises:
+        RuntimeError: If the database was created by a newer version
+    """
+    start = get_schema_version(con)
+    if start > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {start} is newer than this code supports ({SCHEMA_VERSION})"
+        )
+
+    if con.in_transaction:
+        con.commit()
+
+    for version, migration in MIGRATIONS:
+        if version <= start:
+            continue
+        cur = con.cursor()
+        try:
+            cur.execute("BEGIN")
+            migration(cur)
+            cur.execute(f"PRAGMA user_version = {int(version)}")
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+
+    return start
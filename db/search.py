@@ -0,0 +1,98 @@
+"""
+Normalized names and trigram queries for typo-tolerant driver and track search.
+
+The search tables (track_aliases and its FTS5 trigram index, see schema
+v8, and player_names_fts, see schema v12) are filled by the importer;
+db/queries.py searches them.
+"""
+import re
+import unicodedata
+
+from constants import TRACK_ALIASES
+
+# Trigram tokenizer: shorter queries can't use the index
+TRIGRAM = 3
+# A suggestion has at least this share of the query's trigrams
+MIN_SHARED_TRIGRAMS = 0.5
+
+
+def search_text(text: str) -> str:
+    """Lower case, accents removed, punctuation and underscores as single spaces."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return " ".join(re.sub(r"[\W_]+", " ", text).split())
+
+
+def alias_key(text: str) -> str:
+    """Track alias as looked up exactly: search_text() without the spaces."""
+    return search_text(text).replace(" ", "")
+
+
+def track_aliases(track: str) -> list[tuple[str, str]]:
+    """(alias_key, search_text) for every name a track goes by, itself included."""
+    names = [track, *TRACK_ALIASES.get(track, [])]
+    return list({alias_key(name): search_text(name) for name in names if alias_key(name)}.items())
+
+
+def trigrams(text: str) -> list[str]:
+    """Distinct trigrams of search_text(text), in order."""
+    text = search_text(text)
+    return list(dict.fromkeys(text[i:i + TRIGRAM] for i in range(len(text) - TRIGRAM + 1)))
+
+
+def shared_trigrams(query: str, *names: str) -> float:
+    """Share of the query's trigrams found in the best matching of `names` (0 to 1)."""
+    grams = trigrams(query)
+    if not grams:
+        return 0.0
+    return max(
+        (sum(gram in name for gram in grams) / len(grams) for name in map(search_text, names)),
+        default=0.0,
+    )
+
+
+def trigram_match(text: str) -> str | None:
+    """
+    FTS5 MATCH expression for a typo-tolerant search: any of the text's
+    trigrams, so names sharing most of them rank first (bm25). None if the
+    text is too short for the trigram index.
+    """
+    grams = trigrams(text)
+    if not grams:
+        return None
+    return " OR ".join('"' + gram.replace('"', '""') + '"' for gram in grams)
+
+
+def substring_match(text: str) -> str | None:
+    """FTS5 MATCH expression for names containing the text, or None if it's too short."""
+    text = search_text(text)
+    if len(text) < TRIGRAM:
+        return None
+    return '"' + text.replace('"', '""') + '"'
+
+
+def index_player_names(cur, player_keys) -> None:
+    """
+    Rewrite the player_names_fts rows of these players from their names in
+    player_names: one row per player, each distinct name on its own line.
+    """
+    for player_key in dict.fromkeys(player_keys):
+        rows = cur.execute(
+            "SELECT DISTINCT full_name, short_name FROM player_names WHERE player_key = ? ORDER BY name_id",
+            (player_key,)
+        ).fetchall()
+        names = dict.fromkeys(filter(None, (search_text(name) for name, _ in rows)))
+        shorts = dict.fromkeys(filter(None, (search_text(short) for _, short in rows)))
+        cur.execute("DELETE FROM player_names_fts WHERE rowid = ?", (player_key,))
+        cur.execute(
+            "INSERT INTO player_names_fts (rowid, search_name, search_short) VALUES (?, ?, ?)",
+            (player_key, "\n".join(names), "\n".join(shorts))
+        )
+
+
+def add_track_aliases(cur, track: str) -> None:
+    """Add a track and its known aliases (TRACK_ALIASES) to track_aliases."""
+    cur.executemany(
+        "INSERT OR IGNORE INTO track_aliases (alias, search_name, track) VALUES (?, ?, ?)",
+        [(alias, name, track) for alias, name in track_aliases(track)],
+    )
@@ -0,0 +1,72 @@
+"""
+The tracks dimension: one row per ACC track name (see schema v10).
+
+The importer keeps the session counts up to date with add_track_session()
+as it inserts sessions, so listing tracks and resolving names never scan
+sessions or entries. display_name and image_file depend on the bot's
+formatting and img/ folder; the bot fills them in (bot/track_index.py).
+"""
+from db.search import alias_key
+
+
+def add_track_session(cur, track: str, session_type: str, timed: bool, session_utc: str) -> None:
+    """
+    Count one imported session for a track, adding the track if it's new.
+
+    `timed` is whether any entry set a lap time; only timed Q/R sessions
+    make a track show up in /tracks and autocomplete.
+    """
+    cur.execute(
+        """
+        INSERT INTO tracks (track, track_key, sessions, q_sessions, r_sessions, last_session_utc)
+        VALUES (?, ?, 1, ?, ?, ?)
+        ON CONFLICT(track) DO UPDATE SET
+            sessions = sessions + 1,
+            q_sessions = q_sessions + excluded.q_sessions,
+            r_sessions = r_sessions + excluded.r_sessions,
+            last_session_utc = MAX(last_session_utc, excluded.last_session_utc)
+        """,
+        (track, alias_key(track), int(timed and session_type == "Q"), int(timed and session_type == "R"),
+         session_utc)
+    )
+
+
+def rebuild_tracks(cur) -> int:
+    """
+    Recompute every track's session counts from sessions and entries,
+    keeping display_name and image_file. Returns the number of tracks.
+    """
+    rows = cur.execute(
+        """
+        SELECT track,
+               COUNT(*),
+               COALESCE(SUM(session_type = 'Q' AND timed), 0),
+               COALESCE(SUM(session_type = 'R' AND timed), 0),
+               MAX(file_mtime_utc)
+        FROM (
+            SELECT s.track, s.session_type, s.file_mtime_utc,
+                   EXISTS (
+                       SELECT 1 FROM entries e
+                       WHERE e.session_id = s.session_id AND e.best_lap_ms IS NOT NULL
+                   ) AS timed
+            FROM sessions s
+        )
+        GROUP BY track
+        """
+    ).fetchall()
+
+    cur.execute("DELETE FROM tracks WHERE track NOT IN (SELECT track FROM sessions)")
+    cur.executemany(
+        """
+        INSERT INTO tracks (track, track_key, sessions, q_sessions, r_sessions, last_session_utc)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(track) DO UPDATE SET
+            track_key = excluded.track_key,
+            sessions = excluded.sessions,
+            q_sessions = excluded.q_sessions,
+            r_sessions = excluded.r_sessions,
+            last_session_utc = excluded.last_session_utc
+        """,
+        [(track, alias_key(track), *counts) for track, *counts in rows],
+    )
+    return len(rows)
@@ -1,16 +1,41 @@
+import argparse
 import json
 import os
 import re
-import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 
-RESULTS_DIR = r"C:\accserver\server\results"
+from db.connection import begin_write, connect
+from db.rebuild import rebuild_derived
+from db.players import resolve_drivers
+from db.schema import SCHEMA_VERSION, migrate
+from db.search import add_track_aliases
+from db.tracks import add_track_session
+from ingest.hashing import file_content_hash
+from ingest.laps import LapPacker
+from ingest.lock import ImportLock
+from ingest.notify import notify_changed
+from ingest.settings import NOTIFY_PORT, RESULTS_DIR
+from ingest.stream import iter_result_file
+from ingest.watcher import DEFAULT_DEBOUNCE_SECONDS, ResultsWatcher
+
 DB_PATH = r"C:\accserver\stats\acc_stats.sqlite"
 
 FILENAME_RE = re.compile(r"^(?P<yymmdd>\d{6})_(?P<hhmmss>\d{6})_(?P<stype>FP|Q|R)\.JSON$", re.IGNORECASE)
 
 SENTINEL_TIMES = {0, 2147483647}
 
+# Imported files per transaction (0 = one transaction per run)
+DEFAULT_COMMIT_EVERY = 1
+
+# Files parsed per window, and written per transaction, during --backfill
+BACKFILL_BATCH_FILES = 500
+
+# How often --watch retries the importer lock while another run holds it
+LOCK_RETRY_SECONDS = 1.0
+
 def parse_filename_ts(filename: str):
     m = FILENAME_RE.match(filename)
     if not m:
@@ -47,10 +72,13 @@ def maybe_update_records(cur, session_id: int):
     # Get best time from this session (for track record check)
     row = cur.execute(
         """
-        SELECT player_id, first_name, last_name, short_name, car_model, race_number, cup_category, best_lap_ms
-        FROM entries
-        WHERE session_id = ? AND best_lap_ms IS NOT NULL
-        ORDER BY best_lap_ms ASC
+        SELECT pl.player_id, n.first_name, n.last_name, n.short_name,
+               e.car_model, e.race_number, e.cup_category, e.best_lap_ms
+        FROM entries e
+        LEFT JOIN players pl ON pl.player_key = e.player_key
+        LEFT JOIN player_names n ON n.name_id = e.name_id
+        WHERE e.session_id = ? AND e.best_lap_ms IS NOT NULL
+        ORDER BY e.best_lap_ms ASC, e.entry_id ASC
         LIMIT 1
         """,
         (session_id,)
@@ -94,75 +122,91 @@ def maybe_update_records(cur, session_id: int):
         cur.execute(
             """
             INSERT OR IGNORE INTO record_announcements
-            (track, session_type, best_lap_ms, announced_at_utc, discord_message_id, announcement_type)
-            VALUES (?, ?, ?, ?, NULL, 'TR')
+            (track, session_type, best_lap_ms, announced_at_utc, discord_message_id, announcement_type,
+             session_id, player_id, first_name, last_name, short_name, car_model)
+            VALUES (?, ?, ?, ?, NULL, 'TR', ?, ?, ?, ?, ?, ?)
             """,
-            (track, stype, best_lap_ms, file_mtime_utc)
+            (track, stype, best_lap_ms, file_mtime_utc,
+             session_id, player_id, first_name, last_name, short_name, car_model)
         )
     
-    # Check for personal bests for ALL drivers in this session
-    all_entries = cur.execute(
+    # Check for personal bests for ALL drivers in this session in one statement.
+    # Previous bests come from the personal_bests table (one row per driver,
+    # track and session type, not yet including this session), so the check
+    # doesn't get slower as the entries history grows.
+    new_pbs = cur.execute(
         """
-        SELECT player_id, first_name, last_name, short_name, car_model, race_number, cup_category, best_lap_ms
-        FROM entries
-        WHERE session_id = ? AND best_lap_ms IS NOT NULL AND player_id IS NOT NULL
+        SELECT c.best_lap_ms, pl.player_id, n.first_name, n.last_name, n.short_name, c.car_model
+        FROM entries c
+        JOIN players pl ON pl.player_key = c.player_key
+        LEFT JOIN player_names n ON n.name_id = c.name_id
+        LEFT JOIN personal_bests p
+          ON p.track = :track AND p.session_type = :stype AND p.player_key = c.player_key
+        WHERE c.session_id = :session_id
+          AND c.best_lap_ms IS NOT NULL
+          -- The driver's fastest entry in this session (first on a tie)
+          AND c.entry_id = (
+              SELECT f.entry_id FROM entries f
+              WHERE f.session_id = c.session_id
+                AND f.player_key = c.player_key
+                AND f.best_lap_ms IS NOT NULL
+              ORDER BY f.best_lap_ms, f.entry_id
+              LIMIT 1
+          )
+          -- New PB: no previous best, or this time is better (lower)
+          AND (p.best_lap_ms IS NULL OR c.best_lap_ms < p.best_lap_ms)
+          -- ...and we haven't already announced this PB for this driver
+          AND NOT EXISTS (
+              SELECT 1 FROM record_announcements a
+              WHERE a.track = :track
+                AND a.session_type = :stype
+                AND a.best_lap_ms = c.best_lap_ms
+                AND COALESCE(a.announcement_type, 'TR') = 'PB'
+                AND a.discord_message_id IS NOT NULL
+                AND EXISTS (
+                    SELECT 1 FROM entries e
+                    JOIN sessions s ON e.session_id = s.session_id
+                    WHERE e.player_key = c.player_key
+                      AND e.best_lap_ms = c.best_lap_ms
+                      AND s.track = a.track
+                      AND s.session_type = a.session_type
+                )
+          )
+        ORDER BY c.entry_id
         """,
-        (session_id,)
+        {"session_id": session_id, "track": track, "stype": stype}
     ).fetchall()
-    
-    for (pid, fn, ln, sn, cm, rn, cc, blm) in all_entries:
-        # Check if this is a NEW personal best for this driver
-        # Get their previous best (excluding current session)
-        previous_best = cur.execute(
-            """
-            SELECT MIN(e.best_lap_ms)
-            FROM entries e
-            JOIN sessions s ON e.session_id = s.session_id
-            WHERE e.player_id = ? AND s.track = ? AND UPPER(s.session_type) = ? 
-              AND e.best_lap_ms IS NOT NULL AND e.session_id != ?
-            """,
-            (pid, track, stype, session_id)
-        ).fetchone()
-        
-        # This is a new PB if: no previous best exists, OR this time is better (lower)
-        is_new_pb = (previous_best is None or previous_best[0] is None) or (blm < previous_best[0])
-        
-        if is_new_pb:
-            # Check if we've already announced this PB for this driver
-            existing_pb = cur.execute(
-                """
-                SELECT announcement_id FROM record_announcements a
-                WHERE a.track = ? 
-                  AND a.session_type = ? 
-                  AND a.best_lap_ms = ? 
-                  AND COALESCE(a.announcement_type, 'TR') = 'PB'
-                  AND a.discord_message_id IS NOT NULL
-                  AND EXISTS (
-                      SELECT 1 FROM entries e
-                      JOIN sessions s ON e.session_id = s.session_id
-                      WHERE s.track = a.track
-                        AND s.session_type = a.session_type
-                        AND e.best_lap_ms = a.best_lap_ms
-                        AND e.player_id = ?
-                  )
-                LIMIT 1
-                """,
-                (track, stype, blm, pid)
-            ).fetchone()
-            
-            # Only announce PB if:
-            # 1. It's not also the track record (TR already announced) - check if this lap time equals the new record
-            # 2. We haven't already announced this PB for this driver
-            is_also_track_record = is_new_record and best_lap_ms == blm
-            if not is_also_track_record and not existing_pb:
-                cur.execute(
-                    """
-                    INSERT OR IGNORE INTO record_announcements
-                    (track, session_type, best_lap_ms, announced_at_utc, discord_message_id, announcement_type)
-                    VALUES (?, ?, ?, ?, NULL, 'PB')
-                    """,
-                    (track, stype, blm, file_mtime_utc)
-                )
+
+    # Fold this session's laps into the personal bests
+    cur.execute(
+        """
+        INSERT INTO personal_bests (track, session_type, player_key, best_lap_ms)
+        SELECT :track, :stype, player_key, MIN(best_lap_ms)
+        FROM entries
+        WHERE session_id = :session_id AND best_lap_ms IS NOT NULL AND player_key IS NOT NULL
+        GROUP BY player_key
+        ON CONFLICT(track, session_type, player_key) DO UPDATE SET
+          best_lap_ms = MIN(best_lap_ms, excluded.best_lap_ms)
+        """,
+        {"session_id": session_id, "track": track, "stype": stype}
+    )
+
+    # Don't announce a PB that is also the new track record (TR already announced).
+    # One announcement per session, type and driver (unique index, schema v11);
+    # new_pbs already has only each driver's fastest entry.
+    cur.executemany(
+        """
+        INSERT OR IGNORE INTO record_announcements
+        (track, session_type, best_lap_ms, announced_at_utc, discord_message_id, announcement_type,
+         session_id, player_id, first_name, last_name, short_name, car_model)
+        VALUES (?, ?, ?, ?, NULL, 'PB', ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (track, stype, blm, file_mtime_utc, session_id, *driver)
+            for (blm, *driver) in new_pbs
+            if not (is_new_record and best_lap_ms == blm)
+        ]
+    )
 
 def queue_race_results(cur, session_id: int):
     """Queue a race session for Discord announcement (only for R sessions)."""
@@ -190,156 +234,798 @@ def queue_race_results(cur, session_id: int):
         (session_id, track, file_mtime_utc)
     )
 
-def main():
-    con = sqlite3.connect(DB_PATH)
-    con.execute("PRAGMA foreign_keys = ON;")
-    cur = con.cursor()
-    
-    # Add announcement_type column if it doesn't exist (migration)
+def filename_ts_key(filename: str):
+    """Return the sortable YYMMDD_HHMMSS prefix of a result filename, or None."""
+    m = FILENAME_RE.match(filename)
+    if not m:
+        return None
+    return m.group("yymmdd") + "_" + m.group("hhmmss")
+
+def get_watermark(cur):
+    row = cur.execute("SELECT value FROM import_state WHERE key = 'watermark'").fetchone()
+    return row[0] if row else None
+
+def set_watermark(cur, ts_key: str):
+    cur.execute(
+        """
+        INSERT INTO import_state (key, value) VALUES ('watermark', ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        """,
+        (ts_key,)
+    )
+
+def record_manifest(cur, fname: str, full_path: str, st, status: str, session_id=None, content_hash=None):
+    cur.execute(
+        """
+        INSERT INTO import_manifest
+        (filename, source_file, file_size, file_mtime_ns, status, session_id, content_hash, updated_at_utc)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(filename) DO UPDATE SET
+          source_file    = excluded.source_file,
+          file_size      = excluded.file_size,
+          file_mtime_ns  = excluded.file_mtime_ns,
+          status         = excluded.status,
+          session_id     = excluded.session_id,
+          content_hash   = excluded.content_hash,
+          updated_at_utc = excluded.updated_at_utc
+        """,
+        (fname, full_path, st.st_size, st.st_mtime_ns, status, session_id, content_hash,
+         datetime.now(timezone.utc).isoformat())
+    )
+
+def find_session_by_hash(cur, content_hash: str):
+    """Return the session_id already imported from a file with this content, or None."""
+    row = cur.execute(
+        "SELECT session_id FROM sessions WHERE content_hash = ? LIMIT 1",
+        (content_hash,)
+    ).fetchone()
+    return row[0] if row else None
+
+def fill_missing_hash(cur, fname: str, full_path: str, st, session_id: int, status: str = "imported"):
+    """
+    Hash a file imported before content hashes existed and store it on its
+    session and manifest row, so copies of it under other paths are caught.
+    """
     try:
-        cur.execute("ALTER TABLE record_announcements ADD COLUMN announcement_type TEXT DEFAULT 'TR'")
-        con.commit()
-    except sqlite3.OperationalError:
-        # Column already exists, ignore
-        pass
-    
-    # Create race_results_announcements table if it doesn't exist
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS race_results_announcements (
-            announcement_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id INTEGER NOT NULL UNIQUE,
-            track TEXT NOT NULL,
-            announced_at_utc TEXT NOT NULL,
-            discord_message_id TEXT,
-            FOREIGN KEY(session_id) REFERENCES sessions(session_id)
-        )
-    """)
+        content_hash = file_content_hash(full_path)
+    except OSError:
+        return None
+    cur.execute(
+        "UPDATE sessions SET content_hash = ? WHERE session_id = ? AND content_hash IS NULL",
+        (content_hash, session_id)
+    )
+    record_manifest(cur, fname, full_path, st, status, session_id, content_hash)
+    return content_hash
+
+def list_new_files(cur, results_dir: str, full_rescan: bool = False):
+    """
+    Return (candidates, skipped_badname) for this run.
+
+    Normally only files at or after the watermark are candidates, plus files
+    that previously failed to parse. With full_rescan every result file is.
+    Filtering happens on the filename alone, so files older than the
+    watermark cost no stat() or database lookup.
+    """
+    watermark = None if full_rescan else get_watermark(cur)
+
+    candidates = set()
+    skipped_badname = 0
+    with os.scandir(results_dir) as it:
+        for entry in it:
+            fname = entry.name
+            if not fname.upper().endswith(".JSON"):
+                continue
+            ts_key = filename_ts_key(fname)
+            if ts_key is None:
+                skipped_badname += 1
+                continue
+            if watermark is None or ts_key >= watermark:
+                candidates.add(fname)
+
+    # Files that failed earlier (usually still being written) get another try
+    if watermark is not None:
+        for (fname,) in cur.execute("SELECT filename FROM import_manifest WHERE status = 'failed'").fetchall():
+            if os.path.exists(os.path.join(results_dir, fname)):
+                candidates.add(fname)
+
+    return sorted(candidates), skipped_badname
+
+def prepare_db(con):
+    """Create or upgrade the database schema (see db/schema.py)."""
+    old_version = migrate(con)
+    if old_version != SCHEMA_VERSION:
+        print(f"Database schema migrated from version {old_version} to {SCHEMA_VERSION}")
+
+def check_already_imported(cur, fname: str, full_path: str, st, retry_failed: bool = False):
+    """
+    Decide from the manifest and sessions table whether a file can be skipped.
+
+    Returns the skip status ("empty", "duplicate" or "failed"), or None if the
+    file should be parsed and imported.
+    """
+    # Manifest: skip files we've already handled and that haven't changed since
+    seen = cur.execute(
+        "SELECT file_size, file_mtime_ns, status, session_id, content_hash FROM import_manifest WHERE filename = ?",
+        (fname,)
+    ).fetchone()
+    if seen and seen[0] == st.st_size and seen[1] == st.st_mtime_ns:
+        status, session_id, content_hash = seen[2:]
+        if status == "empty":
+            return "empty"
+        if status != "failed":
+            if session_id is not None and content_hash is None:
+                fill_missing_hash(cur, fname, full_path, st, session_id, status)
+            return "duplicate"
+        if not retry_failed:
+            return "failed"
+
+    # Idempotency: skip if already imported from this path
+    exists = cur.execute(
+        "SELECT session_id, content_hash FROM sessions WHERE source_file = ? LIMIT 1",
+        (full_path,)
+    ).fetchone()
+    if exists:
+        session_id, content_hash = exists
+        if content_hash is None:
+            fill_missing_hash(cur, fname, full_path, st, session_id)
+        else:
+            record_manifest(cur, fname, full_path, st, "imported", session_id, content_hash)
+        return "duplicate"
+
+    return None
+
+def entry_row(position: int, line) -> tuple:
+    """
+    Normalize one leaderBoardLines element into an entries row (without
+    session_id, and with playerId/first/last/short name for the driver keys).
+    """
+    car = (line.get("car") or {})
+    timing = (line.get("timing") or {})
+    driver = (line.get("currentDriver") or {})
+
+    best_lap_ms = norm_time_ms(timing.get("bestLap"))
+    total_time_ms = norm_time_ms(timing.get("totalTime"))
     
-    # Add best_splits_json column if it doesn't exist
+    # Store bestSplits as JSON string (variable number of sectors)
+    best_splits = timing.get("bestSplits")
+    best_splits_json = None
+    if best_splits and isinstance(best_splits, list):
+        # Filter out invalid sentinel values
+        valid_splits = [s for s in best_splits if s not in SENTINEL_TIMES]
+        if valid_splits:
+            best_splits_json = json.dumps(valid_splits)
+
+    return (
+        position,
+        car.get("carId"),
+        car.get("raceNumber"),
+        car.get("carModel"),
+        car.get("cupCategory"),
+        car.get("carGroup"),
+        driver.get("playerId"),
+        driver.get("firstName"),
+        driver.get("lastName"),
+        driver.get("shortName"),
+        best_lap_ms,
+        total_time_ms,
+        timing.get("lapCount"),
+        line.get("missingMandatoryPitstop"),
+        best_splits_json,
+    )
+
+def parse_result_file(full_path: str, stype: str, st):
+    """
+    Decode a result file and normalize it into plain row tuples.
+
+    The file is read as a stream (see ingest/stream.py): leaderboard lines
+    and laps are converted as they are read, so memory stays bounded even
+    for endurance races. Only touches the file (never the database) and
+    returns picklable data, so it can run in worker processes during
+    --backfill.
+
+    Returns (session_row, entry_rows, lap_rows), or None for an empty/template
+    log. session_row matches the sessions insert; entry_rows and lap_rows
+    match the entries and session_laps inserts without the leading
+    session_id, except that entry_rows carry the driver's playerId and names
+    where entries has player_key and name_id (see insert_session). Raises if
+    the file can't be parsed.
+    """
+    fields = {}
+    entry_rows = []
+    laps = LapPacker()
+    for kind, key, value in iter_result_file(full_path):
+        if kind == "leader":
+            entry_rows.append(entry_row(key + 1, value or {}))
+        elif kind == "lap":
+            laps.add(value or {})
+        else:
+            fields[key] = value
+
+    # Skip empty/template logs
+    if len(entry_rows) == 0 and laps.lap_total == 0:
+        return None
+
+    track = fields.get(("trackName",)) or ""
+    server_name = fields.get(("serverName",))
+    is_wet = fields.get(("sessionResult", "isWetSession"))
+    session_index = fields.get(("sessionIndex",))
+    race_weekend_index = fields.get(("raceWeekendIndex",))
+
+    file_mtime_utc = datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat()
+
+    session_row = (full_path, stype, track, server_name, is_wet, session_index, race_weekend_index, file_mtime_utc)
+
+    return session_row, entry_rows, laps.rows()
+
+def add_phase_time(timings, phase: str, started: float) -> float:
+    """
+    Add the time since `started` to timings[phase] and return the current time.
+
+    `timings` is an optional dict of phase -> seconds, used by the import
+    benchmark (benchmarks/bench_import.py); with None this only reads the clock.
+    """
+    now = time.perf_counter()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + (now - started)
+    return now
+
+def insert_session(cur, session_row, entry_rows, lap_rows=(), timings=None, content_hash=None) -> int:
+    """Insert a parsed session and its entries, then update records and queues."""
+    started = time.perf_counter()
+    cur.execute(
+        """
+        INSERT INTO sessions
+        (source_file, session_type, track, server_name, is_wet, session_index, race_weekend_index, file_mtime_utc,
+         content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        tuple(session_row) + (content_hash,),
+    )
+    session_id = cur.lastrowid
+
+    # Drivers become (player_key, name_id); new players and names are added on the way
+    drivers = resolve_drivers(cur, (row[6:10] for row in entry_rows), session_row[7])
+
+    # Insert entries from leaderboard lines in one round trip
+    cur.executemany(
+        """
+        INSERT INTO entries
+        (session_id, position, car_id, race_number, car_model, cup_category, car_group,
+        player_key, name_id,
+        best_lap_ms, total_time_ms, lap_count, missing_mandatory_pitstop, best_splits_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [(session_id,) + row[:6] + keys + row[10:] for row, keys in zip(entry_rows, drivers)],
+    )
+
+    # Laps: one packed row per car instead of one row per lap
+    cur.executemany(
+        """
+        INSERT INTO session_laps
+        (session_id, car_id, lap_count, split_count, lap_times, splits, valid_bitmap, driver_indexes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [(session_id,) + row for row in lap_rows],
+    )
+
+    # Track aliases for search (driver names are indexed by resolve_drivers())
+    add_track_aliases(cur, session_row[2])
+    add_track_session(cur, session_row[2], session_row[1], any(row[10] is not None for row in entry_rows),
+                      session_row[7])
+    started = add_phase_time(timings, "insert", started)
+
+    maybe_update_records(cur, session_id)
+    queue_race_results(cur, session_id)
+    add_phase_time(timings, "records", started)
+    return session_id
+
+def import_result_file(cur, fname: str, full_path: str, retry_failed: bool = False, timings=None):
+    """
+    Import a single result file.
+
+    Returns (status, entry_rows_written) where status is one of "imported",
+    "empty", "duplicate", "failed" or "missing". Does not commit; the caller
+    decides the transaction boundaries, but the write transaction is started
+    here (begin_write) once the file isn't skipped. If `timings` is a dict,
+    seconds spent per phase (check, hash, parse, insert, records) are added
+    to it.
+
+    A file whose content hash matches an already imported session (e.g. the
+    same file under a moved or copied results folder) is recorded in the
+    manifest as "duplicate" without being parsed.
+    """
+    started = time.perf_counter()
+    parsed = parse_filename_ts(fname)
+    if not parsed:
+        return "missing", 0
+    _, stype = parsed
+
     try:
-        cur.execute("ALTER TABLE entries ADD COLUMN best_splits_json TEXT")
-        con.commit()
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
-    con.commit()
+        st = os.stat(full_path)
+    except FileNotFoundError:
+        return "missing", 0
 
-    files = [f for f in os.listdir(RESULTS_DIR) if f.upper().endswith(".JSON")]
-    files.sort()
+    skip = check_already_imported(cur, fname, full_path, st, retry_failed=retry_failed)
+    started = add_phase_time(timings, "check", started)
+    if skip:
+        return skip, 0
 
-    imported = 0
-    skipped_empty = 0
-    skipped_badname = 0
-    skipped_dupe = 0
+    # Written from here on; skipped files never take the write lock
+    begin_write(cur.connection)
+
+    # Same bytes already imported from another path: skip without decoding
+    try:
+        content_hash = file_content_hash(full_path)
+    except OSError as e:
+        print(f"[WARN] Failed to read {fname}: {e}")
+        record_manifest(cur, fname, full_path, st, "failed")
+        return "failed", 0
+    duplicate_of = find_session_by_hash(cur, content_hash)
+    started = add_phase_time(timings, "hash", started)
+    if duplicate_of is not None:
+        record_manifest(cur, fname, full_path, st, "duplicate", duplicate_of, content_hash)
+        return "duplicate", 0
 
+    try:
+        rows = parse_result_file(full_path, stype, st)
+    except Exception as e:
+        print(f"[WARN] Failed to parse {fname}: {e}")
+        record_manifest(cur, fname, full_path, st, "failed", content_hash=content_hash)
+        return "failed", 0
+    add_phase_time(timings, "parse", started)
+
+    if rows is None:
+        record_manifest(cur, fname, full_path, st, "empty", content_hash=content_hash)
+        return "empty", 0
+
+    session_row, entry_rows, lap_rows = rows
+    session_id = insert_session(cur, session_row, entry_rows, lap_rows, timings=timings, content_hash=content_hash)
+    record_manifest(cur, fname, full_path, st, "imported", session_id, content_hash)
+    return "imported", len(entry_rows)
+
+def advance_watermark(cur, fnames):
+    """Move the watermark up to the newest of `fnames` (never backwards)."""
+    keys = [k for k in (filename_ts_key(f) for f in fnames) if k]
+    if not keys:
+        return
+    newest = max(keys)
+    watermark = get_watermark(cur)
+    if watermark is None or newest > watermark:
+        set_watermark(cur, newest)
+
+def new_counts() -> dict:
+    return {"imported": 0, "empty": 0, "duplicate": 0, "failed": 0, "missing": 0, "rows": 0, "seconds": 0.0}
+
+def import_files(con, results_dir: str, files, retry_failed: bool = False, commit_every: int = DEFAULT_COMMIT_EVERY, timings=None) -> dict:
+    """
+    Import `files` (names in `results_dir`) in order and return per-status counts.
+
+    `commit_every` sets the transaction size in imported files: 1 commits
+    after every file, N after every N files and 0 once at the end of the run.
+    The write lock is only taken for files that get written (see
+    import_result_file), and a skipped file ends an open batch unless
+    commit_every is 0, so a run over already imported files, such as
+    --full-rescan, doesn't keep the bot from writing. Manifest rows are written
+    in the same transaction as their sessions, so an interrupted run never
+    leaves a file half-imported. `timings` collects per-phase seconds (see
+    import_result_file), plus "commit".
+    """
+    cur = con.cursor()
+    counts = new_counts()
+    uncommitted = 0
+    started = time.perf_counter()
     for fname in files:
-        parsed = parse_filename_ts(fname)
-        if not parsed:
-            skipped_badname += 1
+        status, rows = import_result_file(
+            cur, fname, os.path.join(results_dir, fname), retry_failed=retry_failed, timings=timings
+        )
+        counts[status] += 1
+        counts["rows"] += rows
+        if status == "imported":
+            uncommitted += 1
+            if not commit_every or uncommitted < commit_every:
+                continue
+        elif uncommitted and not commit_every:
+            # One transaction for the whole run
             continue
+        commit_started = time.perf_counter()
+        con.commit()
+        add_phase_time(timings, "commit", commit_started)
+        if uncommitted:
+            notify_changed(NOTIFY_PORT)
+            uncommitted = 0
 
-        _, stype = parsed
-        full_path = os.path.join(RESULTS_DIR, fname)
+    # Advance the watermark past everything looked at in this run
+    advance_watermark(cur, files)
+    commit_started = time.perf_counter()
+    con.commit()
+    add_phase_time(timings, "commit", commit_started)
+    if uncommitted:
+        notify_changed(NOTIFY_PORT)
+    counts["seconds"] = time.perf_counter() - started
+    return counts
 
-        # Idempotency: skip if already imported
-        exists = cur.execute("SELECT 1 FROM sessions WHERE source_file = ? LIMIT 1", (full_path,)).fetchone()
-        if exists:
-            skipped_dupe += 1
-            continue
+def _backfill_parse(job):
+    """Worker-process side of --backfill: parse one file, never raise."""
+    fname, full_path, stype, st, _ = job
+    try:
+        return "ok", parse_result_file(full_path, stype, st)
+    except Exception as e:
+        return "failed", str(e)
+
+def backfill(con, workers: int, commit_every: int = BACKFILL_BATCH_FILES) -> dict:
+    """
+    Re-import the whole results folder using a pool of parser processes.
 
-        # Load JSON
+    Workers decode and normalize files; this process is the only writer and
+    inserts sessions strictly in filename order, so record and PB detection
+    give the same result as a serial import. Each `commit_every` imported
+    files share one transaction (0 = one transaction for the whole run).
+    """
+    cur = con.cursor()
+    started = time.perf_counter()
+    files, skipped_badname = list_new_files(cur, RESULTS_DIR, full_rescan=True)
+    begin_write(con)
+    counts = new_counts()
+
+    # Cheap checks (manifest, sessions.source_file, content hash) stay in the writer
+    jobs = []
+    queued_hashes = set()
+    for fname in files:
+        full_path = os.path.join(RESULTS_DIR, fname)
+        try:
+            st = os.stat(full_path)
+        except FileNotFoundError:
+            counts["missing"] += 1
+            continue
+        skip = check_already_imported(cur, fname, full_path, st, retry_failed=True)
+        if skip:
+            counts[skip] += 1
+            continue
         try:
-            with open(full_path, "r", encoding="utf-16le") as f:
-                data = json.load(f)
-        except Exception as e:
-            print(f"[WARN] Failed to parse {fname}: {e}")
+            content_hash = file_content_hash(full_path)
+        except OSError as e:
+            print(f"[WARN] Failed to read {fname}: {e}")
+            record_manifest(cur, fname, full_path, st, "failed")
+            counts["failed"] += 1
+            continue
+        duplicate_of = find_session_by_hash(cur, content_hash)
+        if duplicate_of is not None or content_hash in queued_hashes:
+            # A copy queued earlier in this run doesn't have a session_id yet
+            record_manifest(cur, fname, full_path, st, "duplicate", duplicate_of, content_hash)
+            counts["duplicate"] += 1
             continue
+        queued_hashes.add(content_hash)
+        jobs.append((fname, full_path, parse_filename_ts(fname)[1], st, content_hash))
+    con.commit()
 
-        leader = (((data.get("sessionResult") or {}).get("leaderBoardLines")) or [])
-        laps = data.get("laps") or []
+    print(f"[BACKFILL] Parsing {len(jobs)} file(s) with {workers} worker(s)...")
+    uncommitted = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Bounded windows keep parsed-but-unwritten sessions from piling up in memory
+        for start in range(0, len(jobs), BACKFILL_BATCH_FILES):
+            window = jobs[start:start + BACKFILL_BATCH_FILES]
+            results = pool.map(_backfill_parse, window, chunksize=max(1, len(window) // (workers * 4)))
+            for (fname, full_path, _, st, content_hash), (outcome, payload) in zip(window, results):
+                begin_write(con)
+                if outcome == "failed":
+                    print(f"[WARN] Failed to parse {fname}: {payload}")
+                    record_manifest(cur, fname, full_path, st, "failed", content_hash=content_hash)
+                    counts["failed"] += 1
+                elif payload is None:
+                    record_manifest(cur, fname, full_path, st, "empty", content_hash=content_hash)
+                    counts["empty"] += 1
+                else:
+                    session_row, entry_rows, lap_rows = payload
+                    session_id = insert_session(cur, session_row, entry_rows, lap_rows, content_hash=content_hash)
+                    record_manifest(cur, fname, full_path, st, "imported", session_id, content_hash)
+                    counts["imported"] += 1
+                    counts["rows"] += len(entry_rows)
+                    uncommitted += 1
+                    if commit_every and uncommitted >= commit_every:
+                        con.commit()
+                        notify_changed(NOTIFY_PORT)
+                        uncommitted = 0
+            print(f"[BACKFILL] {min(start + BACKFILL_BATCH_FILES, len(jobs))}/{len(jobs)} files written")
 
-        # Skip empty/template logs
-        if len(leader) == 0 and len(laps) == 0:
-            skipped_empty += 1
-            continue
+    advance_watermark(cur, files)
+    con.commit()
+    if uncommitted:
+        notify_changed(NOTIFY_PORT)
+    counts["seconds"] = time.perf_counter() - started
+    print_summary(counts, skipped_badname)
+    print_lock_waits(con)
+    return counts
 
-        track = data.get("trackName") or ""
-        server_name = data.get("serverName")
-        is_wet = ((data.get("sessionResult") or {}).get("isWetSession"))
-        session_index = data.get("sessionIndex")
-        race_weekend_index = data.get("raceWeekendIndex")
+def print_summary(counts: dict, skipped_badname: int = 0):
+    print("Done.")
+    print(f"Imported sessions: {counts['imported']}")
+    print(f"Skipped empty/template: {counts['empty']}")
+    print(f"Skipped already imported: {counts['duplicate']}")
+    print(f"Skipped bad filename: {skipped_badname}")
+    print(f"Failed to parse: {counts['failed']}")
+    if counts["rows"]:
+        print(format_throughput(counts))
 
-        file_mtime_utc = datetime.fromtimestamp(os.path.getmtime(full_path), timezone.utc).isoformat()
+def print_lock_waits(con):
+    """Report (and reset) the time this connection spent waiting for the write lock."""
+    stats = getattr(con, "lock_waits", None)
+    if stats is None or not stats.count:
+        return
+    print(f"[LOCK] {stats}")
+    stats.reset()
 
-        # Insert session
-        cur.execute(
-            """
-            INSERT INTO sessions
-            (source_file, session_type, track, server_name, is_wet, session_index, race_weekend_index, file_mtime_utc)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (full_path, stype, track, server_name, is_wet, session_index, race_weekend_index, file_mtime_utc),
-        )
-        session_id = cur.lastrowid
-
-        # Insert entries from leaderboard lines
-        for idx, line in enumerate(leader):
-            car = (line.get("car") or {})
-            timing = (line.get("timing") or {})
-            driver = (line.get("currentDriver") or {})
-
-            best_lap_ms = norm_time_ms(timing.get("bestLap"))
-            total_time_ms = norm_time_ms(timing.get("totalTime"))
-            
-            # Store bestSplits as JSON string (variable number of sectors)
-            best_splits = timing.get("bestSplits")
-            best_splits_json = None
-            if best_splits and isinstance(best_splits, list):
-                # Filter out invalid sentinel values
-                valid_splits = [s for s in best_splits if s not in SENTINEL_TIMES]
-                if valid_splits:
-                    best_splits_json = json.dumps(valid_splits)
-
-            cur.execute(
-                """
-                INSERT INTO entries
-                (session_id, position, car_id, race_number, car_model, cup_category, car_group,
-                player_id, first_name, last_name, short_name,
-                best_lap_ms, total_time_ms, lap_count, missing_mandatory_pitstop, best_splits_json)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    session_id,
-                    idx + 1,
-                    car.get("carId"),
-                    car.get("raceNumber"),
-                    car.get("carModel"),
-                    car.get("cupCategory"),
-                    car.get("carGroup"),
-                    driver.get("playerId"),
-                    driver.get("firstName"),
-                    driver.get("lastName"),
-                    driver.get("shortName"),
-                    best_lap_ms,
-                    total_time_ms,
-                    timing.get("lapCount"),
-                    line.get("missingMandatoryPitstop"),
-                    best_splits_json,
-                ),
+def format_throughput(counts: dict) -> str:
+    seconds = counts["seconds"] or 1e-9
+    return (
+        f"Inserted {counts['rows']} entry rows in {counts['seconds']:.2f}s "
+        f"({counts['rows'] / seconds:.0f} rows/sec, {counts['imported'] / seconds:.1f} files/sec)"
+    )
+
+def run_scan(con, full_rescan: bool = False, commit_every: int = DEFAULT_COMMIT_EVERY) -> dict:
+    """List the results folder and import whatever is new."""
+    files, skipped_badname = list_new_files(con.cursor(), RESULTS_DIR, full_rescan=full_rescan)
+    counts = import_files(con, RESULTS_DIR, files, retry_failed=full_rescan, commit_every=commit_every)
+    print_summary(counts, skipped_badname)
+    print_lock_waits(con)
+    return counts
+
+def run_coalesced(con, lock: ImportLock, full_rescan: bool = False, commit_every: int = DEFAULT_COMMIT_EVERY):
+    """
+    Scan while holding `lock`, then release it. If another run asked for
+    work while this one was scanning, take the lock back and scan once more.
+    """
+    while True:
+        lock.clear_pending()
+        run_scan(con, full_rescan=full_rescan, commit_every=commit_every)
+        lock.release()
+        # Checked after releasing, so a request made just before release isn't lost:
+        # either we get the lock back, or the run that took it will do the scan
+        if not lock.has_pending() or not lock.acquire():
+            return
+        print("[LOCK] More files were signalled during the run, scanning again...")
+
+def watch(con, use_polling: bool = False, debounce: float = DEFAULT_DEBOUNCE_SECONDS, commit_every: int = DEFAULT_COMMIT_EVERY,
+          lock: ImportLock | None = None):
+    """
+    Resident watcher mode: keep one connection open and import result files
+    as the server writes them, instead of starting a new process per event.
+    """
+    # Catch up on anything written while the watcher wasn't running
+    run_scan(con, commit_every=commit_every)
+
+    watcher = ResultsWatcher(
+        RESULTS_DIR,
+        accept=lambda name: filename_ts_key(name) is not None,
+        debounce=debounce,
+        use_polling=use_polling,
+    )
+    kind = type(watcher.source).__name__
+    print(f"[WATCH] Watching {RESULTS_DIR} for new ACC result files ({kind})...")
+    try:
+        for batch in watcher.batches():
+            if not batch:
+                print("[WATCH] Events may have been missed, rescanning...")
+                run_scan(con, commit_every=commit_every)
+                continue
+            # The file changed, so a previous parse failure deserves another try
+            counts = import_files(con, RESULTS_DIR, batch, retry_failed=True, commit_every=commit_every)
+            print(
+                f"[WATCH] {', '.join(batch)}: imported {counts['imported']}, "
+                f"skipped {counts['duplicate'] + counts['empty']}, failed {counts['failed']}"
             )
-            
-        maybe_update_records(cur, session_id)
-        queue_race_results(cur, session_id)
-        imported += 1
-        con.commit()
+            # One-off runs started while we hold the lock leave a marker and exit
+            if lock is not None and lock.has_pending():
+                lock.clear_pending()
+                run_scan(con, commit_every=commit_every)
+    except KeyboardInterrupt:
+        print("[WATCH] Stopping.")
 
-    print("Done.")
-    print(f"Imported sessions: {imported}")
-    print(f"Skipped empty/template: {skipped_empty}")
-    print(f"Skipped already imported: {skipped_dupe}")
-    print(f"Skipped bad filename: {skipped_badname}")
+def run_rebuild(con, workers: int, announcements: bool = False) -> dict:
+    """Rebuild the derived tables (see db/rebuild.py) and print what was written."""
+    started = time.perf_counter()
+    print(f"[REBUILD] Recomputing derived tables with {workers} worker(s)...")
+    result = rebuild_derived(con, DB_PATH, workers=workers, announcements=announcements)
+    print(f"[REBUILD] {result['tracks']} track(s): {result['records']} record(s), "
+          f"{result['personal_bests']} personal best(s)"
+          + (f", {result['announcements']} announcement(s)" if announcements else "")
+          + f" in {time.perf_counter() - started:.2f}s")
+    return result
+
+@dataclass
+class IngestResult:
+    """What ingest_file() did with one result file."""
+    filename: str
+    # "imported", "empty", "duplicate", "failed" or "missing" (see import_result_file)
+    status: str
+    rows: int = 0
+    session_id: int | None = None
+    # TR/PB rows queued in record_announcements by this import
+    announcement_ids: list[int] = field(default_factory=list)
+    # Row queued in race_results_announcements (R sessions only)
+    race_results_announcement_id: int | None = None
+
+    @property
+    def has_announcements(self) -> bool:
+        return bool(self.announcement_ids) or self.race_results_announcement_id is not None
+
+class Ingester:
+    """
+    The importer as a library: import result files one at a time from
+    another program (the bot runs one on a worker thread).
+
+    Holds its own read-write connection, so it must be created and used on
+    a single thread. Each ingest_file() call is one transaction; the queued
+    announcements stay in SQLite as the durable outbox, and their IDs are
+    returned so the caller can post them right away.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, results_dir: str = RESULTS_DIR) -> None:
+        self.results_dir = results_dir
+        self.con = connect(db_path)
+        self.con.execute("PRAGMA foreign_keys = ON;")
+        prepare_db(self.con)
+
+    def ingest_file(self, path: str) -> IngestResult:
+        """
+        Import one result file and commit.
+
+        A file that previously failed is retried, since the caller only
+        hands over files that changed.
+        """
+        fname = os.path.basename(path)
+        cur = self.con.cursor()
+        begin_write(self.con)
+        try:
+            # We hold the write lock, so every row past these IDs is ours
+            last_announcement_id = cur.execute(
+                "SELECT COALESCE(MAX(announcement_id), 0) FROM record_announcements"
+            ).fetchone()[0]
+            status, rows = import_result_file(cur, fname, path, retry_failed=True)
+            result = IngestResult(fname, status, rows)
+            if status == "imported":
+                result.session_id = cur.execute(
+                    "SELECT session_id FROM import_manifest WHERE filename = ?", (fname,)
+                ).fetchone()[0]
+                result.announcement_ids = [row[0] for row in cur.execute(
+                    "SELECT announcement_id FROM record_announcements WHERE announcement_id > ? ORDER BY announcement_id",
+                    (last_announcement_id,)
+                )]
+                race = cur.execute(
+                    "SELECT announcement_id FROM race_results_announcements WHERE session_id = ?",
+                    (result.session_id,)
+                ).fetchone()
+                result.race_results_announcement_id = race[0] if race else None
+            if os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.results_dir):
+                advance_watermark(cur, [fname])
+            self.con.commit()
+        except Exception:
+            self.con.rollback()
+            raise
+        return result
+
+    def new_files(self, full_rescan: bool = False) -> list[str]:
+        """Paths of the files in the results folder that aren't imported yet."""
+        files, _ = list_new_files(self.con.cursor(), self.results_dir, full_rescan=full_rescan)
+        return [os.path.join(self.results_dir, fname) for fname in files]
+
+    def scan(self, full_rescan: bool = False) -> list[IngestResult]:
+        """Ingest every file in the results folder that isn't imported yet."""
+        return [self.ingest_file(path) for path in self.new_files(full_rescan)]
 
-    con.close()
+    def close(self) -> None:
+        self.con.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import ACC server result files into the stats database.")
+    parser.add_argument(
+        "--full-rescan",
+        action="store_true",
+        help="look at every result file instead of only those newer than the import watermark",
+    )
+    parser.add_argument(
+        "--commit-every",
+        type=int,
+        metavar="N",
+        help=(
+            f"commit after every N imported files; 0 commits once per run "
+            f"(default: {DEFAULT_COMMIT_EVERY}, or {BACKFILL_BATCH_FILES} with --backfill)"
+        ),
+    )
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="re-import the whole results folder, parsing files in parallel",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="with --backfill or --rebuild-derived, number of worker processes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--rebuild-derived",
+        action="store_true",
+        help="recompute records and personal bests from the imported sessions, then exit",
+    )
+    parser.add_argument(
+        "--with-announcements",
+        action="store_true",
+        help="with --rebuild-derived, also rebuild the TR/PB announcement history (marked as already sent)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and import result files as they are written",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="with --watch, poll the folder instead of using inotify",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE_SECONDS,
+        help="with --watch, seconds of quiet before a burst of events is imported (default: %(default)s)",
+    )
+    return parser.parse_args(argv)
+
+def acquire_lock(lock: ImportLock, args) -> bool:
+    """
+    Take the single-instance importer lock for this run.
+
+    A plain run that finds another importer active leaves a "pending" marker
+    for it and returns False (nothing to do). --watch waits for the lock;
+    --backfill and --rebuild-derived refuse to start.
+    """
+    if args.watch:
+        if not lock.acquire():
+            print("[LOCK] Another importer is running, waiting for it to finish...")
+            while not lock.acquire():
+                time.sleep(LOCK_RETRY_SECONDS)
+        return True
+
+    if args.backfill or args.rebuild_derived:
+        if not lock.acquire():
+            raise SystemExit(f"[LOCK] Another importer is running (lock: {lock.path}); try again when it has finished.")
+        return True
+
+    # Mark first, then try: if the holder is just finishing it still sees the marker
+    lock.mark_pending()
+    if not lock.acquire():
+        print("[LOCK] Another importer is running; it will pick up the new files.")
+        return False
+    return True
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    lock = ImportLock(DB_PATH + ".lock")
+    if not acquire_lock(lock, args):
+        return
+
+    try:
+        con = connect(DB_PATH)
+        con.execute("PRAGMA foreign_keys = ON;")
+        prepare_db(con)
+
+        commit_every = args.commit_every
+        if commit_every is None:
+            commit_every = BACKFILL_BATCH_FILES if args.backfill else DEFAULT_COMMIT_EVERY
+
+        try:
+            if args.rebuild_derived:
+                run_rebuild(con, workers=max(1, args.workers), announcements=args.with_announcements)
+            elif args.watch:
+                watch(con, use_polling=args.poll, debounce=args.debounce, commit_every=commit_every, lock=lock)
+            elif args.backfill:
+                backfill(con, workers=max(1, args.workers), commit_every=commit_every)
+            else:
+                run_coalesced(con, lock, full_rescan=args.full_rescan, commit_every=commit_every)
+        finally:
+            con.close()
+    finally:
+        lock.release()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
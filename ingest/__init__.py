@@ -0,0 +1 @@
+"""Result-file ingestion helpers used by the importer."""
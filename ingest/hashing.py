@@ -0,0 +1,30 @@
+"""Content hashes for result files, used to spot the same file under another path."""
+import hashlib
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# 128-bit BLAKE2b: fast in pure stdlib, and plenty to tell result files apart
+HASH_DIGEST_BYTES = 16
+
+
+def file_content_hash(path: str) -> str:
+    """
+    Hash a file's raw bytes without decoding it.
+
+    The file is read in fixed-size chunks, so memory use doesn't depend on
+    the file size.
+
+    Returns:
+        Hex digest string
+
+    Raises:
+        OSError: If the file can't be read
+    """
+    digest = hashlib.blake2b(digest_size=HASH_DIGEST_BYTES)
+    with open(path, "rb") as fp:
+        while True:
+            chunk = fp.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
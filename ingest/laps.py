@@ -0,0 +1,150 @@
+"""Compact per-car lap storage: packed int32 arrays plus a validity bitmap."""
+import sys
+from array import array
+from typing import Any, Iterable
+
+# Lap and split times are stored as little-endian int32 regardless of platform
+_NEEDS_BYTESWAP = sys.byteorder != "little"
+
+# Padding for laps that have fewer splits than the car's widest lap
+MISSING_SPLIT = 0
+
+# The server's "no time" value; also stored for times that don't fit in int32
+INT32_MAX = 2**31 - 1
+INT32_MIN = -2**31
+
+
+def _int32(value: Any) -> int:
+    """A lap or split time as stored: int(value), or INT32_MAX if out of range."""
+    value = int(value)
+    return value if INT32_MIN <= value <= INT32_MAX else INT32_MAX
+
+
+def _pack_int32(values: Iterable[int]) -> bytes:
+    arr = array("i", values)
+    if _NEEDS_BYTESWAP:
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _unpack_int32(blob: bytes | None) -> list[int]:
+    if not blob:
+        return []
+    arr = array("i")
+    arr.frombytes(blob)
+    if _NEEDS_BYTESWAP:
+        arr.byteswap()
+    return arr.tolist()
+
+
+def pack_bitmap(flags: list[bool]) -> bytes:
+    """Pack booleans into a bitmap (bit i of byte i // 8 is flag i)."""
+    bitmap = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            bitmap[i >> 3] |= 1 << (i & 7)
+    return bytes(bitmap)
+
+
+def unpack_bitmap(bitmap: bytes, count: int) -> list[bool]:
+    """Inverse of pack_bitmap() for the first `count` flags."""
+    return [bool(bitmap[i >> 3] & (1 << (i & 7))) for i in range(count)]
+
+
+class LapPacker:
+    """
+    Accumulate a result file's laps one at a time and pack them per car.
+
+    Laps are held as compact int arrays while accumulating, so a 24h race
+    costs a few bytes per lap rather than a dict per lap. Lap times are kept
+    as written by the server (including the 0 / 2147483647 sentinels), so
+    nothing is lost; readers decide what counts as a real lap.
+    """
+
+    def __init__(self) -> None:
+        # car_id -> (lap_times, flat_splits, splits_per_lap, valid_flags, driver_indexes)
+        self._cars: dict[int, tuple[array, array, array, list[bool], bytearray]] = {}
+        self.lap_total = 0
+
+    def add(self, lap: dict[str, Any]) -> None:
+        car_id = lap.get("carId")
+        if car_id is None:
+            return
+        car = self._cars.get(car_id)
+        if car is None:
+            car = self._cars[car_id] = (array("i"), array("i"), array("B"), [], bytearray())
+        lap_times, flat_splits, splits_per_lap, valid, driver_indexes = car
+
+        # Converted before extending: floats or huge values mustn't leave a partial lap behind
+        splits = [_int32(s) for s in (lap.get("splits") or ())[:255]]
+        lap_time = _int32(lap.get("laptime") or 0)
+        flat_splits.extend(splits)
+        lap_times.append(lap_time)
+        splits_per_lap.append(len(splits))
+        valid.append(bool(lap.get("isValidForBest")))
+        driver_index = lap.get("driverIndex") or 0
+        driver_indexes.append(driver_index if 0 <= driver_index <= 255 else 0)
+        self.lap_total += 1
+
+    def rows(self) -> list[tuple[Any, ...]]:
+        """
+        Returns:
+            List of (car_id, lap_count, split_count, lap_times, splits,
+            valid_bitmap, driver_indexes) tuples, ready to insert after a
+            session_id
+        """
+        rows = []
+        for car_id, (lap_times, flat_splits, splits_per_lap, valid, driver_indexes) in self._cars.items():
+            split_count = max(splits_per_lap, default=0)
+            if split_count and min(splits_per_lap) != split_count:
+                # Pad short laps so every lap occupies split_count slots
+                padded = array("i")
+                offset = 0
+                for n in splits_per_lap:
+                    padded.extend(flat_splits[offset:offset + n])
+                    padded.extend([MISSING_SPLIT] * (split_count - n))
+                    offset += n
+                flat_splits = padded
+
+            rows.append((
+                car_id,
+                len(lap_times),
+                split_count,
+                _pack_int32(lap_times),
+                _pack_int32(flat_splits) if split_count else None,
+                pack_bitmap(valid),
+                bytes(driver_indexes),
+            ))
+        return rows
+
+
+def unpack_car_laps(
+    lap_count: int,
+    split_count: int,
+    lap_times: bytes,
+    splits: bytes | None,
+    valid_bitmap: bytes,
+    driver_indexes: bytes | None,
+) -> list[dict[str, Any]]:
+    """
+    Decode one session_laps row back into a list of lap dicts.
+
+    Returns:
+        List of {"lap", "laptime", "splits", "is_valid", "driver_index"} dicts
+        in the order the laps were driven (lap is 1-indexed)
+    """
+    times = _unpack_int32(lap_times)
+    flat_splits = _unpack_int32(splits)
+    valid = unpack_bitmap(valid_bitmap, lap_count)
+    drivers = list(driver_indexes or b"")
+
+    decoded = []
+    for i in range(lap_count):
+        decoded.append({
+            "lap": i + 1,
+            "laptime": times[i],
+            "splits": flat_splits[i * split_count:(i + 1) * split_count],
+            "is_valid": valid[i],
+            "driver_index": drivers[i] if i < len(drivers) else 0,
+        })
+    return decoded
@@ -0,0 +1,83 @@
+"""
+Cross-process lock so only one importer works on the database at a time.
+
+The lock is an OS-level lock on a small file next to the database
+(fcntl.flock on POSIX, msvcrt.locking on Windows), so it is released
+automatically if the holder crashes. A run that can't get the lock leaves a
+"pending" marker instead of competing for the SQLite write lock; the holder
+checks for the marker after releasing and runs once more if it is set, so
+any number of concurrent triggers costs at most two scans.
+"""
+import os
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class ImportLock:
+    """Non-blocking exclusive lock plus a "new work pending" marker."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.pending_path = path + ".pending"
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """Try to take the lock without waiting. Returns True if it is now held."""
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.name == "nt":
+                # msvcrt locks byte ranges; make sure there is a byte to lock
+                if os.fstat(fd).st_size == 0:
+                    os.write(fd, b"\0")
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            if os.name == "nt":
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def mark_pending(self) -> None:
+        """Ask the current holder to run once more before it exits."""
+        with open(self.pending_path, "a"):
+            pass
+
+    def has_pending(self) -> bool:
+        return os.path.exists(self.pending_path)
+
+    def clear_pending(self) -> None:
+        """Clear the marker; call right before starting a scan, while holding the lock."""
+        try:
+            os.remove(self.pending_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "ImportLock":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
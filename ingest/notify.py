@@ -0,0 +1,51 @@
+"""
+"Database changed" pings from the importer to the bot.
+
+After committing new sessions the importer sends one empty UDP datagram to
+localhost. The bot listens on that port and checks its queues right away
+instead of waiting for its next timer tick. Nothing depends on the ping
+arriving: UDP to a port nobody listens on is simply dropped, and the bot
+still notices changes through PRAGMA data_version on its fallback timer.
+"""
+import asyncio
+import socket
+from typing import Callable
+
+from ingest.settings import NOTIFY_PORT
+
+DEFAULT_NOTIFY_HOST = "127.0.0.1"
+
+
+def notify_changed(port: int = NOTIFY_PORT, host: str = DEFAULT_NOTIFY_HOST) -> None:
+    """Tell a listening bot that the database changed. Never raises."""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(b"", (host, port))
+    except OSError:
+        pass
+
+
+class _ChangeProtocol(asyncio.DatagramProtocol):
+    def __init__(self, on_change: Callable[[], None]) -> None:
+        self.on_change = on_change
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.on_change()
+
+
+async def listen_for_changes(on_change: Callable[[], None], port: int = NOTIFY_PORT,
+                             host: str = DEFAULT_NOTIFY_HOST) -> asyncio.DatagramTransport:
+    """
+    Call `on_change()` on the event loop for every ping received.
+
+    Returns:
+        The transport; close() it to stop listening
+
+    Raises:
+        OSError: If the port can't be bound (e.g. a second bot instance)
+    """
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _ChangeProtocol(on_change), local_addr=(host, port)
+    )
+    return transport
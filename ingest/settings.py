@@ -0,0 +1,14 @@
+"""
+Settings shared by the importer and the bot.
+
+import_acc_results.py runs on its own, without config.py (which needs the
+Discord token), so values both sides must agree on are defined here once;
+config.py imports them from this module.
+"""
+
+# Folder the ACC server writes its result files to
+RESULTS_DIR = r"C:\accserver\server\results"
+
+# Localhost UDP port the bot listens on for the importer's "new sessions
+# committed" pings (see ingest/notify.py)
+NOTIFY_PORT = 47651
@@ -0,0 +1,161 @@
+"""Streaming reader for ACC result files (UTF-16LE JSON)."""
+import codecs
+import json
+import re
+from typing import Any, Iterator
+
+DEFAULT_CHUNK_BYTES = 64 * 1024
+
+# Arrays whose elements are yielded one at a time instead of being loaded whole
+STREAMED_ARRAYS = {
+    ("sessionResult", "leaderBoardLines"): "leader",
+    ("laps",): "lap",
+}
+
+# Objects that are walked key by key so their streamed arrays can be reached
+DESCEND_OBJECTS = {(), ("sessionResult",)}
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+_decoder = json.JSONDecoder()
+
+# Characters that can carry on a JSON number
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+
+def _number_may_continue(value: Any, buf: str, end: int) -> bool:
+    """Whether a decoded number might be cut off (it ends at the buffer edge or before a number character)."""
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    return end == len(buf) or buf[end] in _NUMBER_CHARS
+
+
+class _Reader:
+    """Incrementally decoded text buffer over a binary file."""
+
+    def __init__(self, fp, encoding: str, chunk_bytes: int) -> None:
+        self._fp = fp
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._chunk_bytes = chunk_bytes
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, min_bytes: int = 0) -> None:
+        """Append the next chunk of decoded text, dropping what's been consumed."""
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        data = self._fp.read(max(self._chunk_bytes, min_bytes))
+        if not data:
+            self.buf += self._decoder.decode(b"", final=True)
+            self.eof = True
+        else:
+            self.buf += self._decoder.decode(data)
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of file)."""
+        while True:
+            buf = self.buf
+            pos = self.pos = _WHITESPACE.match(buf, self.pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if self.eof:
+                return ""
+            self.fill()
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"Expected one of {chars!r} but found {ch or 'end of file'!r}")
+        self.pos += 1
+        return ch
+
+    def value(self) -> Any:
+        """Decode one complete JSON value at the current position."""
+        self.peek()
+        want = 0
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number cut at the buffer edge ("1." or "1.5e") decodes as its
+                # prefix; it may continue in the next chunk
+                if self.eof or not _number_may_continue(value, self.buf, end):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Value is cut off: read more, doubling so a large value isn't re-parsed too often
+            want = want * 2 if want else self._chunk_bytes
+            self.fill(want)
+
+
+def iter_result_file(
+    path: str,
+    encoding: str = "utf-16le",
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+) -> Iterator[tuple[str, Any, Any]]:
+    """
+    Read a result file incrementally, without building the full object graph.
+
+    Leaderboard lines and laps are yielded one element at a time, so memory
+    stays bounded by the largest single element rather than the file size.
+
+    Yields:
+        ("leader", index, line) for each sessionResult.leaderBoardLines element,
+        ("lap", index, lap) for each laps element, and
+        ("field", key_path, value) for every other value at the top level or in
+        sessionResult, where key_path is a tuple such as ("trackName",) or
+        ("sessionResult", "isWetSession")
+
+    Raises:
+        ValueError: If the file isn't valid JSON (including truncated files)
+    """
+    with open(path, "rb") as fp:
+        reader = _Reader(fp, encoding, chunk_bytes)
+        reader.fill()
+        if reader.buf.startswith("\ufeff"):
+            reader.pos = 1
+        yield from _walk_object(reader, ())
+        if reader.peek():
+            raise ValueError("Extra data after the end of the result object")
+
+
+def _walk_object(reader: _Reader, path: tuple[str, ...]) -> Iterator[tuple[str, Any, Any]]:
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError(f"Expected an object key but found {key!r}")
+        reader.expect(":")
+        sub = path + (key,)
+        ch = reader.peek()
+
+        if sub in STREAMED_ARRAYS and ch == "[":
+            yield from _walk_array(reader, STREAMED_ARRAYS[sub])
+        elif sub in DESCEND_OBJECTS and ch == "{":
+            yield from _walk_object(reader, sub)
+        else:
+            yield "field", sub, reader.value()
+
+        if reader.expect(",}") == "}":
+            return
+
+
+def _walk_array(reader: _Reader, kind: str) -> Iterator[tuple[str, Any, Any]]:
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+
+    index = 0
+    while True:
+        yield kind, index, reader.value()
+        index += 1
+        if reader.expect(",]") == "]":
+            return
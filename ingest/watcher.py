@@ -0,0 +1,250 @@
+"""Watch the ACC results folder and hand finished result files to the importer."""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Callable, Iterator
+
+# inotify event flags (see <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+DEFAULT_MAX_BATCH_WAIT_SECONDS = 30.0
+DEFAULT_POLL_SECONDS = 1.0
+
+
+class PollingSource:
+    """
+    Portable event source that detects new or changed files by polling.
+
+    The directory is only listed when its mtime changes (a file was created,
+    renamed or deleted), and only new names are stat()ed. Files that changed
+    recently are re-checked individually, so a result file that is still
+    being written keeps producing events until it settles.
+    """
+
+    def __init__(self, directory: str, interval: float = DEFAULT_POLL_SECONDS) -> None:
+        self.directory = directory
+        self.interval = interval
+        self._dir_mtime_ns = None
+        self._snapshot: dict[str, tuple[int, int]] = {}
+        self._snapshot = self._scan()
+        self._recent: set[str] = set()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        """List the directory, only stat()ing names that weren't there before."""
+        self._dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+        previous = self._snapshot
+        snapshot = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name in previous:
+                    snapshot[entry.name] = previous[entry.name]
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[entry.name] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def poll(self, timeout: float) -> set[str]:
+        """Wait up to `timeout` seconds and return the names of files that changed."""
+        time.sleep(min(timeout, self.interval))
+        changed = set()
+
+        if os.stat(self.directory).st_mtime_ns != self._dir_mtime_ns:
+            previous = self._snapshot
+            self._snapshot = self._scan()
+            changed = {name for name in self._snapshot if name not in previous}
+
+        for name in list(self._recent - changed):
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                self._recent.discard(name)
+                self._snapshot.pop(name, None)
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+            if self._snapshot.get(name) != sig:
+                self._snapshot[name] = sig
+                changed.add(name)
+            else:
+                self._recent.discard(name)
+
+        self._recent |= changed
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifySource:
+    """Linux event source backed by inotify (no third-party dependency)."""
+
+    def __init__(self, directory: str) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CREATE | IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO
+        wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+        self.directory = directory
+        self.overflowed = False
+
+    def poll(self, timeout: float) -> set[str]:
+        """Wait up to `timeout` seconds and return the names of files that changed."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset + _INOTIFY_EVENT.size <= len(buf):
+            _, mask, _, name_len = _INOTIFY_EVENT.unpack_from(buf, offset)
+            offset += _INOTIFY_EVENT.size
+            name = buf[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                # Kernel queue overflowed: the caller should fall back to a scan
+                self.overflowed = True
+            if name:
+                changed.add(os.fsdecode(name))
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def make_event_source(directory: str, use_polling: bool = False) -> PollingSource | InotifySource:
+    """
+    Pick the best event source for this platform.
+
+    Uses inotify on Linux and falls back to polling everywhere else (or when
+    inotify can't be set up, e.g. on some network mounts).
+    """
+    if not use_polling and sys.platform.startswith("linux"):
+        try:
+            return InotifySource(directory)
+        except (OSError, AttributeError):
+            pass
+    return PollingSource(directory)
+
+
+def wait_until_complete(path: str, settle: float = 0.5, timeout: float = 10.0) -> bool:
+    """
+    Wait until a file has finished being written.
+
+    A file counts as complete once it can be opened for reading and its size
+    and mtime stay the same for `settle` seconds. This mirrors the lock probe
+    the PowerShell watcher used, but also works where the writer doesn't hold
+    an exclusive lock.
+
+    Returns:
+        True if the file settled, False if it vanished or `timeout` expired
+    """
+    deadline = time.monotonic() + timeout
+    last_sig = None
+    while True:
+        try:
+            with open(path, "rb"):
+                pass
+            st = os.stat(path)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            # Still locked by the writer
+            st = None
+
+        sig = (st.st_size, st.st_mtime_ns) if st else None
+        if sig is not None and sig == last_sig:
+            return True
+        last_sig = sig
+
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(settle)
+
+
+class ResultsWatcher:
+    """
+    Turn raw file-system events into batches of finished result files.
+
+    Event bursts are coalesced: a batch is emitted once no new matching event
+    has arrived for `debounce` seconds (or after `max_batch_wait` seconds of
+    continuous activity), and each file in it has finished being written.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        accept: Callable[[str], bool],
+        debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+        max_batch_wait: float = DEFAULT_MAX_BATCH_WAIT_SECONDS,
+        use_polling: bool = False,
+    ) -> None:
+        self.directory = directory
+        self.accept = accept
+        self.debounce = debounce
+        self.max_batch_wait = max_batch_wait
+        self.source = make_event_source(directory, use_polling=use_polling)
+        self._stopped = False
+
+    def stop(self) -> None:
+        """Ask batches() to return after the current wait."""
+        self._stopped = True
+
+    def batches(self) -> Iterator[list[str]]:
+        """
+        Yield sorted lists of result filenames that are ready to import.
+
+        An empty list means events may have been lost (inotify queue
+        overflow) and the caller should fall back to a normal scan.
+        """
+        pending: set[str] = set()
+        first_event_at = last_event_at = 0.0
+        try:
+            while not self._stopped:
+                changed = {name for name in self.source.poll(self.debounce) if self.accept(name)}
+                now = time.monotonic()
+                if changed:
+                    if not pending:
+                        first_event_at = now
+                    pending |= changed
+                    last_event_at = now
+
+                if getattr(self.source, "overflowed", False):
+                    self.source.overflowed = False
+                    yield []  # empty batch: caller should run a full scan
+
+                if not pending:
+                    continue
+                quiet = now - last_event_at >= self.debounce
+                if not (quiet or now - first_event_at >= self.max_batch_wait):
+                    continue
+
+                batch = sorted(pending)
+                pending.clear()
+                for name in batch:
+                    wait_until_complete(os.path.join(self.directory, name))
+                yield batch
+        finally:
+            self.source.close()
@@ -1,32 +1,53 @@
 """Track image handling utilities."""
+import asyncio
+import hashlib
+import io
 import os
+import time
+from urllib.parse import parse_qs, urlparse
+
 import discord
 from config import IMG_DIR
 
+# Reuse an uploaded image's URL only while it stays valid at least this long
+IMAGE_URL_EXPIRY_MARGIN_SECONDS = 3600
+# How often the image registry checks img/ for added, removed or changed files
+IMAGE_CHECK_SECONDS = 5.0
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+# Images for track names that don't match their file name
+SPECIAL_MAPPINGS = {
+    "spa": "Spa-Francochamps.jpg",
+    "nurburgring": "Nürburgring.jpeg",
+    "nurburgring_24h": "Nürburgring.jpeg",
+    "paul_ricard": "Circuit Paul Ricard.jpg",
+    "zandvoort": "Circuit Zandvoort.jpg",
+    "zolder": "Circuit Zolder.jpg",
+    "brands_hatch": "Brands Hatch GP.jpg",
+    "cota": "Circuit of the Americas.jpg",
+    "valencia": "Circuit Ricardo Tormo.jpg",
+    "red_bull_ring": "Red Bull Ring.jpg",
+    "mount_panorama": "Mount Panorama Circuit.jpg",
+    "silverstone": "Silverstone GP Circuit.jpg",
+    "donington": "Donington Park.jpg",
+    "oulton_park": "Oulton Park.jpg",
+    "watkins_glen": "Watkins Glen.jpg",
+    "suzuka": "Suzuka Circuit.jpg",
+}
+
 
 def normalize_track_name(track_name: str) -> str:
     """Normalize track name for matching (lowercase, handle spaces/underscores)."""
     return track_name.lower().strip().replace(" ", "_")
 
 
-def find_track_image(track_name: str) -> tuple[str, discord.File] | tuple[None, None]:
-    """Find matching image file for a track name. Returns (filename, File) or (None, None)."""
-    if not os.path.exists(IMG_DIR):
-        return None, None
-    
-    # Normalize track name for matching
-    normalized_track = normalize_track_name(track_name)
-    
-    # Get all image files
-    image_files = [f for f in os.listdir(IMG_DIR) 
-                   if f.lower().endswith(('.jpg', '.jpeg', '.png', '.gif'))]
-    
+def _match_image_file(normalized_track: str, image_files: list[str]) -> str | None:
+    """Match a normalized track name against image file names (in directory order)."""
     # Try exact match first (case-insensitive)
     for img_file in image_files:
         normalized_img = normalize_track_name(os.path.splitext(img_file)[0])
         if normalized_track == normalized_img:
-            file_path = os.path.join(IMG_DIR, img_file)
-            return img_file, discord.File(file_path, filename=img_file)
+            return img_file
     
     # Try partial match (track name contained in image name or vice versa)
     for img_file in image_files:
@@ -36,34 +57,232 @@ def find_track_image(track_name: str) -> tuple[str, discord.File] | tuple[None,
         track_clean = normalized_track.replace("_", "").strip()
         
         if track_clean in img_clean or img_clean in track_clean:
-            file_path = os.path.join(IMG_DIR, img_file)
-            return img_file, discord.File(file_path, filename=img_file)
+            return img_file
     
     # Special case mappings for common variations
-    special_mappings = {
-        "spa": "Spa-Francochamps.jpg",
-        "nurburgring": "Nürburgring.jpeg",
-        "nurburgring_24h": "Nürburgring.jpeg",
-        "paul_ricard": "Circuit Paul Ricard.jpg",
-        "zandvoort": "Circuit Zandvoort.jpg",
-        "zolder": "Circuit Zolder.jpg",
-        "brands_hatch": "Brands Hatch GP.jpg",
-        "cota": "Circuit of the Americas.jpg",
-        "valencia": "Circuit Ricardo Tormo.jpg",
-        "red_bull_ring": "Red Bull Ring.jpg",
-        "mount_panorama": "Mount Panorama Circuit.jpg",
-        "silverstone": "Silverstone GP Circuit.jpg",
-        "donington": "Donington Park.jpg",
-        "oulton_park": "Oulton Park.jpg",
-        "watkins_glen": "Watkins Glen.jpg",
-        "suzuka": "Suzuka Circuit.jpg",
-    }
-    
-    if normalized_track in special_mappings:
-        img_file = special_mappings[normalized_track]
-        file_path = os.path.join(IMG_DIR, img_file)
-        if os.path.exists(file_path):
-            return img_file, discord.File(file_path, filename=img_file)
+    img_file = SPECIAL_MAPPINGS.get(normalized_track)
+    if img_file in image_files:
+        return img_file
     
-    return None, None
+    return None
+
+
+class TrackImageRegistry:
+    """
+    Track images in IMG_DIR, read once and held in memory.
+
+    Matching a track to its image used to list and scan img/ for every
+    embed, and attaching it read the file again. The registry reads the
+    folder once (at startup, see bot/track_images.py) and remembers the
+    match per normalized track name, so embeds get their image with no
+    directory scan or disk read. img/ is checked for added, removed or
+    changed files at most every IMAGE_CHECK_SECONDS, in a worker thread
+    while lookups keep using the current images; only changed files are
+    read again, and the matches are worked out again after a change.
+    """
+
+    def __init__(self) -> None:
+        # image file -> ((mtime_ns, size), bytes, content_hash), in directory order
+        self._images: dict[str, tuple[tuple[int, int], bytes, str]] = {}
+        # normalized track name -> image file (or None)
+        self._matches: dict[str, str | None] = {}
+        self._checked_at: float | None = None
+        self._task: asyncio.Future | None = None
+        # Bumped whenever the images change
+        self.version = 0
+
+    def _scan(self) -> dict[str, tuple[tuple[int, int], bytes, str]] | None:
+        """Read IMG_DIR (blocking): the new images, or None if nothing changed."""
+        try:
+            image_files = [f for f in os.listdir(IMG_DIR) if f.lower().endswith(IMAGE_EXTENSIONS)]
+        except OSError:
+            image_files = []
+
+        current = self._images
+        images = {}
+        for img_file in image_files:
+            path = os.path.join(IMG_DIR, img_file)
+            try:
+                st = os.stat(path)
+                stamp = (st.st_mtime_ns, st.st_size)
+                cached = current.get(img_file)
+                if cached and cached[0] == stamp:
+                    images[img_file] = cached
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            images[img_file] = (stamp, data, hashlib.sha256(data).hexdigest())
+
+        if list(images) == list(current) and all(images[f] is current[f] for f in images):
+            return None
+        return images
+
+    def _swap(self, images: dict[str, tuple[tuple[int, int], bytes, str]]) -> None:
+        # Swapped in whole: lookups see the old or the new images, never a mix
+        self._images = images
+        self._matches = {}
+        self.version += 1
+
+    def refresh(self) -> bool:
+        """Read IMG_DIR now, blocking (no event loop, or in a worker thread). Returns whether anything changed."""
+        self._checked_at = time.monotonic()
+        images = self._scan()
+        if images is None:
+            return False
+        self._swap(images)
+        return True
+
+    async def _refresh_in_thread(self) -> bool:
+        images = await asyncio.to_thread(self._scan)
+        if images is None:
+            return False
+        self._swap(images)
+        return True
+
+    def _start_refresh(self, force: bool) -> asyncio.Future | None:
+        """The running refresh, or a new one if it's time to check; None if neither."""
+        if self._task is not None and not self._task.done():
+            return self._task
+        if not force and self._checked_at is not None and time.monotonic() - self._checked_at < IMAGE_CHECK_SECONDS:
+            return None
+        self._checked_at = time.monotonic()
+        self._task = asyncio.ensure_future(self._refresh_in_thread())
+        return self._task
+
+    async def refresh_async(self, force: bool = False) -> bool:
+        """Pick up changes in IMG_DIR (if it's time to check) without blocking the event loop."""
+        task = self._start_refresh(force)
+        return await asyncio.shield(task) if task is not None else False
+
+    def _refresh_soon(self) -> None:
+        """Start a background check of IMG_DIR if it's due; this lookup uses the current images."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Not on the event loop: only a registry that was never read reads now
+            if self._checked_at is None:
+                self.refresh()
+            return
+        self._start_refresh(force=False)
+
+    def image_file(self, track_name: str) -> str | None:
+        """Image file name for a track, or None."""
+        self._refresh_soon()
+        normalized_track = normalize_track_name(track_name)
+        matches = self._matches
+        if normalized_track not in matches:
+            matches[normalized_track] = _match_image_file(normalized_track, list(self._images))
+        return matches[normalized_track]
+
+    def content_hash(self, img_file: str) -> str | None:
+        """SHA-256 of an image, or None if it's gone."""
+        self._refresh_soon()
+        image = self._images.get(img_file)
+        return image[2] if image else None
+
+    def file(self, img_file: str) -> discord.File | None:
+        """A discord.File of an image, read from memory, or None if it's gone."""
+        image = self._images.get(img_file)
+        if image is None:
+            return None
+        return discord.File(io.BytesIO(image[1]), filename=img_file)
 
+
+track_image_registry = TrackImageRegistry()
+
+
+def find_track_image_file(track_name: str) -> str | None:
+    """Find the matching image file name in IMG_DIR for a track name, or None."""
+    return track_image_registry.image_file(track_name)
+
+
+def find_track_image(track_name: str) -> tuple[str, discord.File] | tuple[None, None]:
+    """Find matching image file for a track name. Returns (filename, File) or (None, None)."""
+    img_file = find_track_image_file(track_name)
+    img = track_image_registry.file(img_file) if img_file else None
+    if img is None:
+        return None, None
+    return img_file, img
+
+
+def _url_expires_at(url: str) -> int | None:
+    """Expiry of a signed Discord CDN URL (its hex `ex` parameter), or None if it doesn't expire."""
+    try:
+        return int(parse_qs(urlparse(url).query)["ex"][0], 16)
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+class TrackImageUrls:
+    """
+    Discord URLs of track images that were already uploaded, per image file.
+
+    A URL is only handed out while the file still has the content hash it
+    had when it was uploaded, so replacing an image in img/ uploads the new
+    one. Signed CDN URLs expire; those close to expiry are dropped too.
+    """
+
+    def __init__(self) -> None:
+        # image file -> (content_hash, url)
+        self._urls: dict[str, tuple[str, str]] = {}
+
+    def content_hash(self, img_file: str) -> str | None:
+        """SHA-256 of an image in IMG_DIR, or None if it's gone."""
+        return track_image_registry.content_hash(img_file)
+
+    def load(self, rows: list[tuple[str, str, str]]) -> None:
+        """Add stored (image_file, content_hash, url) rows."""
+        for img_file, content_hash, url in rows:
+            self._urls[img_file] = (content_hash, url)
+
+    def get(self, img_file: str) -> str | None:
+        """A reusable URL for this image, or None if it has to be uploaded."""
+        cached = self._urls.get(img_file)
+        if cached is None:
+            return None
+        content_hash, url = cached
+        expires_at = _url_expires_at(url)
+        if content_hash != self.content_hash(img_file) or (
+            expires_at is not None and expires_at - time.time() < IMAGE_URL_EXPIRY_MARGIN_SECONDS
+        ):
+            del self._urls[img_file]
+            return None
+        return url
+
+    def remember(self, img_file: str, message: discord.Message) -> tuple[str, str, str] | None:
+        """
+        Take the URL of a track image uploaded with a sent message (its only
+        attachment; Discord may rename it, so the image file is passed in).
+
+        Returns:
+            (image_file, content_hash, url) to be stored, or None
+        """
+        content_hash = self.content_hash(img_file)
+        if content_hash is None or not message.attachments:
+            return None
+        url = message.attachments[0].url
+        self._urls[img_file] = (content_hash, url)
+        return img_file, content_hash, url
+
+
+track_image_urls = TrackImageUrls()
+
+
+def track_thumbnail(track_name: str) -> tuple[str, discord.File | None] | tuple[None, None]:
+    """
+    Thumbnail for a track: (url, None) if the image was uploaded before and
+    its URL can be reused, else ("attachment://...", File) to upload it with
+    the message. (None, None) if there's no image for the track.
+    """
+    img_file = find_track_image_file(track_name)
+    if img_file is None:
+        return None, None
+    url = track_image_urls.get(img_file)
+    if url is not None:
+        return url, None
+    img = track_image_registry.file(img_file)
+    if img is None:
+        return None, None
+    return f"attachment://{img_file}", img
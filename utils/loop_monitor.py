@@ -0,0 +1,56 @@
+"""Event loop lag monitoring: how late the loop runs a task that should wake on time."""
+import asyncio
+import logging
+import statistics
+
+logger = logging.getLogger("acc_bot")
+
+# How often the probe wakes up
+LAG_PROBE_SECONDS = 0.1
+# Log a lag summary this often
+LAG_REPORT_SECONDS = 300.0
+# A single stall at least this long is logged right away
+LAG_WARN_SECONDS = 0.1
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples` (0 for an empty list)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def monitor_loop_lag(probe: float = LAG_PROBE_SECONDS, report_every: float = LAG_REPORT_SECONDS,
+                           warn_at: float = LAG_WARN_SECONDS) -> None:
+    """
+    Measure event loop lag until cancelled.
+
+    Sleeps `probe` seconds at a time and records how much later than that it
+    actually woke up. Anything blocking the loop (a synchronous query, file
+    I/O, heavy formatting) shows up as lag. Stalls of `warn_at` seconds or
+    more are logged as warnings, and p50/p99/max are logged every
+    `report_every` seconds.
+    """
+    loop = asyncio.get_running_loop()
+    samples: list[float] = []
+    report_at = loop.time() + report_every
+    while True:
+        started = loop.time()
+        await asyncio.sleep(probe)
+        now = loop.time()
+        lag = max(0.0, now - started - probe)
+        samples.append(lag)
+        if lag >= warn_at:
+            logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+
+        if now >= report_at:
+            logger.info(
+                f"Event loop lag over {len(samples)} samples: "
+                f"p50 {statistics.median(samples) * 1000:.1f} ms, "
+                f"p99 {percentile(samples, 99) * 1000:.1f} ms, "
+                f"max {max(samples) * 1000:.1f} ms"
+            )
+            samples.clear()
+            report_at = now + report_every